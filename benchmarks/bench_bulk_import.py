@@ -0,0 +1,114 @@
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from utils.import_manager import ImportManager
+
+# ============================================================
+# قياس سرعة الاستيراد المجمع: إدخال كل سجل بمعاملته الخاصة كما يفعل
+# IncomingForm.save_record (على عينة من الصفوف) مقابل ImportManager
+# بدفعات executemany، من ملف CSV ثم من ملف Excel بالبيانات نفسها
+# الاستخدام: python benchmarks/bench_bulk_import.py [عدد الصفوف] [عينة الطريقة القديمة]
+# ============================================================
+
+HEADERS = ['رقم الوارد', 'العنوان', 'جهة الوارد', 'النوع', 'الموظف', 'الاختصاص', 'تاريخ التسجيل', 'التفاصيل']
+SOURCES = [f"جهة {n}" for n in range(40)]
+TYPES = ['كتاب رسمي', 'تعميم', 'مذكرة', 'دعوة']
+EMPLOYEES = [f"موظف {n}" for n in range(25)]
+SPECIALIZATIONS = ['إداري', 'مالي', 'فني', 'قانوني']
+
+def generate_rows(row_count):
+    rng = random.Random(row_count)
+    for n in range(row_count):
+        yield [str(n), f"كتاب بخصوص الموضوع رقم {n}", rng.choice(SOURCES), rng.choice(TYPES),
+               rng.choice(EMPLOYEES), rng.choice(SPECIALIZATIONS),
+               f"{rng.randint(2010, 2024)}/{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}", ""]
+
+def write_csv(file_path, row_count):
+    with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADERS)
+        writer.writerows(generate_rows(row_count))
+
+def write_xlsx(file_path, row_count):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet()
+    worksheet.append(HEADERS)
+    for row in generate_rows(row_count):
+        worksheet.append(row)
+    workbook.save(file_path)
+
+def legacy_import(db, file_path, sample):
+    """سجل واحد لكل معاملة عبر insert_record، بعد تحويل الأسماء من قاعدة البيانات"""
+    importer = ImportManager(db)
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for n, row in enumerate(reader):
+            if n >= sample:
+                break
+            number, title, source, record_type, employee, specialization, registration_date, details = row
+            registration_date = registration_date.replace('/', '-')
+            ids = {}
+            for key, table, name in (('incoming_source_id', 'incoming_sources', source),
+                                     ('incoming_type_id', 'incoming_types', record_type),
+                                     ('employee_id', 'employees', employee),
+                                     ('specialization_id', 'specializations', specialization)):
+                ids[key] = importer.reference_map(table).get(name)
+            db.insert_record('incoming', dict(incoming_number=number, title=title, registration_date=registration_date,
+                                              details=details, **ids), year=int(registration_date[:4]))
+
+def fresh_database(work_dir, name):
+    db = DatabaseManager(os.path.join(work_dir, name))
+    # الأسماء المرجعية موجودة مسبقاً في الطريقتين
+    for table, names in (('incoming_sources', SOURCES), ('incoming_types', TYPES),
+                         ('specializations', SPECIALIZATIONS)):
+        db.execute_many(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in names])
+    db.execute_many("INSERT INTO employees (name) VALUES (?)", [(name,) for name in EMPLOYEES])
+    return db
+
+def main(row_count=200000, legacy_sample=2000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            csv_path = os.path.join(work_dir, "records.csv")
+            xlsx_path = os.path.join(work_dir, "records.xlsx")
+            write_csv(csv_path, row_count)
+            write_xlsx(xlsx_path, row_count)
+
+            results = {}
+            db = fresh_database(work_dir, "legacy.db")
+            started = time.perf_counter()
+            legacy_import(db, csv_path, legacy_sample)
+            results['سجل لكل معاملة (عينة)'] = (legacy_sample, time.perf_counter() - started)
+            db.close()
+
+            for name, file_path in (('CSV', csv_path), ('Excel', xlsx_path)):
+                db = fresh_database(work_dir, f"bulk_{name}.db")
+                result = ImportManager(db).import_file(file_path, 'incoming')
+                stored = db.execute_query("SELECT COUNT(*) FROM incoming_records")[0][0]
+                db.close()
+                if stored != row_count or result.rejected:
+                    print(f"{name}: أُدخل {stored} من {row_count} (رُفض {result.rejected})")
+                    return False
+                results[f"الاستيراد المجمع من {name}"] = (row_count, result.seconds)
+        finally:
+            os.chdir(cwd)
+
+    print(f"الصفوف: {row_count}")
+    for name, (rows, seconds) in results.items():
+        print(f"{name:<28}{rows:>9} صف{seconds:>9.2f} ث{rows / seconds:>12.0f} صف/ث")
+    return True
+
+if __name__ == "__main__":
+    arguments = [int(arg) for arg in sys.argv[1:]]
+    sys.exit(0 if main(*arguments) else 1)
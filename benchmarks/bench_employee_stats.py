@@ -0,0 +1,119 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+# ============================================================
+# قياس زمن تقرير الموظفين مع زيادة عدد الموظفين وثبات عدد السجلات:
+# الطريقة القديمة (استعلامان واتصالان لكل موظف)، نفس الحلقة عبر مجمع الاتصالات،
+# والتجميع في تمريرة واحدة
+# ============================================================
+
+TOTAL_RECORDS = 20000
+START_DATE = '2024-01-01'
+END_DATE = '2024-12-31'
+
+def populate(db, employee_count):
+    """إنشاء موظفين وسجلات وارد وصادر لكل موظف"""
+    rng = random.Random(employee_count)
+    db.execute_query("INSERT INTO incoming_types (name) VALUES ('إيميل')")
+    email_type = db.execute_query("SELECT id FROM incoming_types WHERE name = 'إيميل'")[0][0]
+
+    db.execute_many(
+        "INSERT INTO employees (name, department, is_active) VALUES (?, ?, 1)",
+        [(f"موظف {i}", f"قسم {i % 10}") for i in range(employee_count)]
+    )
+    employee_ids = [row[0] for row in db.execute_query("SELECT id FROM employees")]
+
+    incoming, outgoing = [], []
+    for n in range(TOTAL_RECORDS // 2):
+        emp_id = rng.choice(employee_ids)
+        date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        incoming.append((f"IN-{n}", "X", str(n), "عنوان", email_type, emp_id, date))
+        outgoing.append((f"OUT-{n}", "X", str(n), "عنوان", emp_id, date))
+
+    db.execute_many(
+        """INSERT INTO incoming_records (record_number, incoming_number, serial_number, title,
+        incoming_type_id, employee_id, registration_date) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        incoming
+    )
+    db.execute_many(
+        """INSERT INTO outgoing_records (record_number, outgoing_number, serial_number, title,
+        employee_id, registration_date) VALUES (?, ?, ?, ?, ?, ?)""",
+        outgoing
+    )
+    return employee_ids
+
+FAX_QUERY = """SELECT COUNT(*) FROM outgoing_records
+WHERE employee_id = ? AND registration_date BETWEEN ? AND ?"""
+
+EMAIL_QUERY = """SELECT COUNT(*) FROM incoming_records
+WHERE employee_id = ? AND registration_date BETWEEN ? AND ?
+AND incoming_type_id IN (SELECT id FROM incoming_types WHERE name LIKE '%إيميل%' OR name LIKE '%email%')"""
+
+def connect_per_query(db, employee_ids):
+    """الطريقة الأصلية: اتصال جديد واستعلام COUNT لكل إحصائية"""
+    stats = {}
+    for emp_id in employee_ids:
+        counts = []
+        for query in (FAX_QUERY, EMAIL_QUERY):
+            conn = db.get_connection()
+            counts.append(conn.execute(query, (emp_id, START_DATE, END_DATE)).fetchone()[0])
+            conn.close()
+        stats[emp_id] = tuple(counts)
+    return stats
+
+def per_employee_loop(db, employee_ids):
+    """استعلاما COUNT لكل موظف عبر مجمع الاتصالات"""
+    stats = {}
+    for emp_id in employee_ids:
+        fax_count = db.execute_query(FAX_QUERY, (emp_id, START_DATE, END_DATE))[0][0]
+        email_count = db.execute_query(EMAIL_QUERY, (emp_id, START_DATE, END_DATE))[0][0]
+        stats[emp_id] = (fax_count, email_count)
+    return stats
+
+def set_based(db, employee_ids):
+    """الطريقة الجديدة: تمريرة تجميعية واحدة"""
+    all_stats = db.get_all_employee_stats(START_DATE, END_DATE)
+    return {
+        emp_id: (all_stats[emp_id]['fax_count'], all_stats[emp_id]['email_count'])
+        for emp_id in employee_ids if emp_id in all_stats
+    }
+
+def timed(func, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(sizes=(100, 200, 400, 800, 1600)):
+    print(f"{'الموظفون':>10} {'اتصال لكل استعلام':>18} {'لكل موظف':>10} {'تجميعي':>10}  (بالثواني)")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            cwd = os.getcwd()
+            os.chdir(work_dir)
+            try:
+                db = DatabaseManager(os.path.join(work_dir, "bench.db"))
+                employee_ids = populate(db, size)
+
+                connect_time, _ = timed(connect_per_query, db, employee_ids, repeat=1)
+                loop_time, loop_stats = timed(per_employee_loop, db, employee_ids)
+                bulk_time, bulk_stats = timed(set_based, db, employee_ids)
+                assert {k: v for k, v in loop_stats.items() if any(v)} == bulk_stats
+
+                print(f"{size:>10} {connect_time:>18.4f} {loop_time:>10.4f} {bulk_time:>10.4f}")
+                db.close()
+            finally:
+                os.chdir(cwd)
+
+if __name__ == "__main__":
+    main()
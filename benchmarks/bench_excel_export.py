@@ -0,0 +1,124 @@
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from utils.export_manager import ExportManager
+
+# ============================================================
+# قياس تصدير تقرير الوارد إلى Excel مع زيادة عدد السجلات:
+# الطريقة القديمة (قائمة نصوص + DataFrame + مصنف كامل + مروران على الخلايا)
+# مقابل التصدير المتدفق من المؤشر إلى ورقة للكتابة فقط.
+# الزمن يُقاس بدون tracemalloc، والذاكرة القصوى في تشغيل منفصل.
+# الطريقة القديمة تحتاج pandas (لم يعد من متطلبات البرنامج) وتُتخطى إن لم تكن مثبتة
+# الاستخدام: python benchmarks/bench_excel_export.py [عدد السجلات ...] [--no-legacy]
+# ============================================================
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+# الطريقة القديمة بطيئة جداً مع الأحجام الكبيرة فتُقاس حتى هذا الحد فقط
+LEGACY_MAX_ROWS = 100000
+
+REPORT_QUERY = """
+SELECT ir.record_number, ir.incoming_number, ir.serial_number, ir.title,
+       isrc.name, it.name, e.name, s.name, ir.registration_date
+FROM incoming_records ir
+LEFT JOIN incoming_sources isrc ON ir.incoming_source_id = isrc.id
+LEFT JOIN incoming_types it ON ir.incoming_type_id = it.id
+LEFT JOIN employees e ON ir.employee_id = e.id
+LEFT JOIN specializations s ON ir.specialization_id = s.id
+ORDER BY ir.registration_date DESC
+"""
+
+COLUMNS = ['رقم السجل', 'رقم الوارد', 'الرقم التسلسلي', 'العنوان',
+           'جهة الوارد', 'النوع', 'الموظف', 'الاختصاص', 'تاريخ التسجيل']
+
+TITLES = ['طلب إجازة سنوية', 'تعميم بخصوص الدوام الرسمي', 'محضر اجتماع لجنة المشتريات',
+          'كتاب شكر وتقدير', 'طلب صيانة أجهزة الحاسب', 'إشعار بموعد التدقيق المالي']
+
+def populate(db, record_count, batch_size=50000):
+    """إنشاء سجلات وارد على دفعات"""
+    rng = random.Random(record_count)
+    sources = [row[0] for row in db.execute_query("SELECT id FROM incoming_sources")]
+    types = [row[0] for row in db.execute_query("SELECT id FROM incoming_types")]
+
+    for start in range(0, record_count, batch_size):
+        batch = []
+        for n in range(start, min(start + batch_size, record_count)):
+            date = f"{rng.randint(2020, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            batch.append((f"IN-{n}", str(n), str(n), rng.choice(TITLES),
+                          rng.choice(sources), rng.choice(types), date))
+        db.execute_many(
+            """INSERT INTO incoming_records (record_number, incoming_number, serial_number, title,
+            incoming_source_id, incoming_type_id, registration_date) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            batch
+        )
+
+def legacy_export(db, file_path):
+    """التصدير القديم كما كان في ExportManager.export_to_excel"""
+    import pandas as pd
+
+    data = db.execute_query(REPORT_QUERY)
+    processed_data = [[str(cell) if cell is not None else "" for cell in row] for row in data]
+    df = pd.DataFrame(processed_data, columns=COLUMNS)
+
+    with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name="تقرير", index=False)
+        worksheet = writer.sheets["تقرير"]
+        for row in worksheet.iter_rows():
+            for cell in row:
+                cell.alignment = cell.alignment.copy(horizontal='right', vertical='center')
+        for column in worksheet.columns:
+            max_length = max(len(str(cell.value)) for cell in column)
+            worksheet.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+    return True
+
+def streaming_export(db, file_path):
+    """التصدير المتدفق الجديد"""
+    return ExportManager(db).export_query_to_excel(REPORT_QUERY, (), COLUMNS, file_path, "تقرير")
+
+def measure(func, *args):
+    """الزمن في تشغيل عادي، والذاكرة القصوى (MB) في تشغيل ثانٍ تحت tracemalloc"""
+    started = time.perf_counter()
+    assert func(*args)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+def main(sizes=DEFAULT_SIZES, legacy=True):
+    if legacy and importlib.util.find_spec('pandas') is None:
+        print("pandas غير مثبتة: تُتخطى الطريقة القديمة")
+        legacy = False
+    print(f"{'السجلات':>10} {'قديم (ث)':>10} {'قديم (MB)':>10} {'متدفق (ث)':>10} {'متدفق (MB)':>11}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            cwd = os.getcwd()
+            os.chdir(work_dir)
+            try:
+                db = DatabaseManager(os.path.join(work_dir, "bench.db"))
+                populate(db, size)
+
+                legacy_result = ("---", "---")
+                if legacy and size <= LEGACY_MAX_ROWS:
+                    elapsed, peak = measure(legacy_export, db, os.path.join(work_dir, "legacy.xlsx"))
+                    legacy_result = (f"{elapsed:.2f}", f"{peak:.1f}")
+
+                elapsed, peak = measure(streaming_export, db, os.path.join(work_dir, "streaming.xlsx"))
+                print(f"{size:>10} {legacy_result[0]:>10} {legacy_result[1]:>10} {elapsed:>10.2f} {peak:>11.1f}")
+                db.close()
+            finally:
+                os.chdir(cwd)
+
+if __name__ == "__main__":
+    arguments = [arg for arg in sys.argv[1:] if arg != '--no-legacy']
+    main(tuple(int(arg) for arg in arguments) or DEFAULT_SIZES, legacy='--no-legacy' not in sys.argv)
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_excel_export import populate
+from database import DatabaseManager
+from utils.export_manager import ExportManager
+from utils.file_manager import FileManager
+from utils.phase_timer import PhaseTimer
+from utils.printer import PrinterManager
+
+# ============================================================
+# قياس مراحل بناء النافذة الرئيسية مع قاعدة بيانات بحجم محدد:
+# بناء التبويبات عند أول اختيار لها (الوضع الحالي) مقابل بنائها كلها
+# عند الإنشاء (الوضع السابق)، وزمن تحديث إحصائيات لوحة التحكم في الخلفية
+# يتطلب شاشة (DISPLAY) لإنشاء نوافذ Tk
+# الاستخدام: python benchmarks/bench_main_window.py [عدد السجلات]
+# ============================================================
+
+# أقصى انتظار لانتهاء التحديث في الخلفية بالثواني
+BACKGROUND_TIMEOUT = 60
+
+def pump_until(root, condition, timeout=BACKGROUND_TIMEOUT):
+    """تشغيل حلقة أحداث Tk حتى يتحقق الشرط"""
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        root.update()
+        time.sleep(0.005)
+
+def build_window(db, eager):
+    """إنشاء النافذة الرئيسية وقياس مراحلها، يعيد المؤقت"""
+    import tkinter as tk
+    from gui.main_window import MainWindow
+
+    timer = PhaseTimer()
+    with timer.phase('tk'):
+        root = tk.Tk()
+    export_manager = ExportManager(db)
+    try:
+        window = MainWindow(root, db, FileManager(), export_manager,
+                            PrinterManager(db, export_manager), timer=timer)
+        if eager:
+            for frame in (window.incoming_frame, window.outgoing_frame, window.search_frame):
+                window.ensure_tab(frame)
+        root.update()
+        timer.mark('first_window')
+
+        pump_until(root, lambda: timer.get('statistics_refresh') is not None)
+
+        if not eager:
+            for frame in (window.incoming_frame, window.outgoing_frame, window.search_frame):
+                window.notebook.select(frame)
+                root.update()
+        window.async_db.cancel_all()
+    finally:
+        root.destroy()
+    return timer
+
+def main(record_count=100000):
+    if sys.platform != 'win32' and not os.environ.get('DISPLAY'):
+        print("لا توجد شاشة (DISPLAY)، لا يمكن إنشاء النافذة الرئيسية")
+        return
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            db = DatabaseManager(os.path.join(work_dir, "bench.db"))
+            populate(db, record_count)
+
+            results = {}
+            # التشغيل الأول يملأ ذاكرة الإحصائيات المحفوظة للتشغيلات التالية
+            build_window(db, eager=False)
+            for mode, eager in (('عند الطلب', False), ('عند البدء', True)):
+                results[mode] = dict(build_window(db, eager).report())
+            db.close()
+        finally:
+            os.chdir(cwd)
+
+    phases = []
+    for timings in results.values():
+        phases += [name for name in timings if name not in phases]
+
+    print(f"السجلات: {record_count}")
+    print(f"{'المرحلة':<20}" + "".join(f"{mode:>14}" for mode in results))
+    for name in phases:
+        values = [timings.get(name) for timings in results.values()]
+        print(f"{name:<20}" + "".join(f"{value:>11.1f} ms" if value is not None else f"{'---':>14}"
+                                      for value in values))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
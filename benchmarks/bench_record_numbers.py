@@ -0,0 +1,131 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from sequences import RECORD_PREFIXES, SERIAL_YEAR
+
+# ============================================================
+# اختبار ضغط لتوليد أرقام السجلات مع عدة كُتّاب متزامنين:
+# عدة عمليات، في كل منها عدة خيوط، تسجل سجلات وارد في الوقت نفسه.
+# الطريقة القديمة (قراءة آخر رقم ثم الإدخال) مقابل الحجز الذري من
+# جدول record_sequences، ثم التحقق من عدم وجود أرقام مكررة أو فجوات
+# الاستخدام: python benchmarks/bench_record_numbers.py [العمليات] [الخيوط] [السجلات لكل خيط]
+# ============================================================
+
+YEAR = 2024
+
+def legacy_insert(db, index):
+    """توليد الرقم كما كان في IncomingForm.generate_record_numbers ثم الإدخال"""
+    last_record = db.execute_query(
+        "SELECT record_number FROM incoming_records WHERE record_number LIKE ? ORDER BY id DESC LIMIT 1",
+        (f'IN-{YEAR}-%',)
+    )
+    new_number = int(last_record[0][0].split('-')[-1]) + 1 if last_record else 1
+    last_serial = db.execute_query("SELECT serial_number FROM incoming_records ORDER BY id DESC LIMIT 1")
+    new_serial = int(last_serial[0][0]) + 1 if last_serial else 1
+    return db.execute_query(
+        """INSERT INTO incoming_records (record_number, incoming_number, serial_number, title, registration_date)
+        VALUES (?, ?, ?, ?, ?)""",
+        (f'IN-{YEAR}-{new_number:04d}', str(index), str(new_serial), 'اختبار ضغط', f'{YEAR}-01-01')
+    ) is not None
+
+def sequence_insert(db, index):
+    return db.insert_record('incoming', {
+        'incoming_number': str(index),
+        'title': 'اختبار ضغط',
+        'registration_date': f'{YEAR}-01-01',
+    }, year=YEAR) is not None
+
+METHODS = {'legacy': legacy_insert, 'sequence': sequence_insert}
+
+def run_worker(db_path, method, threads, per_thread, worker_index):
+    """عملية كاتبة: عدة خيوط تسجل سجلات عبر اتصالاتها الخاصة، يعيد عدد الإدخالات الفاشلة"""
+    db = DatabaseManager(db_path, pool_size=threads)
+    insert = METHODS[method]
+    failures = []
+
+    def write(thread_index):
+        failed = 0
+        for n in range(per_thread):
+            if not insert(db, (worker_index * threads + thread_index) * per_thread + n):
+                failed += 1
+        failures.append(failed)
+
+    pool = [threading.Thread(target=write, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    db.close()
+    return sum(failures)
+
+def verify(db):
+    """الأرقام المكررة والفجوات في رقم السجل والرقم التسلسلي"""
+    rows = db.execute_query("SELECT record_number, serial_number FROM incoming_records")
+    numbers = [int(record_number.split('-')[-1]) for record_number, _ in rows]
+    serials = [int(serial) for _, serial in rows]
+    report = {'rows': len(rows)}
+    for name, values in (('record_number', numbers), ('serial_number', serials)):
+        counts = Counter(values)
+        report[f'{name}_duplicates'] = sum(count - 1 for count in counts.values())
+        report[f'{name}_gaps'] = (max(values) - len(counts)) if values else 0
+    return report
+
+def run(method, processes, threads, per_thread):
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            db_path = os.path.join(work_dir, "bench.db")
+            DatabaseManager(db_path).close()
+
+            started = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                failed = sum(executor.map(run_worker, [db_path] * processes, [method] * processes,
+                                          [threads] * processes, [per_thread] * processes, range(processes)))
+            elapsed = time.perf_counter() - started
+
+            db = DatabaseManager(db_path)
+            report = verify(db)
+            if method == 'sequence':
+                report['sequence_value'] = db.execute_query(
+                    "SELECT last_value FROM record_sequences WHERE record_type = 'incoming' AND year = ?", (YEAR,)
+                )[0][0]
+                report['serial_value'] = db.execute_query(
+                    "SELECT last_value FROM record_sequences WHERE record_type = 'incoming' AND year = ?",
+                    (SERIAL_YEAR,)
+                )[0][0]
+            db.close()
+        finally:
+            os.chdir(cwd)
+
+    report.update(failed=failed, seconds=elapsed, per_second=report['rows'] / elapsed)
+    return report
+
+def main(processes=4, threads=4, per_thread=250):
+    attempts = processes * threads * per_thread
+    print(f"{processes} عمليات × {threads} خيوط × {per_thread} سجل = {attempts} محاولة إدخال ({RECORD_PREFIXES['incoming']})")
+    ok = True
+    for method in METHODS:
+        report = run(method, processes, threads, per_thread)
+        print(f"\n{method}:")
+        for key, value in report.items():
+            print(f"  {key:<28} {value:.1f}" if isinstance(value, float) else f"  {key:<28} {value}")
+        if method == 'sequence':
+            ok = (report['rows'] == attempts and report['failed'] == 0
+                  and report['record_number_duplicates'] == report['record_number_gaps'] == 0
+                  and report['serial_number_duplicates'] == report['serial_number_gaps'] == 0
+                  and report['sequence_value'] == report['serial_value'] == attempts)
+    print("\nالحجز الذري: " + ("لا تكرار ولا فجوات" if ok else "فشل التحقق"))
+    return ok
+
+if __name__ == "__main__":
+    arguments = [int(arg) for arg in sys.argv[1:]]
+    sys.exit(0 if main(*arguments) else 1)
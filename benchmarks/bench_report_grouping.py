@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_excel_export import populate
+from database import DatabaseManager
+from report_engine import ReportSpec, aggregate_report
+from utils.export_manager import ExportManager
+
+# ============================================================
+# قياس التقارير المجمعة: الطريقة القديمة (جلب جميع صفوف التقرير ثم
+# العد في قاموس ببايثون) مقابل التجميع داخل SQLite، والتحقق من تطابق
+# الأعداد، وزمن الجدول المحوري (الجهة × الشهر) بعدة مقاييس
+# الاستخدام: python benchmarks/bench_report_grouping.py [عدد السجلات]
+# ============================================================
+
+START_DATE, END_DATE = '2020-01-01', '2024-12-31'
+
+def legacy_grouping(db, column):
+    """كما كان في ReportsWindow.fetch_report و apply_grouping"""
+    data, _ = ExportManager(db).generate_incoming_report(START_DATE, END_DATE)
+    grouped = {}
+    for row in data:
+        key = row[-1][:7] if column == 'month' else row[column]
+        grouped[key] = grouped.get(key, 0) + 1
+    return grouped
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+def main(record_count=200000):
+    with tempfile.TemporaryDirectory() as work_dir:
+        cwd = os.getcwd()
+        os.chdir(work_dir)
+        try:
+            db = DatabaseManager(os.path.join(work_dir, "bench.db"))
+            populate(db, record_count)
+
+            ok = True
+            print(f"السجلات: {record_count}")
+            print(f"{'التجميع':<12}{'القديم':>14}{'SQLite':>14}{'الصفوف':>10}")
+            for group_by, column in (('source', 4), ('type', 5), ('month', 'month')):
+                legacy, legacy_ms = timed(legacy_grouping, db, column)
+                spec = ReportSpec('incoming', group_by, start_date=START_DATE, end_date=END_DATE)
+                (rows, _), engine_ms = timed(aggregate_report, db, spec)
+                ok = ok and dict(rows) == {key if key is not None else 'غير محدد': count
+                                           for key, count in legacy.items()}
+                print(f"{group_by:<12}{legacy_ms:>11.1f} ms{engine_ms:>11.1f} ms{len(rows):>10}")
+
+            spec = ReportSpec('incoming', 'source', 'month', ['count', 'first_date', 'last_date'],
+                              START_DATE, END_DATE)
+            (rows, columns), pivot_ms = timed(aggregate_report, db, spec)
+            print(f"\nالجهة × الشهر بثلاثة مقاييس: {pivot_ms:.1f} ms، {len(rows)} صف × {len(columns)} عمود")
+            db.close()
+        finally:
+            os.chdir(cwd)
+
+    print("الأعداد متطابقة" if ok else "الأعداد غير متطابقة")
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000) else 1)
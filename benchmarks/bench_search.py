@@ -0,0 +1,118 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from search_index import build_match_query, match_condition, rank_expression, search_join
+
+# ============================================================
+# قياس زمن البحث مع زيادة عدد السجلات:
+# البحث القديم بـ LIKE '%نص%' على عدة أعمدة مقابل فهرس FTS5
+# ============================================================
+
+WORDS = ['كتاب', 'تعميم', 'الإدارة', 'المالية', 'طلب', 'تقرير', 'اجتماع', 'الموارد', 'البشرية',
+         'مشروع', 'صيانة', 'عقد', 'الهيئة', 'العامة', 'للتخطيط', 'محضر', 'لجنة', 'ميزانية', 'السنة',
+         'شؤون', 'الموظفين']
+
+# كلمات نادرة (حوالي 1% من السجلات) بأشكال إملائية مختلفة لقياس بحث انتقائي
+RARE_WORDS = ['مُناقصة', 'إجازة', 'توريد', 'مراسلة']
+RARE_RATIO = 0.01
+
+# أشكال البحث تختلف عن المخزنة أحياناً: LIKE لا يجدها والتطبيع يجدها
+SEARCH_TERMS = ['مناقصه', 'اجازة', 'توريد', 'IN-5']
+
+# استعلامات البحث القديمة كما كانت في MainWindow.perform_search
+LIKE_QUERIES = {
+    'incoming': """SELECT '📥 وارد', record_number, incoming_number, serial_number, title, registration_date, id, 'incoming'
+        FROM incoming_records
+        WHERE record_number LIKE ? OR incoming_number LIKE ? OR serial_number LIKE ?
+           OR title LIKE ? OR details LIKE ?""",
+    'outgoing': """SELECT '📤 صادر', record_number, outgoing_number, serial_number, title, registration_date, id, 'outgoing'
+        FROM outgoing_records
+        WHERE record_number LIKE ? OR outgoing_number LIKE ? OR serial_number LIKE ?
+           OR title LIKE ? OR details LIKE ?""",
+}
+
+FTS_QUERIES = {
+    'incoming': f"""SELECT '📥 وارد', ir.record_number, ir.incoming_number, ir.serial_number, ir.title,
+               ir.registration_date, ir.id, 'incoming'
+        FROM {search_join('incoming', 'ir')}
+        WHERE {match_condition('incoming')}
+        ORDER BY {rank_expression('incoming')}""",
+    'outgoing': f"""SELECT '📤 صادر', orc.record_number, orc.outgoing_number, orc.serial_number, orc.title,
+               orc.registration_date, orc.id, 'outgoing'
+        FROM {search_join('outgoing', 'orc')}
+        WHERE {match_condition('outgoing')}
+        ORDER BY {rank_expression('outgoing')}""",
+}
+
+def sentence(rng, length):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    if rng.random() < RARE_RATIO:
+        words[rng.randrange(length)] = rng.choice(RARE_WORDS)
+    return " ".join(words)
+
+def populate(db, record_count):
+    """إنشاء سجلات وارد وصادر بعناوين وتفاصيل عربية"""
+    rng = random.Random(record_count)
+    incoming, outgoing = [], []
+    for n in range(record_count // 2):
+        date = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        incoming.append((f"IN-{n}", str(n), str(n), sentence(rng, 5), sentence(rng, 40), date))
+        outgoing.append((f"OUT-{n}", str(n), str(n), sentence(rng, 5), sentence(rng, 40), date))
+
+    db.execute_many(
+        """INSERT INTO incoming_records (record_number, incoming_number, serial_number, title,
+        details, registration_date) VALUES (?, ?, ?, ?, ?, ?)""",
+        incoming
+    )
+    db.execute_many(
+        """INSERT INTO outgoing_records (record_number, outgoing_number, serial_number, title,
+        details, registration_date) VALUES (?, ?, ?, ?, ?, ?)""",
+        outgoing
+    )
+
+def like_search(db, term):
+    """الطريقة القديمة: LIKE بحرف بدل في البداية على خمسة أعمدة"""
+    pattern = f"%{term}%"
+    return sum(len(db.execute_query(query, [pattern] * 5)) for query in LIKE_QUERIES.values())
+
+def fts_search(db, term):
+    """الطريقة الجديدة: فهرس FTS5 مع ترتيب bm25"""
+    match = build_match_query(term)
+    return sum(len(db.execute_query(query, [match])) for query in FTS_QUERIES.values())
+
+def timed(func, *args, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(sizes=(10000, 50000, 100000)):
+    print(f"{'السجلات':>10} {'نص البحث':>12} {'LIKE':>10} {'FTS5':>10} {'نتائج LIKE':>11} {'نتائج FTS5':>11}  (بالثواني)")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as work_dir:
+            cwd = os.getcwd()
+            os.chdir(work_dir)
+            try:
+                db = DatabaseManager(os.path.join(work_dir, "bench.db"))
+                populate(db, size)
+
+                for term in SEARCH_TERMS:
+                    like_time, like_count = timed(like_search, db, term)
+                    fts_time, fts_count = timed(fts_search, db, term)
+                    print(f"{size:>10} {term:>12} {like_time:>10.4f} {fts_time:>10.4f} {like_count:>11} {fts_count:>11}")
+                db.close()
+            finally:
+                os.chdir(cwd)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ============================================================
+# قياس زمن بدء التشغيل حتى ظهور النافذة الأولى:
+# 1) زمن استيراد main.py مع تفصيل -X importtime لأبطأ الوحدات
+# 2) زمن إنشاء التطبيق حتى رسم النافذة الرئيسية مع أزمنة مراحله من
+#    app.timer (يتطلب شاشة)
+# كل قياس يعمل في عملية جديدة ليكون الاستيراد بارداً، ويُقارن بالوضع
+# السابق الذي كانت تُستورد فيه مكتبات التصدير عند البدء (--eager)
+# الاستخدام: python benchmarks/bench_startup.py [عدد التكرارات]
+# ============================================================
+
+# المكتبات التي كانت تُستورد عند البدء قبل التحميل عند الطلب
+EAGER_MODULES = ('pandas', 'openpyxl', 'docx', 'reportlab.platypus')
+
+IMPORT_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+if {eager}:
+    for module in {modules!r}:
+        __import__(module)
+import main
+print(time.perf_counter() - started)
+"""
+
+WINDOW_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+if {eager}:
+    for module in {modules!r}:
+        __import__(module)
+import main
+app = main.CorrespondenceManagementSystem()
+app.root.update()
+print(time.perf_counter() - started)
+app.root.destroy()
+"""
+
+PHASES_SCRIPT = """
+import main
+app = main.CorrespondenceManagementSystem()
+app.root.update()
+print(app.timer.summary())
+app.root.destroy()
+"""
+
+def run_python(command_args, work_dir):
+    """تشغيل Python في عملية جديدة من مجلد العمل، يعيد آخر سطر من المخرجات ومخرجات الأخطاء"""
+    env = dict(os.environ, PYTHONPATH=ROOT, PYTHONDONTWRITEBYTECODE='')
+    result = subprocess.run([sys.executable] + command_args, cwd=work_dir, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return result.stdout.strip().splitlines()[-1], result.stderr
+
+def run_script(script, eager, work_dir, importtime=False):
+    """تشغيل قياس في عملية جديدة، يعيد (الزمن بالثواني، مخرجات importtime)"""
+    command_args = ['-X', 'importtime'] if importtime else []
+    command_args += ['-c', script.format(eager=eager, modules=EAGER_MODULES)]
+    last_line, stderr = run_python(command_args, work_dir)
+    return float(last_line), stderr
+
+def slowest_imports(importtime_output, count=10):
+    """أبطأ الوحدات المستوردة حسب الزمن التراكمي (بالمللي ثانية)"""
+    modules = []
+    for line in importtime_output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:count]
+
+def best_of(script, eager, work_dir, repeat):
+    return min(run_script(script, eager, work_dir)[0] for _ in range(repeat))
+
+def main(repeat=3):
+    with tempfile.TemporaryDirectory() as work_dir:
+        print("زمن استيراد main.py (أفضل من %d تشغيلات):" % repeat)
+        lazy = best_of(IMPORT_SCRIPT, False, work_dir, repeat)
+        eager = best_of(IMPORT_SCRIPT, True, work_dir, repeat)
+        print(f"  {'عند الطلب':<12} {lazy:>8.3f} ث")
+        print(f"  {'عند البدء':<12} {eager:>8.3f} ث")
+
+        print("\nأبطأ الوحدات المستوردة (تراكمي، مللي ثانية):")
+        _, output = run_script(IMPORT_SCRIPT, False, work_dir, importtime=True)
+        for cumulative, name in slowest_imports(output):
+            print(f"  {cumulative:>8.1f}  {name}")
+
+        print("\nزمن ظهور النافذة الأولى:")
+        if sys.platform != 'win32' and not os.environ.get('DISPLAY'):
+            print("  لا توجد شاشة (DISPLAY)، تم تخطي القياس")
+            return
+        lazy = best_of(WINDOW_SCRIPT, False, work_dir, repeat)
+        eager = best_of(WINDOW_SCRIPT, True, work_dir, repeat)
+        print(f"  {'عند الطلب':<12} {lazy:>8.3f} ث")
+        print(f"  {'عند البدء':<12} {eager:>8.3f} ث")
+
+        print("\nأزمنة مراحل البدء:")
+        print(f"  {run_python(['-c', PHASES_SCRIPT], work_dir)[0]}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
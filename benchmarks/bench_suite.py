@@ -0,0 +1,279 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_data import DEFAULT_SEED, SIZES, generate_dataset, parse_size, print_progress
+from database import DatabaseManager
+from report_engine import ReportSpec, aggregate_report
+from search_index import build_match_query, match_condition, rank_expression, search_join
+from utils.export_manager import ExportManager
+from utils.file_manager import FileManager
+from utils.statistics_service import StatisticsService
+
+# ============================================================
+# قياس شامل على بيانات تجريبية بحجم الإنتاج (benchmarks/synthetic_data.py):
+# دوال التقارير الفعلية في ExportManager والتقارير المجمعة والتصدير إلى Excel،
+# واستعلامات البحث كما في SearchWindow، وإحصائيات لوحة التحكم، ومسار حفظ
+# السجل مع مرفق. البيانات تُولد مرة واحدة لكل (حجم، بذرة) وتُحفظ في --data-dir،
+# وكل تشغيل يعمل على نسخة منها فلا تؤثر عمليات الحفظ في التشغيلات التالية.
+# النتائج تُكتب في ملف JSON ويمكن مقارنتها بنتائج تشغيل سابق عبر --compare
+# (التراجع: وسيط أبطأ بأكثر من --tolerance وبما لا يقل عن --min-delta-ms)
+#
+# الاستخدام:
+#   python benchmarks/bench_suite.py --size 1m --output before.json
+#   python benchmarks/bench_suite.py --size 1m --compare before.json --output after.json
+# ============================================================
+
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'correspondence_bench')
+
+# عدد السجلات المحفوظة في كل تشغيل لحالات الحفظ
+SAVE_COUNT = 50
+
+# نسبة التباطؤ التي تُعد تراجعاً عند المقارنة
+DEFAULT_TOLERANCE = 0.10
+
+# أقل زيادة بالمللي ثانية تُعد تراجعاً، حتى لا يُعد تذبذب الحالات السريعة جداً تراجعاً
+DEFAULT_MIN_DELTA_MS = 1.0
+
+class BenchmarkContext:
+    """قاعدة البيانات ومديرو التطبيق وفترات التقارير لحالات القياس"""
+
+    def __init__(self, db, work_dir):
+        self.db = db
+        self.work_dir = work_dir
+        self.export_manager = ExportManager(db)
+        self.file_manager = FileManager(os.path.join(work_dir, 'attachments'))
+        self.saved = 0
+
+        # الفترات نسبة إلى آخر تاريخ في البيانات لا إلى تاريخ التشغيل
+        last_date = db.execute_query("SELECT MAX(registration_date) FROM incoming_records")[0][0]
+        self.year = last_date[:4]
+        self.year_range = (f"{self.year}-01-01", f"{self.year}-12-31")
+        self.month_range = (f"{last_date[:7]}-01", f"{last_date[:7]}-31")
+        self.employee_id = db.execute_query(
+            "SELECT employee_id FROM incoming_records GROUP BY employee_id ORDER BY COUNT(*) DESC LIMIT 1"
+        )[0][0]
+        self.record_number = db.execute_query("SELECT MIN(record_number) FROM incoming_records")[0][0]
+
+    def search(self, text, record_type='incoming', date_range=None, employee_id=None):
+        """استعلام البحث كما يبنيه SearchWindow.build_search_query"""
+        alias = 'ir' if record_type == 'incoming' else 'orc'
+        match = build_match_query(text)
+        query = f"""SELECT {alias}.record_number, {alias}.title, {alias}.employee_id, {alias}.registration_date, {alias}.id
+        FROM {search_join(record_type, alias)}
+        WHERE {match_condition(record_type)}"""
+        params = [match]
+        if date_range:
+            query += f" AND {alias}.registration_date BETWEEN ? AND ?"
+            params.extend(date_range)
+        if employee_id:
+            query += f" AND {alias}.employee_id IN (?)"
+            params.append(employee_id)
+        query += f" ORDER BY {rank_expression(record_type)}"
+        return len(self.db.execute_query(query, params) or [])
+
+    def save_records(self, with_attachment):
+        """حفظ سجلات وارد جديدة كما في IncomingForm.save_record (مع مرفق لكل سجل اختيارياً)"""
+        for _ in range(SAVE_COUNT):
+            self.saved += 1
+            values = {'incoming_number': f"B-{self.saved}", 'title': f"سجل قياس رقم {self.saved}",
+                      'incoming_source_id': 1, 'incoming_type_id': 1, 'employee_id': self.employee_id,
+                      'specialization_id': 1, 'registration_date': self.month_range[0], 'details': "تفاصيل سجل القياس"}
+            pending = []
+            if with_attachment:
+                source_path = os.path.join(self.work_dir, f"مرفق_{self.saved}.pdf")
+                with open(source_path, 'wb') as f:
+                    f.write(b'%PDF-1.7\n' + str(self.saved).encode() * 2000)
+                pending.append(source_path)
+            with self.db.unit_of_work(self.file_manager) as work:
+                staged = [work.stage_file(path) for path in pending]
+                record_id, _, _ = work.insert_record('incoming', values, int(self.year))
+                for saved_file in staged:
+                    work.add_attachment(record_id, 'incoming', saved_file)
+        return SAVE_COUNT
+
+def export_month_to_excel(ctx):
+    data, columns = ctx.export_manager.generate_incoming_report(*ctx.month_range)
+    ctx.export_manager.export_to_excel(data, columns, os.path.join(ctx.work_dir, "report.xlsx"))
+    return len(data)
+
+# (الاسم، الوصف، الدالة): الدالة تعيد عدد الصفوف أو العمليات
+CASES = [
+    ('report_incoming_month', "تقرير الوارد لآخر شهر",
+     lambda ctx: len(ctx.export_manager.generate_incoming_report(*ctx.month_range)[0])),
+    ('report_incoming_year', "تقرير الوارد لآخر سنة",
+     lambda ctx: len(ctx.export_manager.generate_incoming_report(*ctx.year_range)[0])),
+    ('report_outgoing_year', "تقرير الصادر لآخر سنة",
+     lambda ctx: len(ctx.export_manager.generate_outgoing_report(*ctx.year_range)[0])),
+    ('report_employees_year', "تقرير الموظفين لآخر سنة",
+     lambda ctx: len(ctx.export_manager.generate_employee_report(*ctx.year_range)[0])),
+    ('report_grouped_source_month', "الوارد حسب الجهة × الشهر لآخر سنة",
+     lambda ctx: len(aggregate_report(ctx.db, ReportSpec('incoming', 'source', 'month', ['count'], *ctx.year_range))[0])),
+    ('export_excel_month', "تصدير تقرير الوارد لآخر شهر إلى Excel", export_month_to_excel),
+    ('search_common_word', "بحث بكلمة شائعة", lambda ctx: ctx.search("الموازنة")),
+    ('search_rare_word', "بحث بكلمة أقل شيوعاً بإملاء مختلف", lambda ctx: ctx.search("التراخيص تجديد")),
+    ('search_record_number', "بحث برقم سجل", lambda ctx: ctx.search(ctx.record_number)),
+    ('search_filtered', "بحث بكلمة مع فترة وموظف", lambda ctx: ctx.search("طلب", date_range=ctx.year_range,
+                                                                         employee_id=ctx.employee_id)),
+    ('dashboard_statistics', "إحصائيات لوحة التحكم (بدون ذاكرة)",
+     lambda ctx: len(StatisticsService(ctx.db).refresh())),
+    ('save_record', f"حفظ {SAVE_COUNT} سجل وارد", lambda ctx: ctx.save_records(False)),
+    ('save_record_with_attachment', f"حفظ {SAVE_COUNT} سجل وارد مع مرفق", lambda ctx: ctx.save_records(True)),
+]
+
+def dataset_path(data_dir, record_count, seed):
+    return os.path.join(data_dir, f"synthetic_{record_count}_{seed}.db")
+
+def prepare_dataset(data_dir, record_count, seed):
+    """قاعدة البيانات التجريبية المحفوظة لهذا الحجم والبذرة، تُولد إن لم تكن موجودة
+
+    التوليد يتم باسم مؤقت ثم يُعاد التسمية، فلا يُستخدم ملف ناقص من تشغيل منقطع
+    """
+    path = dataset_path(data_dir, record_count, seed)
+    summary_path = path + '.json'
+    if os.path.exists(path) and os.path.exists(summary_path):
+        with open(summary_path, encoding='utf-8') as f:
+            return path, json.load(f)
+
+    partial_path = path + '.partial'
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(partial_path + suffix):
+            os.remove(partial_path + suffix)
+    print(f"توليد {record_count} سجل (البذرة {seed}) في {path}")
+    summary = generate_dataset(partial_path, record_count, seed, print_progress,
+                               attachments_dir=path[:-len('.db')] + '_attachments')
+    os.replace(partial_path, path)
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return path, summary
+
+def environment():
+    """بيانات البيئة لتفسير الفروق بين التشغيلات"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+def run_case(ctx, func, repeat):
+    """تشغيل الحالة عدة مرات: الأزمنة بالمللي ثانية وعدد الصفوف في آخر تشغيل"""
+    runs = []
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = func(ctx)
+        runs.append(round((time.perf_counter() - started) * 1000, 3))
+    return {
+        'rows': rows,
+        'runs_ms': runs,
+        'median_ms': round(statistics.median(runs), 3),
+        'min_ms': min(runs),
+        'max_ms': max(runs),
+    }
+
+def run_suite(dataset, repeat, selected=None):
+    """تشغيل الحالات على نسخة من قاعدة البيانات التجريبية"""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "bench.db")
+        shutil.copyfile(os.path.abspath(dataset), db_path)
+        db = DatabaseManager(db_path)
+        try:
+            ctx = BenchmarkContext(db, work_dir)
+            for name, description, func in CASES:
+                if selected and name not in selected:
+                    continue
+                results[name] = dict(run_case(ctx, func, repeat), description=description)
+                print(f"{name:<30}{results[name]['median_ms']:>12.1f} ms{results[name]['rows']:>10}")
+        finally:
+            db.close()
+    return results
+
+def compare(current, baseline, tolerance, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """مقارنة الوسيط بتشغيل سابق: يعيد أسماء الحالات التي تباطأت أكثر من tolerance
+    وبما لا يقل عن min_delta_ms مللي ثانية
+    """
+    if current['dataset'].get('records') != baseline['dataset'].get('records') or \
+            current['dataset'].get('seed') != baseline['dataset'].get('seed'):
+        print("تحذير: التشغيلان على بيانات مختلفة (الحجم أو البذرة) والمقارنة غير دقيقة")
+
+    regressions = []
+    print(f"\n{'الحالة':<30}{'السابق':>12}{'الحالي':>12}{'التغير':>10}")
+    for name, result in current['cases'].items():
+        previous = baseline['cases'].get(name)
+        if not previous:
+            continue
+        delta = result['median_ms'] - previous['median_ms']
+        change = delta / previous['median_ms'] if previous['median_ms'] else 0
+        marker = ''
+        if change > tolerance and delta >= min_delta_ms:
+            regressions.append(name)
+            marker = ' ⚠'
+        print(f"{name:<30}{previous['median_ms']:>9.1f} ms{result['median_ms']:>9.1f} ms{change:>+10.1%}{marker}")
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="قياس شامل لأداء نظام إدارة المراسلات على بيانات تجريبية")
+    parser.add_argument('--size', default='10k', help=f"عدد السجلات أو أحد الأحجام: {', '.join(SIZES)}")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="مجلد البيانات التجريبية المحفوظة")
+    parser.add_argument('--repeat', type=int, default=5, help="عدد مرات تشغيل كل حالة")
+    parser.add_argument('--cases', help=f"حالات محددة مفصولة بفواصل: {', '.join(name for name, _, _ in CASES)}")
+    parser.add_argument('--output', help="ملف JSON للنتائج")
+    parser.add_argument('--compare', help="ملف JSON لتشغيل سابق للمقارنة")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="نسبة التباطؤ المقبولة")
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help="أقل زيادة بالمللي ثانية تُعد تراجعاً")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    record_count = parse_size(args.size)
+    selected = {name.strip() for name in args.cases.split(',')} if args.cases else None
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    dataset, summary = prepare_dataset(args.data_dir, record_count, args.seed)
+
+    print(f"السجلات: {record_count} | البذرة: {args.seed} | التكرار: {args.repeat}")
+    report = {
+        'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'environment': environment(),
+        'dataset': summary,
+        'repeat': args.repeat,
+        'cases': run_suite(dataset, args.repeat, selected),
+    }
+
+    output = args.output or f"bench_suite_{record_count}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"النتائج: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"تراجع في الأداء: {', '.join(regressions)}")
+            return False
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,404 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from itertools import accumulate
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from migrations import RECOMPUTE_EMPLOYEE_COUNTERS
+from search_index import RECORD_TABLES, rebuild_statements
+from sequences import SERIAL_YEAR, format_record_number
+from utils.file_manager import FileManager
+
+# ============================================================
+# توليد بيانات تجريبية بحجم الإنتاج بشكل حتمي: البذرة نفسها والحجم نفسه
+# ينتجان قاعدة البيانات نفسها في كل مرة، فتُقارن نتائج القياس بين التشغيلات.
+# عناوين وتفاصيل عربية واقعية، وتوزيع غير متساوٍ للجهات والموظفين (بعضها
+# يستقبل أغلب المراسلات)، وتواريخ على عدة سنوات بأيام العمل فقط مع نمو سنوي
+# وموسمية شهرية، ومرفقات بملفات حقيقية في مخزن الملفات حسب المحتوى.
+# الأرقام تُعطى بالترتيب الزمني كما في الاستخدام الفعلي، وعدادات record_sequences
+# تُضبط بعدها فيكمل التطبيق الترقيم بعد آخر سجل مولد.
+# أثناء التحميل تُعلق مشغلات الإدخال ثم يُعاد بناء فهرس البحث والعدادات مرة واحدة
+#
+# الاستخدام: python benchmarks/synthetic_data.py data/bench_1m.db --size 1m [--seed 2024]
+# ============================================================
+
+SIZES = {'10k': 10000, '1m': 1000000, '10m': 10000000}
+
+DEFAULT_SEED = 2024
+
+# نسبة الوارد من مجموع السجلات
+INCOMING_SHARE = 0.6
+
+# الجمعة والسبت
+WEEKEND = (4, 5)
+
+# نمو عدد المراسلات من سنة إلى التالية، ومعامل كل شهر
+YEAR_GROWTH = 1.12
+MONTH_SEASONALITY = [1.0, 1.05, 1.1, 1.0, 0.95, 0.9, 0.7, 0.6, 1.0, 1.1, 1.15, 1.2]
+
+# حدة عدم التساوي (Zipf): كلما زادت استحوذت القيم الأولى على نسبة أكبر
+ENTITY_SKEW = 1.1
+EMPLOYEE_SKEW = 0.9
+SPECIALIZATION_SKEW = 0.6
+TOPIC_SKEW = 0.8
+BLOB_SKEW = 1.0
+
+SOURCE_KINDS = ['وزارة', 'هيئة', 'مؤسسة', 'شركة', 'جامعة', 'مستشفى', 'بلدية', 'مديرية']
+DESTINATION_KINDS = ['وزارة', 'هيئة', 'مؤسسة', 'شركة', 'بنك', 'مكتب']
+DOMAINS = ['الصحة', 'التعليم', 'المالية', 'الداخلية', 'العدل', 'النقل', 'الاتصالات', 'الطاقة', 'الزراعة',
+           'الإسكان', 'الثقافة', 'السياحة', 'الموارد المائية', 'التجارة', 'الصناعة', 'العمل',
+           'الشؤون الاجتماعية', 'البيئة', 'الشباب والرياضة', 'التخطيط']
+
+INCOMING_TYPES = [('خطاب رسمي', 40), ('مذكرة', 20), ('تقرير', 10), ('بريد إلكتروني', 5), ('إيميل', 12),
+                  ('فاكس', 5), ('تعميم', 5), ('دعوة', 3)]
+
+SPECIALIZATIONS = ['إداري', 'مالي', 'تقني', 'قانوني', 'تسويقي', 'موارد بشرية', 'مشتريات', 'علاقات عامة']
+
+FIRST_NAMES = ['أحمد', 'محمد', 'فاطمة', 'خالد', 'سارة', 'عبدالله', 'مريم', 'يوسف', 'نورة', 'علي', 'هدى',
+               'إبراهيم', 'عائشة', 'حسن', 'ليلى', 'عمر', 'زينب', 'مصطفى', 'رقية', 'سعيد']
+LAST_NAMES = ['العلي', 'الحسن', 'الأحمد', 'السيد', 'عبدالرحمن', 'المصري', 'الخطيب', 'النجار', 'الحداد',
+              'الشامي', 'القاسم', 'يوسف']
+DEPARTMENTS = ['الإدارة', 'الشؤون المالية', 'التقنية', 'الشؤون الإدارية', 'التسويق', 'الشؤون القانونية',
+               'الموارد البشرية', 'المشتريات']
+POSITIONS = ['مدير', 'رئيس قسم', 'موظف', 'محاسب', 'سكرتير', 'مطور نظم', 'مستشار']
+
+SUBJECTS = ['طلب', 'كتاب', 'تعميم', 'محضر اجتماع', 'إشعار', 'تقرير', 'دعوة', 'مذكرة', 'استفسار', 'رد على كتاب']
+TOPICS = ['بخصوص صيانة أجهزة الحاسب', 'بشأن الموازنة السنوية', 'حول تعيين موظفين جدد',
+          'بخصوص مناقصة توريد أثاث مكتبي', 'بشأن الإجازات السنوية', 'حول تحديث أنظمة المعلومات',
+          'بخصوص تدقيق الحسابات الختامية', 'بشأن عقد الخدمات الاستشارية', 'حول خطة التدريب',
+          'بخصوص أمن المعلومات', 'بشأن تجديد التراخيص', 'حول تقييم الأداء الوظيفي',
+          'بخصوص المشاركة في المؤتمر', 'بشأن صرف المستحقات المالية', 'حول ترشيد استهلاك الطاقة',
+          'بخصوص توريد المستلزمات الطبية', 'بشأن مشروع التحول الرقمي', 'حول تنظيم الأرشيف']
+SENTENCES = ['نرفق لكم طيه المستندات المطلوبة لاستكمال الإجراءات.',
+             'يرجى التكرم بالاطلاع واتخاذ ما ترونه مناسباً.',
+             'وذلك بناءً على التوجيهات الصادرة من الإدارة العليا.',
+             'نأمل التنسيق مع الجهات المعنية لإنجاز المطلوب في الوقت المحدد.',
+             'علماً بأن آخر موعد لاستلام الطلبات هو نهاية الشهر الجاري.',
+             'وقد تمت مراجعة الموضوع من قبل اللجنة المختصة.',
+             'نود إفادتكم بأنه تمت الموافقة على الطلب المقدم.',
+             'نرجو تزويدنا بالبيانات اللازمة في أقرب وقت ممكن.',
+             'وتقبلوا فائق الاحترام والتقدير.',
+             'مع مراعاة الأنظمة والتعليمات المعمول بها.',
+             'حيث تبين وجود بعض الملاحظات التي تستوجب المعالجة.',
+             'وسيتم عقد اجتماع لمناقشة التفاصيل مع الأطراف ذات العلاقة.',
+             'ونظراً لأهمية الموضوع نأمل إعطاءه الأولوية.',
+             'تجدون مرفقاً جدولاً بالتكاليف التقديرية.',
+             'بالإشارة إلى الاتصال الهاتفي بهذا الخصوص.']
+
+# امتداد الملف وبداية محتواه ونسبته بين المرفقات
+FILE_TYPES = [('.pdf', b'%PDF-1.7\n', 60), ('.docx', b'PK\x03\x04', 20), ('.jpg', b'\xff\xd8\xff\xe0', 15),
+              ('.xlsx', b'PK\x03\x04', 5)]
+
+# حجم ملف المرفق: متوسط لوغاريتمي حوالي 60KB بحد أقصى 2MB
+BLOB_SIZE_MU = 11.0
+BLOB_SIZE_SIGMA = 1.0
+BLOB_MAX_SIZE = 2 * 1024 * 1024
+
+INCOMING_INSERT = """INSERT INTO incoming_records (id, record_number, incoming_number, serial_number, title,
+    incoming_source_id, incoming_type_id, employee_id, specialization_id, registration_date, details, created_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+OUTGOING_INSERT = """INSERT INTO outgoing_records (id, record_number, outgoing_number, serial_number, title,
+    outgoing_destination_id, employee_id, specialization_id, registration_date, details, created_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+ATTACHMENT_INSERT = """INSERT INTO attachments (record_id, record_type, file_name, file_path, file_size, file_type,
+    file_mtime, blob_hash, upload_date, file_status, verified_date)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'ok', ?)"""
+
+def parse_size(text):
+    """عدد السجلات من اسم حجم (10k, 1m, 10m) أو رقم"""
+    text = str(text).strip().lower()
+    if text in SIZES:
+        return SIZES[text]
+    return int(text.replace('_', ''))
+
+def zipf_weights(count, skew):
+    """أوزان تراكمية غير متساوية: العنصر رقم k وزنه 1 / k^skew"""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+def working_days(first_year, last_year):
+    """أيام العمل في السنوات المطلوبة ووزن كل يوم (النمو السنوي × موسمية الشهر)"""
+    days, weights = [], []
+    day = date(first_year, 1, 1)
+    while day.year <= last_year:
+        if day.weekday() not in WEEKEND:
+            days.append(day)
+            weights.append(YEAR_GROWTH ** (day.year - first_year) * MONTH_SEASONALITY[day.month - 1])
+        day += timedelta(days=1)
+    return days, weights
+
+def allocate(total, weights):
+    """توزيع عدد صحيح على الأوزان بمجموع مطابق تماماً (طريقة أكبر الباقي)"""
+    scale = total / sum(weights)
+    shares = [weight * scale for weight in weights]
+    counts = [int(share) for share in shares]
+    remainder = total - sum(counts)
+    for index in sorted(range(len(shares)), key=lambda i: counts[i] - shares[i])[:remainder]:
+        counts[index] += 1
+    return counts
+
+@contextmanager
+def suspended_insert_triggers(conn, tables):
+    """تعليق مشغلات الإدخال (فهرس البحث والعدادات ومراجع الملفات) أثناء التحميل المجمع
+
+    تُعاد المشغلات كما كانت ثم يُعاد حساب ما كانت تحدثه دفعة واحدة
+    """
+    placeholders = ", ".join("?" * len(tables))
+    triggers = conn.execute(
+        f"""SELECT name, sql FROM sqlite_master
+        WHERE type = 'trigger' AND tbl_name IN ({placeholders}) AND name LIKE '%\\_insert' ESCAPE '\\'""",
+        tables
+    ).fetchall()
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    conn.commit()
+    try:
+        yield
+    finally:
+        for _, sql in triggers:
+            conn.execute(sql)
+        conn.commit()
+
+class SyntheticDataGenerator:
+    """توليد سجلات الوارد والصادر والمرفقات في قاعدة بيانات فارغة"""
+
+    def __init__(self, db_manager, record_count, seed=DEFAULT_SEED, attachments_dir=None,
+                 attachment_ratio=0.15, blob_count=200, first_year=2015, last_year=2024, batch_size=50000):
+        self.db_manager = db_manager
+        self.record_count = record_count
+        self.seed = seed
+        self.attachments_dir = attachments_dir or os.path.join(
+            os.path.dirname(os.path.abspath(db_manager.db_path)), 'attachments')
+        self.attachment_ratio = attachment_ratio
+        self.blob_count = blob_count
+        self.first_year = first_year
+        self.last_year = last_year
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+
+    def generate(self, progress=None):
+        """توليد البيانات كاملة: يعيد ملخصاً بالأعداد والزمن (يُحفظ مع نتائج القياس)"""
+        started = time.perf_counter()
+        with self.db_manager.pool.connection() as conn:
+            if conn.execute("SELECT EXISTS (SELECT 1 FROM incoming_records) "
+                            "OR EXISTS (SELECT 1 FROM outgoing_records)").fetchone()[0]:
+                raise ValueError(f"قاعدة البيانات تحتوي على سجلات: {self.db_manager.db_path}")
+
+            conn.execute("PRAGMA synchronous = OFF")
+            self.create_references(conn)
+            self.create_blobs(conn)
+            conn.commit()
+
+            with suspended_insert_triggers(conn, list(RECORD_TABLES.values()) + ['attachments']):
+                counts = self.insert_records(conn, progress)
+
+            if progress:
+                progress(self.record_count, self.record_count, "إعادة بناء فهرس البحث والعدادات")
+            self.rebuild_derived(conn)
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA optimize")
+
+        return dict(counts, seed=self.seed, records=self.record_count, blobs=len(self.blobs),
+                    years=[self.first_year, self.last_year], seconds=round(time.perf_counter() - started, 2))
+
+    def create_references(self, conn):
+        """الجهات والأنواع والموظفين والاختصاصات، وأوزان اختيار كل منها"""
+        rng = self.rng
+        cursor = conn.cursor()
+
+        def insert_names(table, names):
+            cursor.executemany(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", [(name,) for name in names])
+            ids = [row[0] for row in cursor.execute(f"SELECT id FROM {table} ORDER BY id")]
+            rng.shuffle(ids)  # أكثر الجهات مراسلة ليست بالضرورة أقدمها
+            return ids
+
+        self.sources = insert_names('incoming_sources', [f"{kind} {domain}" for kind in SOURCE_KINDS
+                                                         for domain in DOMAINS])
+        self.destinations = insert_names('outgoing_destinations', [f"{kind} {domain}" for kind in DESTINATION_KINDS
+                                                                   for domain in DOMAINS])
+        self.specializations = insert_names('specializations', SPECIALIZATIONS)
+
+        cursor.executemany("INSERT OR IGNORE INTO incoming_types (name) VALUES (?)",
+                           [(name,) for name, _ in INCOMING_TYPES])
+        type_ids = dict(cursor.execute("SELECT name, id FROM incoming_types"))
+        weights = dict(INCOMING_TYPES)
+        self.types = list(type_ids.values())
+        self.type_weights = list(accumulate(weights.get(name, 1) for name in type_ids))
+
+        cursor.executemany(
+            "INSERT INTO employees (name, department, position, is_active) VALUES (?, ?, ?, ?)",
+            [(f"{first} {last}", rng.choice(DEPARTMENTS), rng.choice(POSITIONS), int(rng.random() < 0.9))
+             for first in FIRST_NAMES for last in LAST_NAMES[:10]]
+        )
+        self.employees = [row[0] for row in cursor.execute("SELECT id FROM employees ORDER BY id")]
+        rng.shuffle(self.employees)
+
+        self.source_weights = zipf_weights(len(self.sources), ENTITY_SKEW)
+        self.destination_weights = zipf_weights(len(self.destinations), ENTITY_SKEW)
+        self.employee_weights = zipf_weights(len(self.employees), EMPLOYEE_SKEW)
+        self.specialization_weights = zipf_weights(len(self.specializations), SPECIALIZATION_SKEW)
+        self.topic_weights = zipf_weights(len(TOPICS), TOPIC_SKEW)
+
+    def create_blobs(self, conn):
+        """ملفات المرفقات في مخزن الملفات: عدد محدود من الملفات المختلفة تتكرر بين السجلات"""
+        rng = self.rng
+        file_manager = FileManager(self.attachments_dir)
+        self.blobs = []
+        if not self.attachment_ratio or not self.blob_count:
+            return
+
+        extensions = [(ext, header) for ext, header, _ in FILE_TYPES]
+        extension_weights = list(accumulate(weight for _, _, weight in FILE_TYPES))
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for n in range(self.blob_count):
+                ext, header = rng.choices(extensions, cum_weights=extension_weights)[0]
+                size = min(int(rng.lognormvariate(BLOB_SIZE_MU, BLOB_SIZE_SIGMA)), BLOB_MAX_SIZE)
+                source_path = os.path.join(temp_dir, f"مرفق_{n}{ext}")
+                with open(source_path, 'wb') as f:
+                    f.write(header + rng.randbytes(size))
+                saved = file_manager.save_attachment(source_path, None, None)
+                conn.execute("INSERT OR IGNORE INTO attachment_blobs (hash, file_path, file_size) VALUES (?, ?, ?)",
+                             (saved['hash'], saved['file_path'], saved['file_size']))
+                self.blobs.append(saved)
+        self.blob_weights = zipf_weights(len(self.blobs), BLOB_SKEW)
+
+    def title(self, year):
+        rng = self.rng
+        topic = rng.choices(TOPICS, cum_weights=self.topic_weights)[0]
+        suffix = rng.choice(('', '', f" للعام {year}", " (عاجل)", f" للربع {rng.choice(('الأول', 'الثاني', 'الثالث', 'الرابع'))}"))
+        return f"{rng.choice(SUBJECTS)} {topic}{suffix}"
+
+    def details(self, day):
+        rng = self.rng
+        text = " ".join(rng.sample(SENTENCES, rng.randint(2, 5)))
+        if rng.random() < 0.3:
+            text = f"إشارة إلى كتابكم رقم {rng.randint(1, 9999)}/{day.year} بتاريخ {day - timedelta(days=rng.randint(1, 60))}. {text}"
+        return text
+
+    def insert_records(self, conn, progress=None):
+        """السجلات يوماً بيوم بالترتيب الزمني، بدفعات كل منها في معاملة واحدة"""
+        rng = self.rng
+        days, weights = working_days(self.first_year, self.last_year)
+        next_ids = {record_type: 1 + (conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0])
+                    for record_type, table in RECORD_TABLES.items()}
+        sequences = {}  # (الاتجاه، السنة) -> آخر رقم
+        batches = {'incoming': [], 'outgoing': []}
+        attachments = []
+        counts = {'incoming': 0, 'outgoing': 0, 'attachments': 0}
+
+        def flush():
+            conn.execute("BEGIN")
+            conn.executemany(INCOMING_INSERT, batches['incoming'])
+            conn.executemany(OUTGOING_INSERT, batches['outgoing'])
+            conn.executemany(ATTACHMENT_INSERT, attachments)
+            conn.commit()
+            counts['attachments'] += len(attachments)
+            for rows in batches.values():
+                rows.clear()
+            attachments.clear()
+
+        done = 0
+        for day, day_count in zip(days, allocate(self.record_count, weights)):
+            day_text = day.isoformat()
+            year = day.year
+            for _ in range(day_count):
+                record_type = 'incoming' if rng.random() < INCOMING_SHARE else 'outgoing'
+                record_id = next_ids[record_type]
+                next_ids[record_type] += 1
+                number = sequences[(record_type, year)] = sequences.get((record_type, year), 0) + 1
+                serial = sequences[(record_type, SERIAL_YEAR)] = sequences.get((record_type, SERIAL_YEAR), 0) + 1
+                created = f"{day_text} {rng.randint(8, 15):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}"
+                employee = rng.choices(self.employees, cum_weights=self.employee_weights)[0]
+                specialization = rng.choices(self.specializations, cum_weights=self.specialization_weights)[0]
+
+                if record_type == 'incoming':
+                    batches['incoming'].append((
+                        record_id, format_record_number(record_type, year, number),
+                        f"{rng.randint(1, 9999)}/{year}", str(serial), self.title(year),
+                        rng.choices(self.sources, cum_weights=self.source_weights)[0],
+                        rng.choices(self.types, cum_weights=self.type_weights)[0],
+                        employee, specialization, day_text, self.details(day), created
+                    ))
+                else:
+                    batches['outgoing'].append((
+                        record_id, format_record_number(record_type, year, number),
+                        f"ص/{year}/{number}", str(serial), self.title(year),
+                        rng.choices(self.destinations, cum_weights=self.destination_weights)[0],
+                        employee, specialization, day_text, self.details(day), created
+                    ))
+                counts[record_type] += 1
+
+                if self.blobs and rng.random() < self.attachment_ratio:
+                    for n in range(1 + (rng.random() < 0.35) + (rng.random() < 0.1)):
+                        blob = rng.choices(self.blobs, cum_weights=self.blob_weights)[0]
+                        attachments.append((
+                            record_id, record_type, f"{record_type}_{record_id}_{n + 1}{os.path.splitext(blob['file_path'])[1]}",
+                            blob['file_path'], blob['file_size'], blob['file_type'], blob['file_mtime'],
+                            blob['hash'], created, created
+                        ))
+
+                done += 1
+                if done % self.batch_size == 0:
+                    flush()
+                    if progress:
+                        progress(done, self.record_count, "السجلات")
+        flush()
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO record_sequences (record_type, year, last_value) VALUES (?, ?, ?)",
+            [(record_type, year, value) for (record_type, year), value in sequences.items()]
+        )
+        conn.commit()
+        return counts
+
+    def rebuild_derived(self, conn):
+        """ما كانت المشغلات المعلقة تحدثه: فهرس البحث وعدادات الموظفين ومراجع الملفات"""
+        for statement in rebuild_statements() + RECOMPUTE_EMPLOYEE_COUNTERS:
+            conn.execute(statement)
+        conn.execute("""UPDATE attachment_blobs SET ref_count =
+            (SELECT COUNT(*) FROM attachments WHERE attachments.blob_hash = attachment_blobs.hash)""")
+        conn.commit()
+
+def generate_dataset(db_path, record_count, seed=DEFAULT_SEED, progress=None, **options):
+    """إنشاء قاعدة بيانات تجريبية جديدة في db_path: يعيد ملخص البيانات المولدة"""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    db = DatabaseManager(db_path)
+    try:
+        return SyntheticDataGenerator(db, record_count, seed, **options).generate(progress)
+    finally:
+        db.close()
+
+def print_progress(done, total, stage):
+    print(f"\r{stage}: {done}/{total} ({done * 100 // max(total, 1)}%)", end="", flush=True)
+    if done >= total:
+        print()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="توليد بيانات تجريبية حتمية لقياس الأداء")
+    parser.add_argument('db_path', help="مسار قاعدة البيانات الجديدة")
+    parser.add_argument('--size', default='10k', help=f"عدد السجلات أو أحد الأحجام: {', '.join(SIZES)}")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--attachments-dir', help="مجلد مخزن المرفقات (افتراضياً attachments بجانب قاعدة البيانات)")
+    parser.add_argument('--attachment-ratio', type=float, default=0.15, help="نسبة السجلات التي لها مرفقات")
+    parser.add_argument('--blob-count', type=int, default=200, help="عدد ملفات المرفقات المختلفة")
+    parser.add_argument('--years', default='2015-2024', help="مدى السنوات")
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db_path):
+        print(f"الملف موجود مسبقاً: {args.db_path}")
+        return False
+    first_year, last_year = (int(year) for year in args.years.split('-'))
+    summary = generate_dataset(args.db_path, parse_size(args.size), args.seed, print_progress,
+                               attachments_dir=args.attachments_dir, attachment_ratio=args.attachment_ratio,
+                               blob_count=args.blob_count, first_year=first_year, last_year=last_year)
+    print(summary)
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,23 +1,528 @@
 import sqlite3
 import os
-from datetime import datetime
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from urllib.request import pathname2url
+
+from migrations import HOT_QUERIES, RECOMPUTE_EMPLOYEE_COUNTERS, apply_migrations, check_query_plans
+from reference_cache import reference_cache
+from search_index import RECORD_TABLES, rebuild_statements
+from sequences import peek_record_numbers, reserve_record_numbers
+
+class ConnectionPool:
+    """مجمع اتصالات دائمة بقاعدة البيانات - اتصال واحد لكل خيط يُستعار ثم يُعاد"""
+    
+    def __init__(self, db_path, max_size=5, timeout=30.0, read_only=False):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.read_only = read_only
+        self.setup_statements = ["PRAGMA foreign_keys = ON"]
+        
+        self._condition = threading.Condition()
+        self._idle = []
+        self._all = []
+        self._local = threading.local()
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """تصفير عدادات الأداء"""
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+        self.wait_time = 0.0
+    
+    def get_stats(self):
+        """الحصول على عدادات الأداء وحالة المجمع"""
+        with self._condition:
+            return {
+                'size': len(self._all),
+                'idle': len(self._idle),
+                'in_use': len(self._all) - len(self._idle),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'waits': self.waits,
+                'wait_time': self.wait_time
+            }
+    
+    def _create_connection(self):
+        """إنشاء اتصال جديد وتنفيذ إعدادات PRAGMA مرة واحدة"""
+        if self.read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        for statement in self.setup_statements:
+            conn.execute(statement)
+        return conn
+    
+    def acquire(self):
+        """استعارة اتصال من المجمع"""
+        self._local.wait = 0.0
+        with self._condition:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            
+            if len(self._all) < self.max_size:
+                self.misses += 1
+                conn = self._create_connection()
+                self._all.append(conn)
+                return conn
+            
+            # المجمع ممتلئ - الانتظار حتى يُعاد اتصال
+            self.waits += 1
+            started = time.perf_counter()
+            deadline = started + self.timeout
+            while not self._idle:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.wait_time += time.perf_counter() - started
+                    raise sqlite3.OperationalError("انتهت مهلة انتظار اتصال متاح بقاعدة البيانات")
+                self._condition.wait(remaining)
+            self._local.wait = time.perf_counter() - started
+            self.wait_time += self._local.wait
+            self.hits += 1
+            return self._idle.pop()
+    
+    def release(self, conn):
+        """إعادة الاتصال إلى المجمع"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._condition:
+            self._idle.append(conn)
+            self._condition.notify()
+    
+    def last_wait(self):
+        """زمن انتظار الخيط الحالي (بالثواني) في آخر استعارة لاتصال"""
+        return getattr(self._local, 'wait', 0.0)
+    
+    @contextmanager
+    def connection(self):
+        """استعارة اتصال للخيط الحالي (يُعاد استخدامه عند الاستدعاء المتداخل)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.wait = 0.0
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        conn = self.acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self.release(conn)
+    
+    def close_all(self):
+        """إغلاق جميع الاتصالات"""
+        with self._condition:
+            for conn in self._all:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._all = []
+            self._idle = []
+
+# ملفات تعريف ضبط التخزين - تُختار عبر الإعداد storage_profile في system_settings
+STORAGE_PROFILES = {
+    # الوضع الافتراضي لـ SQLite (سجل التراجع) - للمقارنة
+    'rollback': {
+        'journal_mode': 'DELETE',
+        'pragmas': [
+            "PRAGMA synchronous = FULL"
+        ]
+    },
+    # وضع WAL: القراء لا ينتظرون الكاتب، وتقليل عمليات fsync
+    'wal': {
+        'journal_mode': 'WAL',
+        'pragmas': [
+            "PRAGMA synchronous = NORMAL",
+            "PRAGMA cache_size = -65536",  # 64 ميجابايت
+            "PRAGMA mmap_size = 268435456",  # 256 ميجابايت
+            "PRAGMA temp_store = MEMORY"
+        ]
+    }
+}
+
+class BackupRestartLimit(Exception):
+    """إيقاف النسخ على خطوات بعد تكرار إعادة بدئه بسبب الكتابة المتزامنة"""
+
+class CheckpointScheduler:
+    """جدولة نقاط التفتيش لسجل WAL في الخلفية"""
+    
+    def __init__(self, pool, interval=300, truncate_pages=10000):
+        self.pool = pool
+        self.interval = interval
+        self.truncate_pages = truncate_pages
+        self.runs = 0
+        self.last_result = None
+        
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """تشغيل المجدول"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="wal-checkpoint", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """إيقاف المجدول"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.checkpoint()
+    
+    def checkpoint(self, mode='PASSIVE'):
+        """تنفيذ نقطة تفتيش، وتقليص السجل إذا تجاوز الحد المسموح"""
+        try:
+            with self.pool.connection() as conn:
+                busy, log_pages, checkpointed = conn.execute(
+                    f"PRAGMA wal_checkpoint({mode})"
+                ).fetchone()
+                
+                if mode == 'PASSIVE' and log_pages >= self.truncate_pages and checkpointed == log_pages:
+                    busy, log_pages, checkpointed = conn.execute(
+                        "PRAGMA wal_checkpoint(TRUNCATE)"
+                    ).fetchone()
+            
+            self.runs += 1
+            self.last_result = {
+                'busy': busy,
+                'log_pages': log_pages,
+                'checkpointed_pages': checkpointed,
+                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            }
+            return self.last_result
+        except Exception as e:
+            print(f"خطأ في نقطة التفتيش: {e}")
+            return None
+
+class UnitOfWork:
+    """حفظ أو حذف سجل مع مرفقاته وملفاتها في معاملة واحدة بحفظ (commit) واحد
+    
+    يُنشأ عبر DatabaseManager.unit_of_work. المعاملة (BEGIN IMMEDIATE) تبدأ مع أول
+    أمر في قاعدة البيانات، فنسخ الملفات عبر stage_file قبله لا يحجز قفل الكتابة.
+    أوامر execute_query و execute_many في الخيط نفسه أثناءها تنضم إلى معاملتها.
+    الملفات التي نُسخت إلى المخزن تُحذف إن أُلغيت المعاملة، والملفات التي لم تعد
+    مرفقة بأي سجل تُحذف بعد نجاح الحفظ فقط.
+    
+    وجود صف الملف في attachment_blobs هو ما يحمي ملفه: حذف الملف يتم تحت قفل الكتابة
+    وبعد التحقق من عدم وجود صفه، وتسجيل مرفق بملف لا صف له يتحقق تحت القفل نفسه من
+    وجود الملف ويعيد نسخه إن حُذف، فلا يبقى مرفق يشير إلى ملف محذوف
+    """
+    
+    def __init__(self, db_manager, conn, file_manager=None):
+        self.db_manager = db_manager
+        self.conn = conn
+        self.file_manager = file_manager
+        self.staged = []  # ملفات في المخزن تُحذف إن أُلغيت المعاملة: (البصمة، المسار)
+        self.obsolete = []  # ملفات تُحذف بعد الحفظ: (البصمة أو None للمرفق القديم، المسار)
+        self._cursor = None
+    
+    @property
+    def cursor(self):
+        """مؤشر المعاملة، تبدأ عند أول استخدام"""
+        if self._cursor is None:
+            if self.conn.in_transaction:
+                # تأكيدها هنا يحفظ عمل معاملة خارجية في منتصفه
+                raise sqlite3.OperationalError("لا يمكن بدء وحدة عمل أثناء معاملة مفتوحة على الاتصال")
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            self._cursor = cursor
+        return self._cursor
+    
+    def execute(self, query, params=()):
+        monitor = self.db_manager.monitor
+        started = time.perf_counter()
+        cursor = self.cursor.execute(query, params)
+        if monitor:
+            monitor.record(query, time.perf_counter() - started, 0.0, max(cursor.rowcount, 0), self.conn, params)
+        return cursor
+    
+    def stage_file(self, source_path):
+        """نسخ ملف إلى مخزن المرفقات: يعيد بيانات الملف لتسجيلها عبر add_attachment"""
+        saved_file = self.file_manager.save_attachment(source_path, None, None)
+        if saved_file is None:
+            raise OSError(f"تعذر حفظ الملف: {source_path}")
+        if not saved_file['deduplicated']:
+            self.staged.append((saved_file['hash'], saved_file['file_path']))
+        return saved_file
+    
+    def insert_record(self, record_type, values, year=None):
+        """إدخال سجل مع حجز رقم السجل والرقم التسلسلي (انظر DatabaseManager.insert_record)"""
+        year = year or datetime.now().year
+        record_number, serial_number = reserve_record_numbers(self.cursor, record_type, year)
+        columns = ['record_number', 'serial_number'] + list(values)
+        cursor = self.execute(
+            f"INSERT INTO {RECORD_TABLES[record_type]} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            [record_number, serial_number] + list(values.values())
+        )
+        return cursor.lastrowid, record_number, serial_number
+    
+    def add_attachment(self, record_id, record_type, saved_file, description=None):
+        """تسجيل مرفق وربطه بملفه في المخزن (عدد مراجع الملف يزداد عبر المشغل)"""
+        if saved_file.get('hash'):
+            saved_file = self._claim_blob(saved_file)
+        cursor = self.execute(
+            """INSERT INTO attachments
+            (record_id, record_type, file_name, file_path, file_size, file_type, file_mtime,
+             blob_hash, description, file_status, verified_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'ok', CURRENT_TIMESTAMP)""",
+            (record_id, record_type, saved_file['file_name'], saved_file['file_path'],
+             saved_file.get('file_size'), saved_file.get('file_type'), saved_file.get('file_mtime'),
+             saved_file.get('hash'), description)
+        )
+        return cursor.lastrowid
+    
+    def _claim_blob(self, saved_file):
+        """ربط الملف المنسوخ بصفه في attachment_blobs تحت قفل الكتابة
+        
+        قرار عدم التكرار في stage_file أُخذ من القرص قبل القفل، وقد تكون معاملة أخرى
+        حذفت الملف بعده: إن وُجد الصف فملفه باقٍ ويُستخدم، وإلا يُعاد نسخ الملف من مصدره
+        إن لم يعد موجوداً ويُسجل ليُحذف إن أُلغيت هذه المعاملة
+        """
+        file_hash = saved_file['hash']
+        row = self.execute("SELECT file_path FROM attachment_blobs WHERE hash = ?", (file_hash,)).fetchone()
+        if row:
+            return dict(saved_file, file_path=row[0])
+        
+        file_path = saved_file['file_path']
+        if not os.path.exists(file_path):
+            source_path = saved_file.get('source_path')
+            if not self.file_manager or not source_path:
+                raise OSError(f"ملف المرفق لم يعد موجوداً في المخزن: {file_path}")
+            stored_hash, file_path, _, _ = self.file_manager.store_blob(source_path)
+            if stored_hash != file_hash:
+                raise OSError(f"تغير محتوى الملف بعد نسخه: {source_path}")
+            saved_file = dict(saved_file, file_path=file_path, file_mtime=os.path.getmtime(file_path))
+        if (file_hash, file_path) not in self.staged:
+            self.staged.append((file_hash, file_path))
+        
+        self.execute(
+            "INSERT OR IGNORE INTO attachment_blobs (hash, file_path, file_size) VALUES (?, ?, ?)",
+            (file_hash, file_path, saved_file.get('file_size'))
+        )
+        return saved_file
+    
+    def delete_blob(self, file_hash):
+        """حذف صف ملف لم يعد مرفقاً بأي سجل، وملفه بعد الحفظ: يعيد هل حُذف"""
+        orphan = self.execute(
+            "SELECT file_path FROM attachment_blobs WHERE hash = ? AND ref_count <= 0", (file_hash,)
+        ).fetchone()
+        if not orphan:
+            return False
+        self.execute("DELETE FROM attachment_blobs WHERE hash = ?", (file_hash,))
+        self.obsolete.append((file_hash, orphan[0]))
+        return True
+    
+    def _delete_attachments(self, condition, params):
+        """حذف صفوف مرفقات وصفوف ملفاتها التي لم تعد مرفقة بغيرها، والملفات بعد الحفظ"""
+        rows = self.execute(f"SELECT file_path, blob_hash FROM attachments WHERE {condition}", params).fetchall()
+        self.execute(f"DELETE FROM attachments WHERE {condition}", params)
+        for file_path, blob_hash in rows:
+            if not blob_hash:
+                # مرفق قديم خارج المخزن: ملفه خاص به
+                self.obsolete.append((None, file_path))
+                continue
+            self.delete_blob(blob_hash)
+        return len(rows)
+    
+    def delete_attachment(self, attachment_id):
+        return self._delete_attachments("id = ?", (attachment_id,))
+    
+    def delete_record(self, record_type, record_id):
+        """حذف سجل ومرفقاته: يعيد عدد السجلات المحذوفة"""
+        self._delete_attachments("record_id = ? AND record_type = ?", (record_id, record_type))
+        return self.execute(f"DELETE FROM {RECORD_TABLES[record_type]} WHERE id = ?", (record_id,)).rowcount
+    
+    def commit(self):
+        if self._cursor is not None:
+            self.conn.commit()
+        self._remove_unreferenced(self.obsolete)
+    
+    def rollback(self):
+        if self.conn.in_transaction:
+            self.conn.rollback()
+        self._remove_unreferenced(self.staged)
+    
+    def _remove_unreferenced(self, files):
+        """حذف ملفات (البصمة، المسار) تحت قفل الكتابة ما لم تسجل معاملة أخرى ملفاً بالبصمة نفسها"""
+        if not files:
+            return
+        try:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for file_hash, file_path in files:
+                    if file_hash and self.conn.execute(
+                        "SELECT 1 FROM attachment_blobs WHERE hash = ?", (file_hash,)
+                    ).fetchone():
+                        continue
+                    self._remove_file(file_path)
+            finally:
+                self.conn.rollback()
+        except sqlite3.Error as e:
+            # الملفات الباقية بلا صفوف لا يشير إليها أي مرفق
+            print(f"خطأ في حذف ملفات المرفقات: {e}")
+    
+    def _remove_file(self, file_path):
+        try:
+            if self.file_manager:
+                self.file_manager.delete_attachment(file_path)
+                self.file_manager.remove_empty_dirs(os.path.dirname(file_path))
+            elif os.path.exists(file_path):
+                os.remove(file_path)
+        except OSError as e:
+            print(f"خطأ في حذف الملف {file_path}: {e}")
 
 class DatabaseManager:
-    def __init__(self, db_path="data/database.db"):
+    def __init__(self, db_path="data/database.db", pool_size=5, storage_profile=None, read_only=False):
+        """read_only: فتح قاعدة بيانات موجودة للقراءة فقط دون تهيئة أو ترحيل ودون
+        تغيير وضع السجل أو جدولة نقاط التفتيش (لعمال سطر الأوامر)
+        """
         self.db_path = db_path
+        self.read_only = read_only
+        self.pool = ConnectionPool(db_path, max_size=pool_size, read_only=read_only)
+        self.checkpoint_scheduler = None
+        self.storage_profile = None
+        self.monitor = None
+        self._local = threading.local()  # وحدة العمل المفتوحة في كل خيط
+        if read_only:
+            # فتح الملف الآن حتى يظهر خطأ الملف المفقود أو التالف هنا لا في أول استعلام
+            with self.pool.connection() as conn:
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            return
         self.init_database()
+        self.apply_storage_profile(storage_profile)
     
     def get_connection(self):
-        """إنشاء اتصال بقاعدة البيانات"""
+        """إنشاء اتصال مستقل بقاعدة البيانات (خارج المجمع)"""
         conn = sqlite3.connect(self.db_path)
         conn.execute("PRAGMA foreign_keys = ON")
         return conn
     
+    def get_pool_stats(self):
+        """إحصائيات مجمع الاتصالات"""
+        return self.pool.get_stats()
+    
+    def set_monitor(self, monitor, slow_ms=None):
+        """ربط مراقب الاستعلامات (QueryMonitor) بتنفيذ الاستعلامات، أو فصله بتمرير None"""
+        if monitor is not None and slow_ms is not None:
+            monitor.slow_ms = slow_ms
+        self.monitor = monitor
+    
+    def close(self):
+        """إغلاق جميع اتصالات قاعدة البيانات"""
+        if self.checkpoint_scheduler:
+            self.checkpoint_scheduler.stop()
+            self.checkpoint_scheduler = None
+        self.pool.close_all()
+    
+    def check_query_plans(self):
+        """التحقق من استخدام الفهارس في الاستعلامات الأكثر استخداماً"""
+        date_filter = " AND registration_date BETWEEN ? AND ?"
+        hot_queries = HOT_QUERIES + [
+            (
+                "إحصائيات جميع الموظفين",
+                self.EMPLOYEE_STATS_QUERY.format(outgoing_filter=date_filter, incoming_filter=date_filter),
+                ('2024-01-01', '2024-01-31') * 2,
+                ('outgoing_records', 'incoming_records')
+            )
+        ]
+        
+        with self.pool.connection() as conn:
+            failures = check_query_plans(conn, hot_queries)
+        for name, detail in failures:
+            print(f"مسح كامل في الاستعلام '{name}': {detail}")
+        return not failures
+    
+    def get_setting(self, key, default=None):
+        """قراءة إعداد من جدول system_settings"""
+        result = self.execute_query(
+            "SELECT setting_value FROM system_settings WHERE setting_key = ?", (key,)
+        )
+        if result and result[0][0] is not None:
+            return result[0][0]
+        return default
+    
+    def set_setting(self, key, value, description=None):
+        """حفظ إعداد في جدول system_settings"""
+        return self.execute_query(
+            """INSERT INTO system_settings (setting_key, setting_value, description)
+            VALUES (?, ?, ?)
+            ON CONFLICT(setting_key) DO UPDATE SET
+                setting_value = excluded.setting_value,
+                updated_date = CURRENT_TIMESTAMP""",
+            (key, str(value), description)
+        )
+    
+    def apply_storage_profile(self, profile_name=None):
+        """تطبيق ملف تعريف ضبط التخزين (WAL أو سجل التراجع) وجدولة نقاط التفتيش"""
+        if profile_name is None:
+            profile_name = self.get_setting('storage_profile', 'wal')
+        if profile_name not in STORAGE_PROFILES:
+            print(f"ملف تعريف التخزين غير معروف: {profile_name}")
+            profile_name = 'rollback'
+        profile = STORAGE_PROFILES[profile_name]
+        
+        if self.checkpoint_scheduler:
+            self.checkpoint_scheduler.stop()
+            self.checkpoint_scheduler = None
+        
+        # إعادة فتح الاتصالات حتى تُطبق الإعدادات على كل اتصال جديد
+        setup_statements = ["PRAGMA foreign_keys = ON"] + list(profile['pragmas'])
+        if profile['journal_mode'] == 'WAL':
+            autocheckpoint = int(self.get_setting('wal_autocheckpoint_pages', 1000))
+            setup_statements.append(f"PRAGMA wal_autocheckpoint = {autocheckpoint}")
+        
+        self.pool.close_all()
+        self.pool.setup_statements = setup_statements
+        
+        try:
+            with self.pool.connection() as conn:
+                conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+        except Exception as e:
+            print(f"خطأ في تطبيق وضع السجل: {e}")
+        
+        if profile['journal_mode'] == 'WAL':
+            self.checkpoint_scheduler = CheckpointScheduler(
+                self.pool,
+                interval=float(self.get_setting('wal_checkpoint_interval', 300)),
+                truncate_pages=int(self.get_setting('wal_truncate_pages', 10000))
+            )
+            self.checkpoint_scheduler.start()
+        
+        self.storage_profile = profile_name
+        return profile_name
+    
     def init_database(self):
         """تهيئة قاعدة البيانات والجداول"""
-        os.makedirs("data/attachments", exist_ok=True)
+        # مجلد المرفقات ينشئه FileManager، ومجلدات التطبيق تُنشأ عند تشغيل الواجهة
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
         
-        conn = self.get_connection()
+        with self.pool.connection() as conn:
+            self._create_schema(conn)
+    
+    def _create_schema(self, conn):
+        """إنشاء الجداول والبيانات الأولية"""
         cursor = conn.cursor()
         
         # جدول جهات الوارد
@@ -50,7 +555,7 @@ class DatabaseManager:
             )
         ''')
         
-        # جدول الموظفين - مع إضافة الأعمدة الجديدة إذا لم تكن موجودة
+        # جدول الموظفين - الأعمدة الإضافية تُضاف عبر الترحيلات
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS employees (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -62,9 +567,6 @@ class DatabaseManager:
             )
         ''')
         
-        # إضافة الأعمدة الجديدة إذا لم تكن موجودة
-        self.add_missing_columns(cursor)
-        
         # جدول الاختصاصات
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS specializations (
@@ -143,32 +645,13 @@ class DatabaseManager:
             )
         ''')
         
+        # تطبيق ترحيلات المخطط (الأعمدة الإضافية والفهارس)
+        apply_migrations(conn)
+        
         # إدخال بيانات أولية
         self.insert_initial_data(cursor)
         
         conn.commit()
-        conn.close()
-    
-    def add_missing_columns(self, cursor):
-        """إضافة الأعمدة المفقودة إلى الجداول الموجودة"""
-        try:
-            # التحقق من وجود الأعمدة في جدول الموظفين وإضافتها إذا لم تكن موجودة
-            columns_to_add = [
-                ('email', 'TEXT'),
-                ('phone', 'TEXT'),
-                ('fax_count', 'INTEGER DEFAULT 0'),
-                ('email_count', 'INTEGER DEFAULT 0')
-            ]
-            
-            for column_name, column_type in columns_to_add:
-                try:
-                    cursor.execute(f"ALTER TABLE employees ADD COLUMN {column_name} {column_type}")
-                    print(f"تم إضافة العمود {column_name} إلى جدول الموظفين")
-                except sqlite3.OperationalError as e:
-                    if "duplicate column name" not in str(e):
-                        print(f"خطأ في إضافة العمود {column_name}: {e}")
-        except Exception as e:
-            print(f"خطأ في إضافة الأعمدة المفقودة: {e}")
     
     def insert_initial_data(self, cursor):
         """إدخال البيانات الأولية للكيانات المرجعية"""
@@ -267,7 +750,19 @@ class DatabaseManager:
             ('company_name', 'شركة التقنية المتطورة', 'اسم الشركة'),
             ('system_language', 'ar', 'لغة النظام'),
             ('date_format', 'YYYY-MM-DD', 'تنسيق التاريخ'),
-            ('backup_auto', '1', 'نسخ احتياطي تلقائي')
+            ('backup_auto', '1', 'نسخ احتياطي تلقائي'),
+            ('backup_interval_hours', '24', 'الفاصل بالساعات بين النسخ الاحتياطية التلقائية'),
+            ('backup_keep_count', '10', 'عدد النسخ الاحتياطية المحتفظ بها'),
+            ('backup_keep_days', '30', 'حذف النسخ الاحتياطية الأقدم من هذا العدد من الأيام'),
+            ('backup_compression', 'gzip', 'ضغط النسخ الاحتياطية (gzip أو none، أو zstd إن ثُبتت مكتبة zstandard)'),
+            ('export_prewarm', '1', 'تحميل مكتبات التصدير والطباعة في الخلفية بعد فتح النافذة'),
+            ('dashboard_refresh_seconds', '60', 'الفاصل بالثواني لتحديث لوحة التحكم تلقائياً (0 لإيقافه)'),
+            ('query_monitor', '0', 'تسجيل زمن الاستعلامات وعددها لكل إجراء في الواجهة (يُفعّل من نافذة مراقبة الاستعلامات)'),
+            ('slow_query_ms', '100', 'الحد بالمللي ثانية لتسجيل الاستعلام البطيء مع خطة تنفيذه'),
+            ('storage_profile', 'wal', 'ملف تعريف ضبط التخزين (wal أو rollback)'),
+            ('wal_autocheckpoint_pages', '1000', 'عدد صفحات سجل WAL قبل نقطة التفتيش التلقائية'),
+            ('wal_checkpoint_interval', '300', 'الفاصل الزمني بالثواني لنقاط التفتيش في الخلفية'),
+            ('wal_truncate_pages', '10000', 'حجم سجل WAL بالصفحات الذي يُقلص بعده الملف')
         ]
         
         cursor.executemany(
@@ -276,112 +771,427 @@ class DatabaseManager:
         )
     
     def execute_query(self, query, params=None):
-        """تنفيذ استعلام مع معالجة الأخطاء"""
+        """تنفيذ استعلام مع معالجة الأخطاء: يعيد None عند الفشل"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            if query.strip().upper().startswith('SELECT'):
-                result = cursor.fetchall()
-            else:
-                conn.commit()
-                result = cursor.lastrowid
-            
-            conn.close()
-            return result
+            return self.run_query(query, params)
         except Exception as e:
             print(f"خطأ في قاعدة البيانات: {e}")
             return None
     
+    def run_query(self, query, params=None):
+        """تنفيذ استعلام كما في execute_query لكن الأخطاء لا تُبتلع بل تُمرر للمستدعي"""
+        monitor = self.monitor
+        started = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                is_select = query.strip().upper().startswith('SELECT')
+                work = self.active_work()
+                # الكتابة أثناء وحدة عمل تنضم إلى معاملتها وتُحفظ معها
+                cursor = work.cursor if work is not None and not is_select else conn.cursor()
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                
+                if is_select:
+                    result = cursor.fetchall()
+                    rows = len(result)
+                else:
+                    if work is None:
+                        conn.commit()
+                    result = cursor.lastrowid
+                    rows = cursor.rowcount
+                
+                if monitor:
+                    self._record_query(monitor, query, started, rows, conn, params)
+            
+            return result
+        except Exception as e:
+            if monitor:
+                self._record_query(monitor, query, started, params=params, error=e)
+            raise
+    
     def execute_many(self, query, params_list):
         """تنفيذ استعلام متعدد"""
+        monitor = self.monitor
+        started = time.perf_counter()
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.executemany(query, params_list)
-            conn.commit()
-            conn.close()
+            with self.pool.connection() as conn:
+                work = self.active_work()
+                cursor = work.cursor if work is not None else conn.cursor()
+                cursor.executemany(query, params_list)
+                if work is None:
+                    conn.commit()
+                if monitor:
+                    self._record_query(monitor, query, started, cursor.rowcount, conn)
             return True
         except Exception as e:
             print(f"خطأ في قاعدة البيانات: {e}")
+            if monitor:
+                self._record_query(monitor, query, started, error=e)
             return False
     
+    def _record_query(self, monitor, query, started, rows=0, conn=None, params=None, error=None):
+        """تسجيل استعلام منتهٍ لدى المراقب: زمن التنفيذ دون انتظار الاتصال"""
+        wait = self.pool.last_wait()
+        monitor.record(query, time.perf_counter() - started - wait, wait, rows, conn, params, error)
+    
+    def iter_query(self, query, params=None, chunk_size=1000):
+        """تنفيذ استعلام SELECT وإرجاع صفوفه تدريجياً من المؤشر على دفعات
+        
+        لا تُحمّل النتيجة كاملة في الذاكرة، ويبقى الاتصال محجوزاً حتى انتهاء القراءة.
+        الأخطاء لا تُبتلع بل تُمرر للمستدعي
+        """
+        monitor = self.monitor
+        count = 0
+        elapsed = 0.0  # زمن التنفيذ والجلب فقط، دون زمن معالجة المستدعي للصفوف
+        with self.pool.connection() as conn:
+            wait = self.pool.last_wait()
+            try:
+                started = time.perf_counter()
+                cursor = conn.cursor()
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    elapsed += time.perf_counter() - started
+                    if not rows:
+                        break
+                    count += len(rows)
+                    yield from rows
+                    started = time.perf_counter()
+            except Exception as e:
+                if monitor:
+                    monitor.record(query, elapsed, wait, count, params=params, error=e)
+                raise
+            if monitor:
+                monitor.record(query, elapsed, wait, count, conn, params)
+    
+    # استعلام تجميعي واحد لإحصائيات جميع الموظفين:
+    # الفاكسات = سجلات الصادر، الإيميلات = سجلات الوارد من نوع إيميل
+    EMPLOYEE_STATS_QUERY = """
+    SELECT employee_id, SUM(fax_count), SUM(email_count)
+    FROM (
+        SELECT employee_id, COUNT(*) AS fax_count, 0 AS email_count
+        FROM outgoing_records
+        WHERE 1=1 {outgoing_filter}
+        GROUP BY employee_id
+        UNION ALL
+        SELECT employee_id, 0 AS fax_count, COUNT(*) AS email_count
+        FROM incoming_records
+        WHERE incoming_type_id IN (SELECT id FROM incoming_types WHERE name LIKE '%إيميل%' OR name LIKE '%email%')
+        {incoming_filter}
+        GROUP BY employee_id
+    )
+    WHERE employee_id IS NOT NULL
+    GROUP BY employee_id
+    """
+    
+    @staticmethod
+    def _rows_to_employee_stats(rows, stats=None):
+        """تحويل صفوف (employee_id, fax_count, email_count) إلى قاموس إحصائيات مع الدمج"""
+        if stats is None:
+            stats = {}
+        for emp_id, fax_count, email_count in rows or []:
+            entry = stats.setdefault(emp_id, {'fax_count': 0, 'email_count': 0, 'total': 0})
+            entry['fax_count'] += fax_count or 0
+            entry['email_count'] += email_count or 0
+            entry['total'] = entry['fax_count'] + entry['email_count']
+        return stats
+    
+    @staticmethod
+    def _full_months_range(start_date, end_date):
+        """أول يوم من أول شهر كامل وآخر يوم من آخر شهر كامل ضمن نطاق التاريخ"""
+        try:
+            start = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return None
+        
+        if start.day == 1:
+            first_day = start
+        else:
+            first_day = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        
+        if (end + timedelta(days=1)).day == 1:
+            last_day = end
+        else:
+            last_day = end.replace(day=1) - timedelta(days=1)
+        
+        if first_day > last_day:
+            return None
+        return first_day, last_day
+    
+    def _live_employee_stats(self, start_date=None, end_date=None, employee_id=None, stats=None):
+        """حساب الإحصائيات مباشرة من جداول السجلات في تمريرة تجميعية واحدة"""
+        conditions = ""
+        params = []
+        
+        if employee_id is not None:
+            conditions += " AND employee_id = ?"
+            params.append(employee_id)
+        
+        if start_date and end_date:
+            conditions += " AND registration_date BETWEEN ? AND ?"
+            params.extend([start_date, end_date])
+        
+        query = self.EMPLOYEE_STATS_QUERY.format(
+            outgoing_filter=conditions, incoming_filter=conditions
+        )
+        
+        return self._rows_to_employee_stats(self.execute_query(query, params * 2), stats)
+    
+    def get_all_employee_stats(self, start_date=None, end_date=None, employee_id=None):
+        """إحصائيات الفاكسات والإيميلات لجميع الموظفين
+        
+        تُقرأ من العدادات المحسوبة مسبقاً (employees وemployee_monthly_stats) التي
+        تحدثها المشغلات، ولا تُمسح جداول السجلات إلا لأطراف النطاق غير المكتملة شهرياً.
+        تعيد قاموساً {employee_id: {'fax_count', 'email_count', 'total'}}
+        الموظف الذي ليس له سجلات لا يظهر في القاموس
+        """
+        employee_filter = ""
+        employee_params = []
+        if employee_id is not None:
+            employee_filter = " AND employee_id = ?"
+            employee_params.append(employee_id)
+        
+        # بدون نطاق تاريخ: العدادات الإجمالية في جدول الموظفين
+        if not (start_date and end_date):
+            rows = self.execute_query(
+                "SELECT id, fax_count, email_count FROM employees "
+                "WHERE (fax_count > 0 OR email_count > 0)" + employee_filter.replace('employee_id', 'id'),
+                employee_params
+            )
+            return self._rows_to_employee_stats(rows)
+        
+        months = self._full_months_range(start_date, end_date)
+        if months is None:
+            return self._live_employee_stats(start_date, end_date, employee_id)
+        
+        first_day, last_day = months
+        
+        # الأشهر الكاملة من جدول التجميع الشهري
+        rows = self.execute_query(
+            """SELECT employee_id, SUM(fax_count), SUM(email_count)
+            FROM employee_monthly_stats
+            WHERE month BETWEEN ? AND ?""" + employee_filter + """
+            GROUP BY employee_id""",
+            [first_day.strftime('%Y-%m'), last_day.strftime('%Y-%m')] + employee_params
+        )
+        stats = self._rows_to_employee_stats(rows)
+        
+        # الأيام المتبقية في بداية ونهاية النطاق تُحسب مباشرة
+        if start_date < first_day.isoformat():
+            before_first = (first_day - timedelta(days=1)).isoformat()
+            self._live_employee_stats(start_date, before_first, employee_id, stats)
+        if end_date > last_day.isoformat():
+            after_last = (last_day + timedelta(days=1)).isoformat()
+            self._live_employee_stats(after_last, end_date, employee_id, stats)
+        
+        return {emp_id: entry for emp_id, entry in stats.items() if entry['total'] > 0}
+    
     def get_employee_stats(self, employee_id, start_date=None, end_date=None):
         """الحصول على إحصائيات الموظف"""
         try:
-            # إحصائيات الفاكسات (الصادر)
-            fax_query = """
-            SELECT COUNT(*) FROM outgoing_records 
-            WHERE employee_id = ?
-            """
-            fax_params = [employee_id]
-            
-            # إحصائيات الإيميلات (الوارد من نوع إيميل)
-            email_query = """
-            SELECT COUNT(*) FROM incoming_records 
-            WHERE employee_id = ? 
-            AND incoming_type_id IN (SELECT id FROM incoming_types WHERE name LIKE '%إيميل%' OR name LIKE '%email%')
-            """
-            email_params = [employee_id]
-            
-            if start_date and end_date:
-                fax_query += " AND registration_date BETWEEN ? AND ?"
-                email_query += " AND registration_date BETWEEN ? AND ?"
-                fax_params.extend([start_date, end_date])
-                email_params.extend([start_date, end_date])
-            
-            fax_count_result = self.execute_query(fax_query, fax_params)
-            email_count_result = self.execute_query(email_query, email_params)
-            
-            fax_count = fax_count_result[0][0] if fax_count_result and fax_count_result[0] else 0
-            email_count = email_count_result[0][0] if email_count_result and email_count_result[0] else 0
-            
-            return {
-                'fax_count': fax_count,
-                'email_count': email_count,
-                'total': fax_count + email_count
-            }
+            stats = self.get_all_employee_stats(start_date, end_date, employee_id=employee_id)
+            return stats.get(employee_id, {'fax_count': 0, 'email_count': 0, 'total': 0})
         except Exception as e:
             print(f"خطأ في الحصول على إحصائيات الموظف: {e}")
             return {'fax_count': 0, 'email_count': 0, 'total': 0}
     
     def update_employee_counts(self, employee_id):
-        """تحديث عدادات الموظف"""
+        """إعادة حساب عدادات الموظف من السجلات (تُحدث تلقائياً عبر المشغلات عادةً)"""
         try:
-            stats = self.get_employee_stats(employee_id)
-            # التحقق من وجود الأعمدة أولاً
-            result = self.execute_query("PRAGMA table_info(employees)")
-            columns = [row[1] for row in result] if result else []
-            
-            if 'fax_count' in columns and 'email_count' in columns:
-                self.execute_query(
-                    "UPDATE employees SET fax_count = ?, email_count = ? WHERE id = ?",
-                    (stats['fax_count'], stats['email_count'], employee_id)
-                )
+            stats = self._live_employee_stats(employee_id=employee_id).get(
+                employee_id, {'fax_count': 0, 'email_count': 0}
+            )
+            self.execute_query(
+                "UPDATE employees SET fax_count = ?, email_count = ? WHERE id = ?",
+                (stats['fax_count'], stats['email_count'], employee_id)
+            )
             return True
         except Exception as e:
             print(f"خطأ في تحديث عدادات الموظف: {e}")
             return False
     
-    def backup_database(self, backup_path):
-        """إنشاء نسخة احتياطية من قاعدة البيانات"""
+    def refresh_employee_counters(self):
+        """إعادة بناء جميع عدادات الموظفين والتجميع الشهري (للإصلاح)"""
         try:
-            import shutil
-            shutil.copy2(self.db_path, backup_path)
+            with self.pool.connection() as conn:
+                for statement in RECOMPUTE_EMPLOYEE_COUNTERS:
+                    conn.execute(statement)
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"خطأ في إعادة بناء عدادات الموظفين: {e}")
+            return False
+    
+    def rebuild_search_index(self):
+        """إعادة بناء فهرس البحث النصي بالكامل (للإصلاح)"""
+        try:
+            with self.pool.connection() as conn:
+                for statement in rebuild_statements():
+                    conn.execute(statement)
+                conn.commit()
+            return True
+        except Exception as e:
+            print(f"خطأ في إعادة بناء فهرس البحث: {e}")
+            return False
+    
+    def insert_record(self, record_type, values, year=None):
+        """إدخال سجل وارد أو صادر جديد مع حجز رقم السجل والرقم التسلسلي
+        
+        الحجز والإدخال في معاملة BEGIN IMMEDIATE واحدة، فالأرقام فريدة ومتتالية
+        حتى مع عدة مستخدمين، ولا يُستهلك رقم إن فشل الإدخال.
+        values: أعمدة السجل عدا record_number و serial_number.
+        يعيد (رقم السجل في الجدول، رقم السجل، الرقم التسلسلي) أو None عند الفشل
+        """
+        try:
+            with self.unit_of_work() as work:
+                return work.insert_record(record_type, values, year)
+        except Exception as e:
+            print(f"خطأ في إدخال السجل: {e}")
+            return None
+    
+    @contextmanager
+    def unit_of_work(self, file_manager=None):
+        """معاملة واحدة لحفظ أو حذف سجل مع مرفقاته وملفاتها (انظر UnitOfWork)
+        
+        تُحفظ عند انتهاء الكتلة. عند أي خطأ تُلغى المعاملة وتُحذف الملفات المنسوخة
+        ثم يُمرر الخطأ للمستدعي. لا تتداخل: بدؤها أثناء وحدة عمل أخرى أو معاملة
+        مفتوحة على اتصال الخيط خطأ بدلاً من تأكيد تلك المعاملة في منتصفها
+        """
+        if self.active_work() is not None:
+            raise sqlite3.OperationalError("توجد وحدة عمل مفتوحة بالفعل في هذا الخيط")
+        with self.pool.connection() as conn:
+            if conn.in_transaction:
+                raise sqlite3.OperationalError("لا يمكن بدء وحدة عمل أثناء معاملة مفتوحة على الاتصال")
+            work = UnitOfWork(self, conn, file_manager)
+            self._local.work = work
+            try:
+                yield work
+                self._local.work = None
+                work.commit()
+            except BaseException:
+                self._local.work = None
+                work.rollback()
+                raise
+    
+    def active_work(self):
+        """وحدة العمل المفتوحة في الخيط الحالي، أو None"""
+        return getattr(self._local, 'work', None)
+    
+    def peek_record_numbers(self, record_type, year=None):
+        """الأرقام المتوقعة للسجل الجديد التالي دون حجزها (للعرض في النموذج)"""
+        with self.pool.connection() as conn:
+            return peek_record_numbers(conn.cursor(), record_type, year or datetime.now().year)
+    
+    def add_attachment(self, record_id, record_type, saved_file, description=None, file_manager=None):
+        """تسجيل مرفق محفوظ عبر FileManager.save_attachment وربطه بملفه في المخزن
+    
+        عدد مراجع الملف يزداد تلقائياً عبر المشغل. يعيد رقم المرفق أو None
+        """
+        try:
+            with self.unit_of_work(file_manager) as work:
+                return work.add_attachment(record_id, record_type, saved_file, description)
+        except Exception as e:
+            print(f"خطأ في تسجيل المرفق: {e}")
+            return None
+    
+    def get_attachments_batch(self, after_id=0, limit=200):
+        """دفعة من المرفقات مع بياناتها المسجلة بترتيب الرقم (للتحقق الدوري)"""
+        return self.execute_query(
+            """SELECT id, file_name, file_path, file_size, file_type, file_mtime, blob_hash
+            FROM attachments WHERE id > ? ORDER BY id LIMIT ?""",
+            (after_id, limit)
+        ) or []
+    
+    def update_attachment_checks(self, updates):
+        """حفظ نتائج التحقق: (الحجم، النوع، تاريخ التعديل، الحالة، رقم المرفق)"""
+        return self.execute_many(
+            """UPDATE attachments
+            SET file_size = ?, file_type = ?, file_mtime = ?, file_status = ?, verified_date = CURRENT_TIMESTAMP
+            WHERE id = ?""",
+            updates
+        )
+    
+    def get_unreferenced_blobs(self):
+        """الملفات المخزنة التي لا يشير إليها أي مرفق"""
+        return self.execute_query(
+            "SELECT hash, file_path, file_size FROM attachment_blobs WHERE ref_count <= 0"
+        ) or []
+    
+    def get_attachment_storage_stats(self):
+        """حجم المرفقات المخزن فعلياً مقابل حجمها لو خُزن كل مرفق منفصلاً"""
+        result = self.execute_query("""
+            SELECT
+                (SELECT COUNT(*) FROM attachments),
+                (SELECT COUNT(*) FROM attachment_blobs WHERE ref_count > 0),
+                (SELECT COALESCE(SUM(file_size), 0) FROM attachment_blobs WHERE ref_count > 0),
+                (SELECT COALESCE(SUM(b.file_size), 0)
+                 FROM attachments a JOIN attachment_blobs b ON b.hash = a.blob_hash)
+        """)
+        attachments, blobs, stored_bytes, logical_bytes = result[0] if result else (0, 0, 0, 0)
+        return {
+            'attachments': attachments,
+            'blobs': blobs,
+            'stored_bytes': stored_bytes,
+            'saved_bytes': logical_bytes - stored_bytes
+        }
+    
+    def backup_database(self, backup_path, pages=-1, pause=0, progress=None, max_restarts=3):
+        """إنشاء نسخة احتياطية متسقة عبر واجهة النسخ في SQLite (آمنة أثناء الكتابة)
+        
+        pages: عدد الصفحات في كل خطوة (-1 للنسخ دفعة واحدة)
+        pause: توقف بالثواني بين الخطوات حتى لا تستأثر النسخة بالقرص
+        progress: دالة اختيارية تُستدعى (المتبقي، الإجمالي) بعد كل خطوة
+        
+        الكتابة من اتصال آخر أثناء النسخ على خطوات تعيده من البداية، فبعد max_restarts
+        تُكمل النسخة في خطوة واحدة حتى لا تتكرر إعادة البدء تحت ضغط الكتابة
+        """
+        state = {'remaining': None, 'restarts': 0}
+        
+        def on_step(status, remaining, total):
+            if state['remaining'] is not None and remaining > state['remaining']:
+                state['restarts'] += 1
+                if state['restarts'] > max_restarts:
+                    raise BackupRestartLimit()
+            state['remaining'] = remaining
+            if progress:
+                progress(remaining, total)
+            if pause and remaining:
+                time.sleep(pause)
+        
+        try:
+            target = sqlite3.connect(backup_path)
+            try:
+                with self.pool.connection() as conn:
+                    try:
+                        conn.backup(target, pages=pages, progress=on_step)
+                    except BackupRestartLimit:
+                        conn.backup(target)
+            finally:
+                target.close()
             return True
         except Exception as e:
             print(f"خطأ في النسخ الاحتياطي: {e}")
             return False
     
     def restore_database(self, backup_path):
-        """استعادة قاعدة البيانات من نسخة احتياطية"""
+        """استعادة قاعدة البيانات من نسخة احتياطية غير مضغوطة
+        
+        تُنسخ الصفحات إلى قاعدة البيانات المفتوحة عبر واجهة النسخ بدلاً من استبدال الملف،
+        ثم تُطبق الترحيلات إن كانت النسخة من إصدار أقدم
+        """
         try:
-            import shutil
-            shutil.copy2(backup_path, self.db_path)
+            source = sqlite3.connect(backup_path)
+            try:
+                with self.pool.connection() as conn:
+                    source.backup(conn)
+                    apply_migrations(conn)
+            finally:
+                source.close()
+            # الجداول المرجعية في النسخة المستعادة قد تختلف عن المحفوظة في الذاكرة
+            reference_cache.invalidate()
             return True
         except Exception as e:
             print(f"خطأ في استعادة النسخة الاحتياطية: {e}")
@@ -3,6 +3,8 @@ from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import os
 
+from utils.async_db import AsyncDatabaseManager
+
 class EmployeeReportsWindow:
     def __init__(self, parent, db_manager, export_manager):
         self.parent = parent
@@ -171,6 +173,11 @@ class EmployeeReportsWindow:
         
         ttk.Button(buttons_frame, text="إغلاق", 
                   command=self.parent.destroy).pack(side=tk.RIGHT, padx=5)
+        
+        # مؤشر تنفيذ الاستعلامات في الخلفية
+        self.progress = ttk.Progressbar(buttons_frame, mode='indeterminate', length=120)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.async_db = AsyncDatabaseManager(self.parent, self.db_manager, self.progress)
     
     def load_departments(self):
         """تحميل أقسام الموظفين"""
@@ -188,64 +195,57 @@ class EmployeeReportsWindow:
         department = self.department_combo.get()
         status_filter = self.status_combo.get()
         
-        try:
-            # بناء استعلام الموظفين
-            employee_query = "SELECT id, name, department, position, email, fax_count, email_count, is_active FROM employees WHERE 1=1"
-            params = []
-            
-            if department != 'الكل':
-                employee_query += " AND department = ?"
-                params.append(department)
-            
-            if status_filter == 'نشط فقط':
-                employee_query += " AND is_active = 1"
-            elif status_filter == 'غير نشط فقط':
-                employee_query += " AND is_active = 0"
-            
-            employee_query += " ORDER BY name"
-            
-            employees = self.db_manager.execute_query(employee_query, params)
-            
-            # حساب إحصائيات الفاكسات والإيميلات من سجلات الوارد والصادر
-            employee_stats = {}
-            total_faxes = 0
-            total_emails = 0
-            
-            for emp in employees:
-                emp_id = emp[0]
-                
-                # حساب الفاكسات (سجلات الصادر)
-                fax_count = self.db_manager.execute_query(
-                    """SELECT COUNT(*) FROM outgoing_records 
-                    WHERE employee_id = ? AND registration_date BETWEEN ? AND ?""",
-                    (emp_id, start_date, end_date)
-                )[0][0]
-                
-                # حساب الإيميلات (سجلات الوارد من نوع إيميل)
-                email_count = self.db_manager.execute_query(
-                    """SELECT COUNT(*) FROM incoming_records 
-                    WHERE employee_id = ? AND registration_date BETWEEN ? AND ? 
-                    AND incoming_type_id IN (SELECT id FROM incoming_types WHERE name LIKE '%إيميل%' OR name LIKE '%email%')""",
-                    (emp_id, start_date, end_date)
-                )[0][0]
-                
-                employee_stats[emp_id] = {
-                    'fax_count': fax_count,
-                    'email_count': email_count,
-                    'total': fax_count + email_count
-                }
-                
-                total_faxes += fax_count
-                total_emails += email_count
-            
-            # تحديث الإحصائيات العامة
-            self.update_statistics(employees, employee_stats, total_faxes, total_emails)
-            
-            # عرض البيانات في الجدول
-            self.display_employee_data(employees, employee_stats, total_faxes + total_emails)
+        self.async_db.submit(
+            self.fetch_report, start_date, end_date, department, status_filter, key='report',
+            on_success=self.show_report,
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل في توليد التقرير: {e}")
+        )
+    
+    def fetch_report(self, start_date, end_date, department, status_filter):
+        """جلب الموظفين وإحصائياتهم (يُنفذ في خيط عامل)"""
+        # بناء استعلام الموظفين
+        employee_query = "SELECT id, name, department, position, email, fax_count, email_count, is_active FROM employees WHERE 1=1"
+        params = []
+        
+        if department != 'الكل':
+            employee_query += " AND department = ?"
+            params.append(department)
+        
+        if status_filter == 'نشط فقط':
+            employee_query += " AND is_active = 1"
+        elif status_filter == 'غير نشط فقط':
+            employee_query += " AND is_active = 0"
+        
+        employee_query += " ORDER BY name"
+        
+        employees = self.db_manager.execute_query(employee_query, params)
+        
+        # حساب إحصائيات الفاكسات والإيميلات لجميع الموظفين في تمريرة واحدة
+        all_stats = self.db_manager.get_all_employee_stats(start_date, end_date)
+        
+        employee_stats = {}
+        total_faxes = 0
+        total_emails = 0
+        
+        for emp in employees:
+            emp_id = emp[0]
+            stats = all_stats.get(emp_id, {'fax_count': 0, 'email_count': 0, 'total': 0})
+            employee_stats[emp_id] = stats
             
-        except Exception as e:
-            messagebox.showerror("خطأ", f"فشل في توليد التقرير: {e}")
+            total_faxes += stats['fax_count']
+            total_emails += stats['email_count']
+        
+        return employees, employee_stats, total_faxes, total_emails
+    
+    def show_report(self, report):
+        """عرض نتائج التقرير"""
+        employees, employee_stats, total_faxes, total_emails = report
+        
+        # تحديث الإحصائيات العامة
+        self.update_statistics(employees, employee_stats, total_faxes, total_emails)
+        
+        # عرض البيانات في الجدول
+        self.display_employee_data(employees, employee_stats, total_faxes + total_emails)
     
     def update_statistics(self, employees, employee_stats, total_faxes, total_emails):
         """تحديث الإحصائيات العامة"""
@@ -3,12 +3,18 @@ from tkinter import ttk, messagebox
 from datetime import datetime
 import os
 
+from gui.paged_treeview import PagedTreeview
+from reference_cache import reference_cache
+
 class IncomingForm:
-    def __init__(self, parent, db_manager, file_manager, record_id=None):
+    def __init__(self, parent, db_manager, file_manager, record_id=None, snapshot_manager=None,
+                 statistics=None):
         self.parent = parent
         self.db_manager = db_manager
         self.file_manager = file_manager
         self.record_id = record_id
+        self.snapshot_manager = snapshot_manager
+        self.statistics = statistics
         self.attachments = []
         
         self.setup_window()
@@ -126,6 +132,9 @@ class IncomingForm:
                   command=self.delete_attachment).pack(side=tk.RIGHT, padx=5)
         ttk.Button(buttons_frame, text="عرض مرفق", 
                   command=self.view_attachment).pack(side=tk.RIGHT, padx=5)
+        if self.record_id and self.snapshot_manager:
+            ttk.Button(buttons_frame, text="استعادة المرفقات من آخر لقطة", 
+                      command=self.restore_attachments_from_snapshot).pack(side=tk.RIGHT, padx=5)
         
         # قائمة المرفقات
         columns = ('ID', 'اسم الملف', 'الحجم', 'الوصف')
@@ -161,65 +170,42 @@ class IncomingForm:
                       command=self.delete_record).pack(side=tk.LEFT, padx=5)
     
     def load_reference_data(self):
-        """تحميل البيانات المرجعية"""
+        """تحميل البيانات المرجعية من الذاكرة المشتركة (دون استعلامات ما لم تتغير)"""
         # جهات الوارد
-        sources = self.db_manager.execute_query("SELECT id, name FROM incoming_sources ORDER BY name")
-        self.source_combo['values'] = [name for _, name in sources]
-        self.sources_dict = {name: id for id, name in sources}
+        self.sources = reference_cache.get(self.db_manager, 'incoming_sources')
+        self.source_combo['values'] = self.sources.names
+        self.sources_dict = self.sources.ids
         
         # أنواع الوارد
-        types = self.db_manager.execute_query("SELECT id, name FROM incoming_types ORDER BY name")
-        self.type_combo['values'] = [name for _, name in types]
-        self.types_dict = {name: id for id, name in types}
+        self.types = reference_cache.get(self.db_manager, 'incoming_types')
+        self.type_combo['values'] = self.types.names
+        self.types_dict = self.types.ids
         
-        # الموظفين
-        employees = self.db_manager.execute_query(
-            "SELECT id, name FROM employees WHERE is_active = 1 ORDER BY name"
-        )
-        self.employee_combo['values'] = [name for _, name in employees]
-        self.employees_dict = {name: id for id, name in employees}
+        # الموظفين النشطين
+        self.employees = reference_cache.get(self.db_manager, 'employees')
+        self.employee_combo['values'] = self.employees.names
+        self.employees_dict = self.employees.ids
         
         # الاختصاصات
-        specializations = self.db_manager.execute_query(
-            "SELECT id, name FROM specializations ORDER BY name"
-        )
-        self.specialization_combo['values'] = [name for _, name in specializations]
-        self.specializations_dict = {name: id for id, name in specializations}
+        self.specializations = reference_cache.get(self.db_manager, 'specializations')
+        self.specialization_combo['values'] = self.specializations.names
+        self.specializations_dict = self.specializations.ids
     
     def generate_record_numbers(self):
-        """توليد أرقام السجلات تلقائياً"""
-        # توليد رقم سجل فريد
-        year = datetime.now().strftime('%Y')
-        last_record = self.db_manager.execute_query(
-            "SELECT record_number FROM incoming_records WHERE record_number LIKE ? ORDER BY id DESC LIMIT 1",
-            (f'IN-{year}-%',)
-        )
+        """عرض رقم السجل والرقم التسلسلي المتوقعين للسجل الجديد
         
-        if last_record:
-            last_number = int(last_record[0][0].split('-')[-1])
-            new_number = last_number + 1
-        else:
-            new_number = 1
-        
-        self.record_number.delete(0, tk.END)
-        self.record_number.insert(0, f'IN-{year}-{new_number:04d}')
+        الأرقام تُحجز فعلياً عند الحفظ في معاملة الإدخال نفسها، فقد تختلف عن
+        المعروضة إن حفظ مستخدم آخر سجلاً في الأثناء
+        """
+        record_number, serial_number = self.db_manager.peek_record_numbers('incoming')
+        for entry, value in ((self.record_number, record_number), (self.serial_number, serial_number)):
+            entry.delete(0, tk.END)
+            entry.insert(0, value)
+            entry.config(state='readonly')
         
         # توليد رقم وارد (يمكن تعديله يدوياً)
         self.incoming_number.delete(0, tk.END)
         self.incoming_number.insert(0, f'IN-{datetime.now().strftime("%Y%m%d")}')
-        
-        # توليد رقم تسلسلي
-        last_serial = self.db_manager.execute_query(
-            "SELECT serial_number FROM incoming_records ORDER BY id DESC LIMIT 1"
-        )
-        if last_serial:
-            last_serial_num = int(last_serial[0][0])
-            new_serial = last_serial_num + 1
-        else:
-            new_serial = 1
-        
-        self.serial_number.delete(0, tk.END)
-        self.serial_number.insert(0, str(new_serial))
     
     def load_record_data(self):
         """تحميل بيانات السجل للتعديل"""
@@ -250,49 +236,32 @@ class IncomingForm:
     
     def load_combo_values(self, source_id, type_id, employee_id, specialization_id):
         """تحميل قيم القوائم المنسدلة بناءً على الـ IDs"""
-        # جهة الوارد
-        source_name = self.db_manager.execute_query(
-            "SELECT name FROM incoming_sources WHERE id = ?", (source_id,)
-        )
-        if source_name:
-            self.source_combo.set(source_name[0][0])
-        
-        # نوع الوارد
-        type_name = self.db_manager.execute_query(
-            "SELECT name FROM incoming_types WHERE id = ?", (type_id,)
-        )
-        if type_name:
-            self.type_combo.set(type_name[0][0])
-        
-        # الموظف
-        employee_name = self.db_manager.execute_query(
-            "SELECT name FROM employees WHERE id = ?", (employee_id,)
-        )
-        if employee_name:
-            self.employee_combo.set(employee_name[0][0])
-        
-        # الاختصاص
-        specialization_name = self.db_manager.execute_query(
-            "SELECT name FROM specializations WHERE id = ?", (specialization_id,)
-        )
-        if specialization_name:
-            self.specialization_combo.set(specialization_name[0][0])
+        for combo, data, row_id in ((self.source_combo, self.sources, source_id),
+                                    (self.type_combo, self.types, type_id),
+                                    (self.employee_combo, self.employees, employee_id),
+                                    (self.specialization_combo, self.specializations, specialization_id)):
+            name = data.name_of(row_id)
+            if name:
+                combo.set(name)
     
     def load_attachments(self):
         """تحميل المرفقات"""
         attachments = self.db_manager.execute_query(
-            "SELECT id, file_name, file_path, description FROM attachments WHERE record_id = ? AND record_type = 'incoming'",
+            """SELECT id, file_name, file_path, description, blob_hash, file_size, file_status
+            FROM attachments WHERE record_id = ? AND record_type = 'incoming'""",
             (self.record_id,)
         )
         
         for att in attachments:
-            size = self.file_manager.get_attachment_size(att[2])
+            # الحجم والحالة مسجلان في قاعدة البيانات فلا حاجة للوصول إلى الملف
+            size = self.file_manager.display_size(att[5], att[6])
             self.attachments_tree.insert('', tk.END, values=(att[0], att[1], size, att[3]))
             self.attachments.append({
                 'id': att[0],
                 'file_name': att[1],
                 'file_path': att[2],
-                'description': att[3]
+                'description': att[3],
+                'hash': att[4]
             })
     
     def add_attachment(self):
@@ -303,27 +272,26 @@ class IncomingForm:
             description = tk.simpledialog.askstring("وصف المرفق", "أدخل وصفاً للمرفق (اختياري):")
             
             if self.record_id:
-                # حفظ المرفق مباشرة إذا كان سجل موجود
-                saved_file = self.file_manager.save_attachment(file_path, self.record_id, 'incoming')
+                # حفظ المرفق مباشرة إذا كان سجل موجود: الملف وصف المرفق معاً أو لا شيء
+                try:
+                    with self.db_manager.unit_of_work(self.file_manager) as work:
+                        saved_file = work.stage_file(file_path)
+                        attachment_id = work.add_attachment(self.record_id, 'incoming', saved_file, description)
+                except Exception as e:
+                    messagebox.showerror("خطأ", f"فشل في حفظ المرفق: {e}")
+                    saved_file = None
+                
                 if saved_file:
-                    # إدخال في قاعدة البيانات
-                    query = """
-                    INSERT INTO attachments (record_id, record_type, file_name, file_path, description)
-                    VALUES (?, 'incoming', ?, ?, ?)
-                    """
-                    attachment_id = self.db_manager.execute_query(
-                        query, (self.record_id, saved_file['file_name'], saved_file['file_path'], description)
-                    )
-                    
                     # إضافة للعرض
-                    size = self.file_manager.get_attachment_size(saved_file['file_path'])
+                    size = self.file_manager.display_size(saved_file['file_size'])
                     self.attachments_tree.insert('', tk.END, 
                                                values=(attachment_id, saved_file['file_name'], size, description))
                     self.attachments.append({
                         'id': attachment_id,
                         'file_name': saved_file['file_name'],
                         'file_path': saved_file['file_path'],
-                        'description': description
+                        'description': description,
+                        'hash': saved_file['hash']
                     })
             else:
                 # تخزين مؤقت حتى حفظ السجل
@@ -347,13 +315,13 @@ class IncomingForm:
         
         if messagebox.askyesno("تأكيد", "هل أنت متأكد من حذف هذا المرفق؟"):
             if attachment_id:  # مرفق محفوظ في قاعدة البيانات
-                # حذف من قاعدة البيانات
-                self.db_manager.execute_query("DELETE FROM attachments WHERE id = ?", (attachment_id,))
-                # حذف الملف
-                for att in self.attachments:
-                    if att['id'] == attachment_id:
-                        self.file_manager.delete_attachment(att['file_path'])
-                        break
+                # حذف الصف، والملف بعد الحفظ إذا لم يعد مرفقاً بسجل آخر
+                try:
+                    with self.db_manager.unit_of_work(self.file_manager) as work:
+                        work.delete_attachment(attachment_id)
+                except Exception as e:
+                    messagebox.showerror("خطأ", f"فشل في حذف المرفق: {e}")
+                    return
             
             self.attachments_tree.delete(selected[0])
             # إزالة من القائمة
@@ -374,6 +342,32 @@ class IncomingForm:
                 self.file_manager.open_attachment(att['file_path'])
                 break
     
+    def restore_attachments_from_snapshot(self):
+        """استعادة ملفات مرفقات هذا السجل فقط من آخر لقطة كاملة"""
+        if not messagebox.askyesno("تأكيد", "هل تريد استعادة ملفات مرفقات هذا السجل من آخر لقطة؟"):
+            return
+        
+        try:
+            restored, failures = self.snapshot_manager.restore_record_attachments('incoming', self.record_id)
+        except Exception as e:
+            messagebox.showerror("خطأ", f"فشل في استعادة المرفقات: {e}")
+            return
+        
+        # إعادة فحص الملفات المستعادة في الدورة التالية للتحقق الدوري
+        self.db_manager.execute_query(
+            "UPDATE attachments SET file_status = NULL WHERE record_id = ? AND record_type = 'incoming'",
+            (self.record_id,)
+        )
+        self.attachments_tree.delete(*self.attachments_tree.get_children())
+        self.attachments = []
+        self.load_attachments()
+        
+        if failures:
+            details = "\n".join(f"{path}: {error}" for path, error in failures[:10])
+            messagebox.showerror("خطأ", f"تمت استعادة {restored} ملف وتعذرت استعادة {len(failures)}:\n{details}")
+        else:
+            messagebox.showinfo("نجاح", f"تمت استعادة {restored} ملف")
+    
     def validate_form(self):
         """التحقق من صحة البيانات"""
         if not self.record_number.get().strip():
@@ -432,36 +426,36 @@ class IncomingForm:
                 WHERE id=?
                 """
                 self.db_manager.execute_query(query, data + (self.record_id,))
+                if self.statistics:
+                    self.statistics.invalidate()
                 messagebox.showinfo("نجاح", "تم تحديث السجل بنجاح")
             else:
-                # إدخال سجل جديد
-                query = """
-                INSERT INTO incoming_records 
-                (record_number, incoming_number, serial_number, title, incoming_source_id,
-                 incoming_type_id, employee_id, specialization_id, registration_date, details)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                new_id = self.db_manager.execute_query(query, data)
-                self.record_id = new_id
+                # إدخال سجل جديد: رقم السجل والرقم التسلسلي يُحجزان في معاملة الإدخال
+                columns = ('incoming_number', 'title', 'incoming_source_id', 'incoming_type_id',
+                           'employee_id', 'specialization_id', 'registration_date', 'details')
+                # السجل ومرفقاته المؤقتة في معاملة واحدة: الملفات تُنسخ إلى المخزن قبلها
+                # وتُحذف إن فشل الحفظ، فلا يبقى سجل بلا مرفقاته ولا ملفات بلا سجل
+                pending = [att for att in self.attachments if 'file_path' in att and not att.get('id')]
+                token = self.statistics.change_token() if self.statistics else None
+                with self.db_manager.unit_of_work(self.file_manager) as work:
+                    staged = [(work.stage_file(att['file_path']), att['description']) for att in pending]
+                    record_id, record_number, _ = work.insert_record('incoming', dict(zip(columns, data[1:2] + data[3:])))
+                    for saved_file, description in staged:
+                        work.add_attachment(record_id, 'incoming', saved_file, description)
+                self.record_id = record_id
                 
-                # حفظ المرفقات المؤقتة
-                for att in self.attachments:
-                    if 'file_path' in att and not att.get('id'):
-                        saved_file = self.file_manager.save_attachment(
-                            att['file_path'], self.record_id, 'incoming'
-                        )
-                        if saved_file:
-                            query = """
-                            INSERT INTO attachments (record_id, record_type, file_name, file_path, description)
-                            VALUES (?, 'incoming', ?, ?, ?)
-                            """
-                            self.db_manager.execute_query(
-                                query, (self.record_id, saved_file['file_name'], 
-                                      saved_file['file_path'], att['description'])
-                            )
+                # تحديث إحصائيات لوحة التحكم: السجل وحده يُضاف إلى الأعداد المحفوظة،
+                # والمرفقات تغير أحجام التخزين فتُعاد الإحصائيات
+                if self.statistics:
+                    if self.attachments:
+                        self.statistics.invalidate()
+                    else:
+                        self.statistics.record_added('incoming', data[8], token)
                 
-                messagebox.showinfo("نجاح", "تم حفظ السجل بنجاح")
+                messagebox.showinfo("نجاح", f"تم حفظ السجل بنجاح برقم {record_number}")
             
+            # أعداد نتائج الجداول (الكلية والبحث) تغيرت
+            PagedTreeview.invalidate_counts()
             self.parent.destroy()
             
         except Exception as e:
@@ -474,21 +468,12 @@ class IncomingForm:
         
         if messagebox.askyesno("تأكيد", "هل أنت متأكد من حذف هذا السجل وجميع مرفقاته؟"):
             try:
-                # حذف المرفقات أولاً
-                for att in self.attachments:
-                    if att.get('id'):
-                        self.file_manager.delete_attachment(att['file_path'])
-                
-                self.db_manager.execute_query(
-                    "DELETE FROM attachments WHERE record_id = ? AND record_type = 'incoming'",
-                    (self.record_id,)
-                )
-                
-                # حذف السجل
-                self.db_manager.execute_query(
-                    "DELETE FROM incoming_records WHERE id = ?",
-                    (self.record_id,)
-                )
+                # السجل ومرفقاته في معاملة واحدة، ثم ملفاتها التي لم تعد مرفقة بسجلات أخرى
+                with self.db_manager.unit_of_work(self.file_manager) as work:
+                    work.delete_record('incoming', self.record_id)
+                PagedTreeview.invalidate_counts()
+                if self.statistics:
+                    self.statistics.invalidate()
                 
                 messagebox.showinfo("نجاح", "تم حذف السجل بنجاح")
                 self.parent.destroy()
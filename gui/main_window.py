@@ -3,21 +3,48 @@ from tkinter import ttk, messagebox
 import sqlite3
 from datetime import datetime
 import os
-import shutil
-import pandas as pd
+import time
+
+from query_monitor import query_monitor
+from search_index import build_match_query, match_condition, rank_expression, search_join
+from utils.export_manager import ExportSpec
+from gui.paged_treeview import PagedTreeview
+from utils.async_db import AsyncDatabaseManager
+from utils.backup_manager import BackupManager
+from utils.snapshot_manager import SnapshotManager
+from utils.phase_timer import PhaseTimer
+from utils.statistics_service import StatisticsService
 
 class MainWindow:
-    def __init__(self, root, db_manager, file_manager, export_manager, printer_manager=None):
+    def __init__(self, root, db_manager, file_manager, export_manager, printer_manager=None, backup_manager=None,
+                 snapshot_manager=None, timer=None, statistics=None):
         self.root = root
         self.db_manager = db_manager
         self.file_manager = file_manager
         self.export_manager = export_manager
         self.printer_manager = printer_manager
-        
-        self.setup_window()
-        self.create_menu()
-        self.create_widgets()
+        self.backup_manager = backup_manager or BackupManager(db_manager)
+        self.snapshot_manager = snapshot_manager or SnapshotManager(db_manager, file_manager)
+        self.timer = timer or PhaseTimer()
+        self.statistics = statistics or StatisticsService(db_manager)
+        self.shown_statistics_version = None
+        
+        # مرشحات العرض الحالية للتصدير والطباعة، صالحة قبل بناء التبويبات
+        self.incoming_spec = ExportSpec('incoming')
+        self.outgoing_spec = ExportSpec('outgoing')
+        self.search_spec = None
+        
+        with self.timer.phase('window'):
+            self.setup_window()
+            self.create_menu()
+        with self.timer.phase('dashboard'):
+            self.create_widgets()
+            self.show_cached_statistics()
         self.load_statistics()
+        
+        # التحديث الدوري للوحة التحكم (0 لإيقافه)
+        self.statistics_refresh_interval = int(self.db_manager.get_setting('dashboard_refresh_seconds', 60))
+        self.schedule_statistics_refresh()
     
     def setup_window(self):
         """إعداد النافذة الرئيسية"""
@@ -62,6 +89,7 @@ class MainWindow:
         file_menu.add_command(label="تسجيل صادر جديد", command=self.open_outgoing_form)
         file_menu.add_separator()
         file_menu.add_command(label="تصدير البيانات", command=self.export_all_data)
+        file_menu.add_command(label="استيراد سجلات من ملف", command=self.import_records)
         file_menu.add_separator()
         file_menu.add_command(label="خروج", command=self.root.quit)
         
@@ -82,6 +110,10 @@ class MainWindow:
         management_menu.add_separator()
         management_menu.add_command(label="نسخ احتياطي", command=self.backup_database)
         management_menu.add_command(label="استعادة نسخة احتياطية", command=self.restore_database)
+        management_menu.add_command(label="لقطة كاملة (قاعدة البيانات والمرفقات)", command=self.create_snapshot)
+        management_menu.add_command(label="استعادة لقطة كاملة", command=self.restore_snapshot)
+        management_menu.add_separator()
+        management_menu.add_command(label="مراقبة الاستعلامات", command=self.open_query_monitor)
         
         # قائمة المساعدة
         help_menu = tk.Menu(menubar, tearoff=0)
@@ -91,6 +123,11 @@ class MainWindow:
     
     def create_widgets(self):
         """إنشاء عناصر الواجهة"""
+        # مؤشر تنفيذ الاستعلامات في الخلفية
+        self.progress = ttk.Progressbar(self.main_frame, mode='indeterminate', length=150)
+        self.progress.pack(side=tk.BOTTOM, anchor=tk.E, padx=5, pady=2)
+        self.async_db = AsyncDatabaseManager(self.root, self.db_manager, self.progress)
+        
         # إنشاء Notebook (تبويبات)
         self.notebook = ttk.Notebook(self.main_frame)
         self.notebook.pack(fill=tk.BOTH, expand=True)
@@ -111,10 +148,32 @@ class MainWindow:
         self.search_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.search_frame, text="🔍 بحث متقدم")
         
+        # لوحة التحكم تُبنى فوراً، وباقي التبويبات تُبنى وتُحمّل بياناتها عند أول اختيار لها
+        self.tab_builders = {
+            str(self.incoming_frame): ('incoming_tab', self.setup_incoming_tab),
+            str(self.outgoing_frame): ('outgoing_tab', self.setup_outgoing_tab),
+            str(self.search_frame): ('search_tab', self.setup_search_tab),
+        }
+        self.built_tabs = set()
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
         self.setup_dashboard()
-        self.setup_incoming_tab()
-        self.setup_outgoing_tab()
-        self.setup_search_tab()
+    
+    def on_tab_changed(self, event=None):
+        self.ensure_tab(self.notebook.select())
+    
+    def ensure_tab(self, frame):
+        """بناء التبويب وتحميل بياناته إن لم يكن قد بُني بعد"""
+        key = str(frame)
+        if key in self.built_tabs or key not in self.tab_builders:
+            return
+        self.built_tabs.add(key)
+        name, builder = self.tab_builders[key]
+        with self.timer.phase(name):
+            builder()
+    
+    def tab_built(self, frame):
+        return str(frame) in self.built_tabs
     
     def setup_dashboard(self):
         """إعداد لوحة التحكم"""
@@ -162,6 +221,11 @@ class MainWindow:
         self.attachments_count_label = ttk.Label(stats_grid, text="0", font=('Arial', 10))
         self.attachments_count_label.grid(row=1, column=5, sticky='w', padx=5, pady=2)
         
+        ttk.Label(stats_grid, text="حجم المرفقات:", 
+                 font=('Arial', 10, 'bold')).grid(row=1, column=6, sticky='w', padx=20, pady=2)
+        self.attachments_size_label = ttk.Label(stats_grid, text="-", font=('Arial', 10))
+        self.attachments_size_label.grid(row=1, column=7, sticky='w', padx=5, pady=2)
+        
         ttk.Label(stats_grid, text="آخر تحديث:", 
                  font=('Arial', 10, 'bold')).grid(row=0, column=6, sticky='w', padx=20, pady=5)
         self.last_update_label = ttk.Label(stats_grid, text=datetime.now().strftime('%Y-%m-%d %H:%M'), 
@@ -283,7 +347,9 @@ class MainWindow:
         columns = ('ID', 'رقم السجل', 'رقم الوارد', 'الرقم التسلسلي', 'العنوان', 
                   'جهة الوارد', 'النوع', 'الموظف', 'التاريخ')
         
-        self.incoming_tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        # جدول يحمّل السجلات على دفعات عند التمرير
+        self.incoming_list = PagedTreeview(table_frame, self.db_manager, columns, async_db=self.async_db)
+        self.incoming_tree = self.incoming_list.tree
         
         # إخفاء عمود ID
         self.incoming_tree.column('ID', width=0, stretch=tk.NO)
@@ -304,11 +370,7 @@ class MainWindow:
             self.incoming_tree.heading(col, text=col)
             self.incoming_tree.column(col, width=width)
         
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.incoming_tree.yview)
-        self.incoming_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.incoming_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.incoming_list.pack(fill=tk.BOTH, expand=True)
         
         # ربط حدث النقر المزدوج
         self.incoming_tree.bind('<Double-1>', lambda e: self.edit_incoming_record())
@@ -355,7 +417,9 @@ class MainWindow:
         columns = ('ID', 'رقم السجل', 'رقم الصادر', 'الرقم التسلسلي', 'العنوان', 
                   'جهة الصادر', 'الموظف', 'التاريخ')
         
-        self.outgoing_tree = ttk.Treeview(table_frame, columns=columns, show='headings')
+        # جدول يحمّل السجلات على دفعات عند التمرير
+        self.outgoing_list = PagedTreeview(table_frame, self.db_manager, columns, async_db=self.async_db)
+        self.outgoing_tree = self.outgoing_list.tree
         
         # إخفاء عمود ID
         self.outgoing_tree.column('ID', width=0, stretch=tk.NO)
@@ -375,11 +439,7 @@ class MainWindow:
             self.outgoing_tree.heading(col, text=col)
             self.outgoing_tree.column(col, width=width)
         
-        scrollbar = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=self.outgoing_tree.yview)
-        self.outgoing_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.outgoing_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.outgoing_list.pack(fill=tk.BOTH, expand=True)
         
         # ربط حدث النقر المزدوج
         self.outgoing_tree.bind('<Double-1>', lambda e: self.edit_outgoing_record())
@@ -418,7 +478,10 @@ class MainWindow:
         results_frame.pack(fill=tk.BOTH, expand=True, pady=5)
         
         columns = ('النوع', 'رقم السجل', 'الرقم', 'الرقم التسلسلي', 'العنوان', 'التاريخ', 'ID', 'RecordType')
-        self.search_results_tree = ttk.Treeview(results_frame, columns=columns, show='headings')
+        self.search_results_list = PagedTreeview(results_frame, self.db_manager, columns, async_db=self.async_db)
+        self.search_results_tree = self.search_results_list.tree
+        # مرشحات نتائج البحث الحالية للتصدير والطباعة
+        self.search_spec = None
         
         # إخفاء الأعمدة الإضافية
         self.search_results_tree.column('ID', width=0, stretch=tk.NO)
@@ -428,9 +491,6 @@ class MainWindow:
             self.search_results_tree.heading(col, text=col)
             self.search_results_tree.column(col, width=120)
         
-        scrollbar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.search_results_tree.yview)
-        self.search_results_tree.configure(yscrollcommand=scrollbar.set)
-        
         # أزرار التحكم في نتائج البحث
         results_buttons_frame = ttk.Frame(search_frame)
         results_buttons_frame.pack(fill=tk.X, pady=5)
@@ -442,81 +502,93 @@ class MainWindow:
         ttk.Button(results_buttons_frame, text="🖨️ طباعة", 
                   command=self.print_search_results).pack(side=tk.RIGHT, padx=5)
         
-        self.search_results_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.search_results_list.pack(fill=tk.BOTH, expand=True)
+        
+        # تلوين النتائج حسب النوع
+        self.search_results_tree.tag_configure('incoming', background='#f0f8ff')
+        self.search_results_tree.tag_configure('outgoing', background='#fff8f0')
         
         # ربط حدث النقر المزدوج
         self.search_results_tree.bind('<Double-1>', lambda e: self.show_search_details())
     
-    def load_statistics(self):
-        """تحميل الإحصائيات"""
-        try:
-            # إحصائيات الوارد
-            incoming_total = self.db_manager.execute_query(
-                "SELECT COUNT(*) FROM incoming_records"
-            )[0][0]
-            
-            current_month = datetime.now().strftime('%Y-%m')
-            incoming_month = self.db_manager.execute_query(
-                "SELECT COUNT(*) FROM incoming_records WHERE strftime('%Y-%m', registration_date) = ?",
-                (current_month,)
-            )[0][0]
-            
-            # إحصائيات الصادر
-            outgoing_total = self.db_manager.execute_query(
-                "SELECT COUNT(*) FROM outgoing_records"
-            )[0][0]
-            
-            outgoing_month = self.db_manager.execute_query(
-                "SELECT COUNT(*) FROM outgoing_records WHERE strftime('%Y-%m', registration_date) = ?",
-                (current_month,)
-            )[0][0]
-            
-            # إحصائيات الموظفين
-            employees_total = self.db_manager.execute_query(
-                "SELECT COUNT(*) FROM employees WHERE is_active = 1"
-            )[0][0]
-            
-            # إحصائيات المرفقات
-            attachments_total = self.db_manager.execute_query(
-                "SELECT COUNT(*) FROM attachments"
-            )[0][0]
-            
-            self.incoming_count_label.config(text=str(incoming_total))
-            self.incoming_month_label.config(text=str(incoming_month))
-            self.outgoing_count_label.config(text=str(outgoing_total))
-            self.outgoing_month_label.config(text=str(outgoing_month))
-            self.employees_count_label.config(text=str(employees_total))
-            self.attachments_count_label.config(text=str(attachments_total))
-            self.last_update_label.config(text=datetime.now().strftime('%Y-%m-%d %H:%M'))
-            
-            # تحميل أحدث السجلات
+    def show_cached_statistics(self):
+        """عرض آخر إحصائيات محفوظة فوراً إلى أن ينتهي تحديثها في الخلفية"""
+        stats = self.statistics.saved()
+        if stats:
+            self.show_statistics(stats, cached=True)
+    
+    def load_statistics(self, force=False):
+        """تحميل الإحصائيات في الخلفية (من الذاكرة إن لم تتغير قاعدة البيانات)"""
+        started = time.perf_counter()
+        
+        def done(stats):
+            self.timer.record('statistics_refresh', started)
+            self.shown_statistics_version = self.statistics.version
+            self.show_statistics(stats)
+        
+        self.async_db.submit(
+            self.statistics.get, force, key='statistics',
+            on_success=done,
+            on_error=lambda e: messagebox.showerror("خطأ", f"خطأ في تحميل الإحصائيات: {e}")
+        )
+    
+    def schedule_statistics_refresh(self):
+        if self.statistics_refresh_interval > 0:
+            self.root.after(self.statistics_refresh_interval * 1000, self.auto_refresh_statistics)
+    
+    def auto_refresh_statistics(self):
+        """التحديث الدوري: لا يتصل بقاعدة البيانات إن لم تتغير منذ آخر حساب"""
+        if not self.statistics.is_fresh():
+            self.load_statistics()
+        elif self.statistics.version != self.shown_statistics_version:
+            # تحديث تدريجي من نموذج (تسجيل سجل جديد) لم يُعرض بعد
+            self.shown_statistics_version = self.statistics.version
+            self.show_statistics(self.statistics.cached())
+        self.schedule_statistics_refresh()
+    
+    def show_statistics(self, stats, cached=False):
+        """عرض الإحصائيات في لوحة التحكم
+        
+        cached: إحصائيات محفوظة من تشغيل سابق، لا تُحمّل معها أحدث السجلات
+        """
+        self.incoming_count_label.config(text=str(stats['incoming_total']))
+        self.incoming_month_label.config(text=str(stats['incoming_month']))
+        self.outgoing_count_label.config(text=str(stats['outgoing_total']))
+        self.outgoing_month_label.config(text=str(stats['outgoing_month']))
+        self.employees_count_label.config(text=str(stats['employees_total']))
+        self.attachments_count_label.config(text=str(stats['attachments_total']))
+        self.attachments_size_label.config(text=self.file_manager.format_storage(
+            stats['stored_bytes'], stats['logical_bytes'] - stats['stored_bytes']
+        ))
+        self.last_update_label.config(text=stats['updated'])
+        
+        # تحميل أحدث السجلات
+        if not cached:
             self.load_recent_records()
-            
-        except Exception as e:
-            messagebox.showerror("خطأ", f"خطأ في تحميل الإحصائيات: {e}")
     
     def load_recent_records(self):
         """تحميل أحدث السجلات"""
         # أحدث الوارد
-        recent_incoming = self.db_manager.execute_query(
+        self.async_db.query(
             "SELECT record_number, serial_number, title, registration_date "
-            "FROM incoming_records ORDER BY id DESC LIMIT 10"
+            "FROM incoming_records ORDER BY id DESC LIMIT 10",
+            key='recent_incoming',
+            on_success=lambda records: self.fill_tree(self.recent_incoming_tree, records)
         )
         
-        self.recent_incoming_tree.delete(*self.recent_incoming_tree.get_children())
-        for record in recent_incoming:
-            self.recent_incoming_tree.insert('', tk.END, values=record)
-        
         # أحدث الصادر
-        recent_outgoing = self.db_manager.execute_query(
+        self.async_db.query(
             "SELECT record_number, outgoing_number, title, registration_date "
-            "FROM outgoing_records ORDER BY id DESC LIMIT 10"
+            "FROM outgoing_records ORDER BY id DESC LIMIT 10",
+            key='recent_outgoing',
+            on_success=lambda records: self.fill_tree(self.recent_outgoing_tree, records)
         )
-        
-        self.recent_outgoing_tree.delete(*self.recent_outgoing_tree.get_children())
-        for record in recent_outgoing:
-            self.recent_outgoing_tree.insert('', tk.END, values=record)
+    
+    def fill_tree(self, tree, records):
+        """استبدال محتوى جدول بالسجلات"""
+        tree.delete(*tree.get_children())
+        for record in records or []:
+            tree.insert('', tk.END, values=record)
     
     def load_incoming_records(self):
         """تحميل سجلات الوارد"""
@@ -527,14 +599,10 @@ class MainWindow:
         LEFT JOIN incoming_sources isrc ON ir.incoming_source_id = isrc.id
         LEFT JOIN incoming_types it ON ir.incoming_type_id = it.id
         LEFT JOIN employees e ON ir.employee_id = e.id
-        ORDER BY ir.id DESC
         """
         
-        records = self.db_manager.execute_query(query)
-        self.incoming_tree.delete(*self.incoming_tree.get_children())
-        
-        for record in records:
-            self.incoming_tree.insert('', tk.END, values=record)
+        self.incoming_spec = ExportSpec('incoming')
+        self.incoming_list.set_query(query, count_query="SELECT COUNT(*) FROM incoming_records")
     
     def load_outgoing_records(self):
         """تحميل سجلات الصادر"""
@@ -544,69 +612,53 @@ class MainWindow:
         FROM outgoing_records orc
         LEFT JOIN outgoing_destinations od ON orc.outgoing_destination_id = od.id
         LEFT JOIN employees e ON orc.employee_id = e.id
-        ORDER BY orc.id DESC
         """
         
-        records = self.db_manager.execute_query(query)
-        self.outgoing_tree.delete(*self.outgoing_tree.get_children())
-        
-        for record in records:
-            self.outgoing_tree.insert('', tk.END, values=record)
+        self.outgoing_spec = ExportSpec('outgoing')
+        self.outgoing_list.set_query(query, count_query="SELECT COUNT(*) FROM outgoing_records")
     
     def search_incoming(self, event=None):
         """بحث في سجلات الوارد"""
         search_term = self.incoming_search_entry.get().strip()
-        if not search_term:
+        match = build_match_query(search_term)
+        if not match:
             self.load_incoming_records()
             return
         
-        query = """
+        query = f"""
         SELECT ir.id, ir.record_number, ir.incoming_number, ir.serial_number, ir.title,
-               isrc.name, it.name, e.name, ir.registration_date
-        FROM incoming_records ir
+               isrc.name, it.name, e.name, ir.registration_date,
+               {rank_expression('incoming')} AS relevance
+        FROM {search_join('incoming', 'ir')}
         LEFT JOIN incoming_sources isrc ON ir.incoming_source_id = isrc.id
         LEFT JOIN incoming_types it ON ir.incoming_type_id = it.id
         LEFT JOIN employees e ON ir.employee_id = e.id
-        WHERE ir.record_number LIKE ? OR ir.incoming_number LIKE ? OR ir.serial_number LIKE ? 
-           OR ir.title LIKE ? OR isrc.name LIKE ? OR it.name LIKE ? OR e.name LIKE ?
-        ORDER BY ir.id DESC
+        WHERE {match_condition('incoming')}
         """
         
-        search_pattern = f"%{search_term}%"
-        params = [search_pattern] * 7
-        
-        records = self.db_manager.execute_query(query, params)
-        self.incoming_tree.delete(*self.incoming_tree.get_children())
-        
-        for record in records:
-            self.incoming_tree.insert('', tk.END, values=record)
+        self.incoming_spec = ExportSpec('incoming', search_text=search_term)
+        self.incoming_list.set_query(query, [match], order=[('relevance', 'ASC'), ('id', 'DESC')])
     
     def search_outgoing(self, event=None):
         """بحث في سجلات الصادر"""
         search_term = self.outgoing_search_entry.get().strip()
-        if not search_term:
+        match = build_match_query(search_term)
+        if not match:
             self.load_outgoing_records()
             return
         
-        query = """
+        query = f"""
         SELECT orc.id, orc.record_number, orc.outgoing_number, orc.serial_number, orc.title,
-               od.name, e.name, orc.registration_date
-        FROM outgoing_records orc
+               od.name, e.name, orc.registration_date,
+               {rank_expression('outgoing')} AS relevance
+        FROM {search_join('outgoing', 'orc')}
         LEFT JOIN outgoing_destinations od ON orc.outgoing_destination_id = od.id
         LEFT JOIN employees e ON orc.employee_id = e.id
-        WHERE orc.record_number LIKE ? OR orc.outgoing_number LIKE ? OR orc.serial_number LIKE ? 
-           OR orc.title LIKE ? OR od.name LIKE ? OR e.name LIKE ?
-        ORDER BY orc.id DESC
+        WHERE {match_condition('outgoing')}
         """
         
-        search_pattern = f"%{search_term}%"
-        params = [search_pattern] * 6
-        
-        records = self.db_manager.execute_query(query, params)
-        self.outgoing_tree.delete(*self.outgoing_tree.get_children())
-        
-        for record in records:
-            self.outgoing_tree.insert('', tk.END, values=record)
+        self.outgoing_spec = ExportSpec('outgoing', search_text=search_term)
+        self.outgoing_list.set_query(query, [match], order=[('relevance', 'ASC'), ('id', 'DESC')])
     
     def perform_search(self):
         """إجراء بحث متقدم"""
@@ -617,43 +669,51 @@ class MainWindow:
             messagebox.showwarning("تحذير", "يرجى إدخال نص للبحث")
             return
         
-        self.search_results_tree.delete(*self.search_results_tree.get_children())
+        self.search_results_list.clear()
+        self.search_spec = ExportSpec(search_type, search_text=search_term)
+        match = build_match_query(search_term)
         
-        if search_type == "incoming" or search_type == "both":
-            # بحث في الوارد
-            query = """
-            SELECT '📥 وارد', record_number, incoming_number, serial_number, title, registration_date, id, 'incoming'
-            FROM incoming_records
-            WHERE record_number LIKE ? OR incoming_number LIKE ? OR serial_number LIKE ? 
-               OR title LIKE ? OR details LIKE ?
-            """
-            search_pattern = f"%{search_term}%"
-            params = [search_pattern] * 5
-            
-            results = self.db_manager.execute_query(query, params)
-            for result in results:
-                self.search_results_tree.insert('', tk.END, values=result, tags=('incoming',))
+        parts = []
+        params = []
         
-        if search_type == "outgoing" or search_type == "both":
+        if match and (search_type == "incoming" or search_type == "both"):
+            # بحث في الوارد
+            parts.append(f"""
+            SELECT '📥 وارد', ir.record_number, ir.incoming_number, ir.serial_number, ir.title,
+                   ir.registration_date, ir.id AS id, 'incoming' AS record_type,
+                   {rank_expression('incoming')} AS relevance
+            FROM {search_join('incoming', 'ir')}
+            WHERE {match_condition('incoming')}
+            """)
+            params.append(match)
+        
+        if match and (search_type == "outgoing" or search_type == "both"):
             # بحث في الصادر
-            query = """
-            SELECT '📤 صادر', record_number, outgoing_number, serial_number, title, registration_date, id, 'outgoing'
-            FROM outgoing_records
-            WHERE record_number LIKE ? OR outgoing_number LIKE ? OR serial_number LIKE ? 
-               OR title LIKE ? OR details LIKE ?
-            """
-            search_pattern = f"%{search_term}%"
-            params = [search_pattern] * 5
-            
-            results = self.db_manager.execute_query(query, params)
-            for result in results:
-                self.search_results_tree.insert('', tk.END, values=result, tags=('outgoing',))
-        
-        # تلوين النتائج حسب النوع
-        self.search_results_tree.tag_configure('incoming', background='#f0f8ff')
-        self.search_results_tree.tag_configure('outgoing', background='#fff8f0')
-        
-        total_results = len(self.search_results_tree.get_children())
+            parts.append(f"""
+            SELECT '📤 صادر', orc.record_number, orc.outgoing_number, orc.serial_number, orc.title,
+                   orc.registration_date, orc.id AS id, 'outgoing' AS record_type,
+                   {rank_expression('outgoing')} AS relevance
+            FROM {search_join('outgoing', 'orc')}
+            WHERE {match_condition('outgoing')}
+            """)
+            params.append(match)
+        
+        if parts:
+            # النتائج مرتبة حسب الصلة ثم تُحمّل على دفعات، والنوع (عمود 7) يحدد لون الصف
+            self.search_results_list.set_query(
+                " UNION ALL ".join(parts), params,
+                order=[('relevance', 'ASC'), ('record_type', 'ASC'), ('id', 'DESC')],
+                tag_index=7,
+                on_loaded=self.show_search_count
+            )
+        else:
+            self.show_search_count(0)
+    
+    def show_search_count(self, total_results):
+        """إظهار عدد نتائج البحث بعد وصولها"""
+        if total_results is None:
+            # تعذر حساب العدد: الشارة أسفل الجدول توضح ذلك
+            return
         if total_results > 0:
             messagebox.showinfo("نتائج البحث", f"تم العثور على {total_results} نتيجة")
         else:
@@ -661,7 +721,8 @@ class MainWindow:
     
     def clear_search(self):
         """مسح نتائج البحث"""
-        self.search_results_tree.delete(*self.search_results_tree.get_children())
+        self.search_results_list.clear()
+        self.search_spec = None
         self.search_entry.delete(0, tk.END)
     
     def show_search_details(self):
@@ -684,114 +745,44 @@ class MainWindow:
     
     def export_search_results(self):
         """تصدير نتائج البحث"""
-        from tkinter import filedialog
-        
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("PDF files", "*.pdf"), ("Word files", "*.docx"), ("All files", "*.*")],
-            title="حفظ نتائج البحث"
-        )
-        
-        if file_path:
-            try:
-                # جمع البيانات من نتائج البحث
-                data = []
-                for item in self.search_results_tree.get_children():
-                    values = self.search_results_tree.item(item)['values']
-                    # استبعاد الأعمدة المخفية
-                    visible_values = values[:6]
-                    data.append(visible_values)
-                
-                columns = ['النوع', 'رقم السجل', 'الرقم', 'الرقم التسلسلي', 'العنوان', 'التاريخ']
-                
-                if file_path.endswith('.pdf'):
-                    success = self.export_manager.export_to_pdf(data, columns, file_path, "نتائج البحث")
-                elif file_path.endswith('.docx'):
-                    success = self.export_manager.export_to_word(data, columns, file_path, "نتائج البحث")
-                else:
-                    success = self.export_manager.export_to_excel(data, columns, file_path, "نتائج البحث")
-                
-                if success:
-                    messagebox.showinfo("نجاح", f"تم التصدير إلى: {file_path}")
-                else:
-                    messagebox.showerror("خطأ", "فشل في التصدير")
-                    
-            except Exception as e:
-                messagebox.showerror("خطأ", f"فشل في التصدير: {e}")
+        if self.search_spec is None:
+            messagebox.showwarning("تحذير", "لا توجد نتائج بحث للتصدير")
+            return
+        self.export_view(self.search_spec, "حفظ نتائج البحث")
     
     def export_incoming(self):
         """تصدير سجلات الوارد"""
-        from tkinter import filedialog
-        
-        file_path = filedialog.asksaveasfilename(
-            defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("PDF files", "*.pdf"), ("Word files", "*.docx"), ("All files", "*.*")],
-            title="حفظ سجلات الوارد"
-        )
-        
-        if file_path:
-            try:
-                data = []
-                for item in self.incoming_tree.get_children():
-                    values = self.incoming_tree.item(item)['values']
-                    # استبعاد عمود ID
-                    visible_values = values[1:]
-                    data.append(visible_values)
-                
-                columns = ['رقم السجل', 'رقم الوارد', 'الرقم التسلسلي', 'العنوان', 
-                          'جهة الوارد', 'النوع', 'الموظف', 'التاريخ']
-                
-                if file_path.endswith('.pdf'):
-                    success = self.export_manager.export_to_pdf(data, columns, file_path, "سجلات الوارد")
-                elif file_path.endswith('.docx'):
-                    success = self.export_manager.export_to_word(data, columns, file_path, "سجلات الوارد")
-                else:
-                    success = self.export_manager.export_to_excel(data, columns, file_path, "سجلات الوارد")
-                
-                if success:
-                    messagebox.showinfo("نجاح", f"تم التصدير إلى: {file_path}")
-                else:
-                    messagebox.showerror("خطأ", "فشل في التصدير")
-                    
-            except Exception as e:
-                messagebox.showerror("خطأ", f"فشل في التصدير: {e}")
+        self.export_view(self.incoming_spec, "حفظ سجلات الوارد")
     
     def export_outgoing(self):
         """تصدير سجلات الصادر"""
+        self.export_view(self.outgoing_spec, "حفظ سجلات الصادر")
+    
+    def export_view(self, spec, dialog_title):
+        """تصدير جميع السجلات المطابقة لمرشحات العرض من قاعدة البيانات في الخلفية
+        
+        لا يعتمد على الصفوف المحملة في الجدول، فالتصدير كامل حتى لو عُرضت دفعة واحدة فقط
+        """
         from tkinter import filedialog
         
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
             filetypes=[("Excel files", "*.xlsx"), ("PDF files", "*.pdf"), ("Word files", "*.docx"), ("All files", "*.*")],
-            title="حفظ سجلات الصادر"
+            title=dialog_title
         )
         
         if file_path:
-            try:
-                data = []
-                for item in self.outgoing_tree.get_children():
-                    values = self.outgoing_tree.item(item)['values']
-                    # استبعاد عمود ID
-                    visible_values = values[1:]
-                    data.append(visible_values)
-                
-                columns = ['رقم السجل', 'رقم الصادر', 'الرقم التسلسلي', 'العنوان', 
-                          'جهة الصادر', 'الموظف', 'التاريخ']
-                
-                if file_path.endswith('.pdf'):
-                    success = self.export_manager.export_to_pdf(data, columns, file_path, "سجلات الصادر")
-                elif file_path.endswith('.docx'):
-                    success = self.export_manager.export_to_word(data, columns, file_path, "سجلات الصادر")
-                else:
-                    success = self.export_manager.export_to_excel(data, columns, file_path, "سجلات الصادر")
-                
-                if success:
-                    messagebox.showinfo("نجاح", f"تم التصدير إلى: {file_path}")
-                else:
-                    messagebox.showerror("خطأ", "فشل في التصدير")
-                    
-            except Exception as e:
-                messagebox.showerror("خطأ", f"فشل في التصدير: {e}")
+            self.async_db.submit(
+                self.export_manager.export_spec, spec, file_path,
+                on_success=lambda success: self.show_export_result(success, f"تم التصدير إلى: {file_path}"),
+                on_error=lambda e: messagebox.showerror("خطأ", f"فشل في التصدير: {e}")
+            )
+    
+    def show_export_result(self, success, message):
+        if success:
+            messagebox.showinfo("نجاح", message)
+        else:
+            messagebox.showerror("خطأ", "فشل في التصدير")
     
     def export_all_data(self):
         """تصدير جميع البيانات"""
@@ -804,52 +795,32 @@ class MainWindow:
         )
         
         if file_path:
-            try:
-                # تصدير الوارد
-                incoming_data = []
-                for item in self.incoming_tree.get_children():
-                    values = self.incoming_tree.item(item)['values']
-                    incoming_data.append(values[1:])  # استبعاد ID
-                
-                # تصدير الصادر
-                outgoing_data = []
-                for item in self.outgoing_tree.get_children():
-                    values = self.outgoing_tree.item(item)['values']
-                    outgoing_data.append(values[1:])  # استبعاد ID
-                
-                # استخدام مدير التصدير لإنشاء ملف متعدد الأوراق
-                with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                    # ورقة الوارد
-                    incoming_columns = ['رقم السجل', 'رقم الوارد', 'الرقم التسلسلي', 'العنوان', 
-                                      'جهة الوارد', 'النوع', 'الموظف', 'التاريخ']
-                    pd.DataFrame(incoming_data, columns=incoming_columns).to_excel(
-                        writer, sheet_name='الوارد', index=False
-                    )
-                    
-                    # ورقة الصادر
-                    outgoing_columns = ['رقم السجل', 'رقم الصادر', 'الرقم التسلسلي', 'العنوان', 
-                                      'جهة الصادر', 'الموظف', 'التاريخ']
-                    pd.DataFrame(outgoing_data, columns=outgoing_columns).to_excel(
-                        writer, sheet_name='الصادر', index=False
-                    )
-                
-                messagebox.showinfo("نجاح", f"تم تصدير جميع البيانات إلى: {file_path}")
-                    
-            except Exception as e:
-                messagebox.showerror("خطأ", f"فشل في التصدير: {e}")
+            # ملف متعدد الأوراق: الوارد والصادر بمرشحات العرض الحالية
+            sheets = [('الوارد', self.incoming_spec), ('الصادر', self.outgoing_spec)]
+            self.async_db.submit(
+                self.export_manager.export_specs_to_excel, sheets, file_path,
+                on_success=lambda success: self.show_export_result(
+                    success, f"تم تصدير جميع البيانات إلى: {file_path}"
+                ),
+                on_error=lambda e: messagebox.showerror("خطأ", f"فشل في التصدير: {e}")
+            )
     
     def refresh_data(self):
         """تحديث جميع البيانات"""
-        self.load_statistics()
-        self.load_incoming_records()
-        self.load_outgoing_records()
+        PagedTreeview.invalidate_counts()
+        self.load_statistics(force=True)
+        if self.tab_built(self.incoming_frame):
+            self.load_incoming_records()
+        if self.tab_built(self.outgoing_frame):
+            self.load_outgoing_records()
         messagebox.showinfo("نجاح", "تم تحديث البيانات بنجاح")
     
     def open_incoming_form(self, record_id=None):
         """فتح نموذج تسجيل وارد"""
         from gui.incoming_form import IncomingForm
         form_window = tk.Toplevel(self.root)
-        IncomingForm(form_window, self.db_manager, self.file_manager, record_id)
+        IncomingForm(form_window, self.db_manager, self.file_manager, record_id, self.snapshot_manager,
+                     self.statistics)
         form_window.transient(self.root)
         form_window.grab_set()
     
@@ -857,7 +828,8 @@ class MainWindow:
         """فتح نموذج تسجيل صادر"""
         from gui.outgoing_form import OutgoingForm
         form_window = tk.Toplevel(self.root)
-        OutgoingForm(form_window, self.db_manager, self.file_manager, record_id)
+        OutgoingForm(form_window, self.db_manager, self.file_manager, record_id, self.snapshot_manager,
+                     self.statistics)
         form_window.transient(self.root)
         form_window.grab_set()
     
@@ -929,6 +901,21 @@ class MainWindow:
         except ImportError as e:
             messagebox.showerror("خطأ", f"لم يتم العثور على وحدة إدارة الموظفين: {e}")
     
+    def open_query_monitor(self):
+        """فتح نافذة مراقبة الاستعلامات (بعد تفعيلها إن كانت غير مفعلة)"""
+        if self.db_manager.monitor is None:
+            if not messagebox.askyesno(
+                "مراقبة الاستعلامات",
+                "مراقبة الاستعلامات غير مفعلة، وتفعيلها يبطئ كل استعلام قليلاً.\nهل تريد تفعيلها؟"
+            ):
+                return
+            self.db_manager.set_setting('query_monitor', '1')
+            self.db_manager.set_monitor(query_monitor, float(self.db_manager.get_setting('slow_query_ms', 100)))
+        from gui.query_monitor_window import QueryMonitorWindow
+        monitor_window = tk.Toplevel(self.root)
+        QueryMonitorWindow(monitor_window, self.db_manager, self.db_manager.monitor)
+        monitor_window.transient(self.root)
+    
     def edit_incoming_record(self):
         """تعديل سجل وارد محدد"""
         selected = self.incoming_tree.selection()
@@ -963,19 +950,13 @@ class MainWindow:
             record_id = item['values'][0]
             
             try:
-                # حذف المرفقات أولاً
-                self.db_manager.execute_query(
-                    "DELETE FROM attachments WHERE record_id = ? AND record_type = 'incoming'",
-                    (record_id,)
-                )
-                
-                # حذف السجل
-                self.db_manager.execute_query(
-                    "DELETE FROM incoming_records WHERE id = ?",
-                    (record_id,)
-                )
+                # السجل ومرفقاته في معاملة واحدة، ثم ملفاتها التي لم تعد مرفقة بسجلات أخرى
+                with self.db_manager.unit_of_work(self.file_manager) as work:
+                    work.delete_record('incoming', record_id)
                 
                 messagebox.showinfo("نجاح", "تم حذف السجل بنجاح")
+                PagedTreeview.invalidate_counts()
+                self.statistics.invalidate()
                 self.load_incoming_records()
                 self.load_statistics()
                 
@@ -996,19 +977,13 @@ class MainWindow:
             record_id = item['values'][0]
             
             try:
-                # حذف المرفقات أولاً
-                self.db_manager.execute_query(
-                    "DELETE FROM attachments WHERE record_id = ? AND record_type = 'outgoing'",
-                    (record_id,)
-                )
-                
-                # حذف السجل
-                self.db_manager.execute_query(
-                    "DELETE FROM outgoing_records WHERE id = ?",
-                    (record_id,)
-                )
+                # السجل ومرفقاته في معاملة واحدة، ثم ملفاتها التي لم تعد مرفقة بسجلات أخرى
+                with self.db_manager.unit_of_work(self.file_manager) as work:
+                    work.delete_record('outgoing', record_id)
                 
                 messagebox.showinfo("نجاح", "تم حذف السجل بنجاح")
+                PagedTreeview.invalidate_counts()
+                self.statistics.invalidate()
                 self.load_outgoing_records()
                 self.load_statistics()
                 
@@ -1019,7 +994,7 @@ class MainWindow:
         """طباعة سجلات الوارد"""
         try:
             if self.printer_manager and hasattr(self.printer_manager, 'quick_print_current_view'):
-                if self.printer_manager.quick_print_current_view(self.incoming_tree, 'incoming'):
+                if self.printer_manager.quick_print_current_view(self.incoming_spec, 'incoming'):
                     messagebox.showinfo("نجاح", "تم إرسال سجلات الوارد للطباعة")
             else:
                 messagebox.showwarning("تحذير", "خاصية الطباعة غير متاحة حالياً")
@@ -1030,7 +1005,7 @@ class MainWindow:
         """طباعة سجلات الصادر"""
         try:
             if self.printer_manager and hasattr(self.printer_manager, 'quick_print_current_view'):
-                if self.printer_manager.quick_print_current_view(self.outgoing_tree, 'outgoing'):
+                if self.printer_manager.quick_print_current_view(self.outgoing_spec, 'outgoing'):
                     messagebox.showinfo("نجاح", "تم إرسال سجلات الصادر للطباعة")
             else:
                 messagebox.showwarning("تحذير", "خاصية الطباعة غير متاحة حالياً")
@@ -1040,8 +1015,11 @@ class MainWindow:
     def print_search_results(self):
         """طباعة نتائج البحث"""
         try:
+            if self.search_spec is None:
+                messagebox.showwarning("تحذير", "لا توجد نتائج بحث للطباعة")
+                return
             if self.printer_manager and hasattr(self.printer_manager, 'quick_print_current_view'):
-                if self.printer_manager.quick_print_current_view(self.search_results_tree, 'search'):
+                if self.printer_manager.quick_print_current_view(self.search_spec, 'search'):
                     messagebox.showinfo("نجاح", "تم إرسال نتائج البحث للطباعة")
             else:
                 messagebox.showwarning("تحذير", "خاصية الطباعة غير متاحة حالياً")
@@ -1071,19 +1049,19 @@ class MainWindow:
             messagebox.showerror("خطأ", f"فشل في طباعة السجل المحدد: {e}")
     
     def backup_database(self):
-        """نسخ احتياطي لقاعدة البيانات"""
-        try:
-            backup_dir = "backups"
-            os.makedirs(backup_dir, exist_ok=True)
-            
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = os.path.join(backup_dir, f"database_backup_{timestamp}.db")
-            
-            shutil.copy2("data/database.db", backup_file)
-            messagebox.showinfo("نجاح", f"تم إنشاء نسخة احتياطية في: {backup_file}")
+        """نسخ احتياطي لقاعدة البيانات في الخلفية"""
+        def done(backup_file):
+            if backup_file:
+                self.backup_manager.prune_backups()
+                messagebox.showinfo("نجاح", f"تم إنشاء نسخة احتياطية في: {backup_file}")
+            else:
+                messagebox.showerror("خطأ", "فشل في إنشاء النسخة الاحتياطية")
         
-        except Exception as e:
-            messagebox.showerror("خطأ", f"فشل في إنشاء النسخة الاحتياطية: {e}")
+        self.async_db.submit(
+            self.backup_manager.create_backup,
+            on_success=done,
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل في إنشاء النسخة الاحتياطية: {e}")
+        )
     
     def restore_database(self):
         """استعادة نسخة احتياطية"""
@@ -1091,18 +1069,113 @@ class MainWindow:
         
         backup_file = filedialog.askopenfilename(
             title="اختر ملف النسخة الاحتياطية",
-            filetypes=[("Database files", "*.db"), ("All files", "*.*")]
+            filetypes=[("Database backups", "*.db *.db.gz *.db.zst"), ("All files", "*.*")]
         )
         
         if backup_file and os.path.exists(backup_file):
             if messagebox.askyesno("تأكيد", "هل أنت متأكد من استعادة النسخة الاحتياطية؟ سيتم فقدان جميع البيانات الحالية."):
-                try:
-                    shutil.copy2(backup_file, "data/database.db")
-                    messagebox.showinfo("نجاح", "تم استعادة النسخة الاحتياطية بنجاح")
-                    # إعادة تحميل البيانات
+                def done(success):
+                    if success:
+                        messagebox.showinfo("نجاح", "تم استعادة النسخة الاحتياطية بنجاح")
+                        # إعادة تحميل البيانات
+                        self.refresh_data()
+                    else:
+                        messagebox.showerror("خطأ", "فشل في استعادة النسخة الاحتياطية: النسخة تالفة أو غير صالحة")
+                
+                self.async_db.submit(
+                    self.backup_manager.restore_backup, backup_file,
+                    on_success=done,
+                    on_error=lambda e: messagebox.showerror("خطأ", f"فشل في استعادة النسخة الاحتياطية: {e}")
+                )
+    
+    def import_records(self):
+        """استيراد مجمع لسجلات الوارد أو الصادر من ملف CSV أو Excel في الخلفية"""
+        from tkinter import filedialog
+        from utils.import_manager import ImportManager
+        
+        file_path = filedialog.askopenfilename(
+            title="اختر ملف السجلات",
+            filetypes=[("CSV / Excel", "*.csv *.xlsx"), ("All files", "*.*")]
+        )
+        if not file_path:
+            return
+        
+        answer = messagebox.askyesnocancel("نوع السجلات", "هل السجلات في الملف سجلات وارد؟\n(لا = سجلات صادر)")
+        if answer is None:
+            return
+        record_type = 'incoming' if answer else 'outgoing'
+        
+        def done(result):
+            if result.already_done:
+                messagebox.showinfo("استيراد", "تم استيراد هذا الملف سابقاً")
+                return
+            message = f"أُدخل {result.inserted} سجل، رُفض {result.rejected} صف"
+            if result.resumed_from:
+                message += f"\n(استئناف بعد {result.resumed_from} صف)"
+            if result.rejected:
+                message += f"\nالصفوف المرفوضة وأسباب رفضها في: {result.rejects_path}"
+            messagebox.showinfo("استيراد", message)
+            
+            PagedTreeview.invalidate_counts()
+            self.statistics.invalidate()
+            self.load_statistics()
+            if self.tab_built(self.incoming_frame):
+                self.load_incoming_records()
+            if self.tab_built(self.outgoing_frame):
+                self.load_outgoing_records()
+        
+        self.async_db.submit(
+            ImportManager(self.db_manager).import_file, file_path, record_type,
+            key='import',
+            on_success=done,
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل الاستيراد: {e}\nيمكن استئنافه باختيار الملف نفسه مرة أخرى")
+        )
+    
+    def create_snapshot(self):
+        """لقطة تزايدية لقاعدة البيانات وملفات المرفقات في الخلفية"""
+        def done(result):
+            if result:
+                snapshot_file, added, reused = result
+                messagebox.showinfo("نجاح", f"تم إنشاء اللقطة في: {snapshot_file}\n"
+                                            f"ملفات جديدة: {added} - ملفات من لقطات سابقة: {reused}")
+            else:
+                messagebox.showerror("خطأ", "فشل في إنشاء اللقطة")
+        
+        self.async_db.submit(
+            self.snapshot_manager.create_snapshot,
+            on_success=done,
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل في إنشاء اللقطة: {e}")
+        )
+    
+    def restore_snapshot(self):
+        """استعادة قاعدة البيانات وملفات المرفقات من لقطة"""
+        from tkinter import filedialog
+        
+        snapshot_file = filedialog.askopenfilename(
+            title="اختر ملف اللقطة",
+            initialdir=self.snapshot_manager.snapshot_dir,
+            filetypes=[("Snapshots", "*.zip")]
+        )
+        
+        if snapshot_file and os.path.exists(snapshot_file):
+            # اللقطات التزايدية تشير إلى أرشيفات سابقة في المجلد نفسه
+            if os.path.dirname(os.path.abspath(snapshot_file)) != os.path.abspath(self.snapshot_manager.snapshot_dir):
+                messagebox.showerror("خطأ", f"يجب اختيار اللقطة من مجلد اللقطات: {self.snapshot_manager.snapshot_dir}")
+                return
+            if messagebox.askyesno("تأكيد", "هل أنت متأكد من استعادة اللقطة؟ سيتم فقدان جميع البيانات الحالية."):
+                def done(failures):
+                    if failures:
+                        details = "\n".join(f"{path}: {error}" for path, error in failures[:10])
+                        messagebox.showerror("خطأ", f"تعذر استعادة {len(failures)} ملف:\n{details}")
+                    else:
+                        messagebox.showinfo("نجاح", "تم استعادة اللقطة بنجاح")
                     self.refresh_data()
-                except Exception as e:
-                    messagebox.showerror("خطأ", f"فشل في استعادة النسخة الاحتياطية: {e}")
+                
+                self.async_db.submit(
+                    self.snapshot_manager.restore_snapshot, os.path.basename(snapshot_file),
+                    on_success=done,
+                    on_error=lambda e: messagebox.showerror("خطأ", f"فشل في استعادة اللقطة: {e}")
+                )
     
     def show_user_guide(self):
         """عرض دليل المستخدم"""
@@ -0,0 +1,263 @@
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+class PagedTreeview(ttk.Frame):
+    """جدول يعرض نتائج استعلام على دفعات بدلاً من تحميل جميع الصفوف
+    
+    يُحمّل فقط ما يملأ الجدول الظاهر مع هامش إضافي، ثم يجلب الدفعة التالية
+    عند الاقتراب من نهاية التمرير باستخدام ترقيم المفتاح (keyset) على ترتيب
+    الاستعلام (id DESC افتراضياً) بدلاً من OFFSET.
+    عدد النتائج الكلي يُحسب مرة واحدة ويُحفظ في ذاكرة مؤقتة مشتركة محدودة الحجم
+    (الأقدم استخداماً يُحذف أولاً)، ولا يُحفظ العدد إن فشل استعلامه.
+    عند تمرير async_db تُنفذ الاستعلامات في الخلفية، وتحميل استعلام جديد
+    يلغي طلبات الاستعلام السابق
+    """
+    
+    # ذاكرة مؤقتة لعدد النتائج: (الاستعلام، المعاملات) -> العدد، بترتيب آخر استخدام
+    count_cache = OrderedDict()
+    COUNT_CACHE_SIZE = 64
+    
+    DEFAULT_ROW_HEIGHT = 20
+    
+    def __init__(self, parent, db_manager, columns, page_size=100, prefetch_rows=50, async_db=None, **tree_options):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.async_db = async_db
+        self.page_size = page_size
+        self.prefetch_rows = prefetch_rows
+        # أعمدة الاستعلام الزائدة عن أعمدة الجدول (مثل درجة الصلة) تُستخدم للترتيب فقط
+        self.column_count = len(columns)
+        
+        self.query = None
+        self.params = []
+        self.order = [('id', 'DESC')]
+        self.count_query = None
+        self.count_params = []
+        self.tag_index = None
+        self.last_key = None
+        self.has_more = False
+        self.loaded = 0
+        self.load_pending = False
+        self.loading = False
+        self.generation = 0
+        self.on_loaded = None
+        
+        # شارة العدد الكلي
+        self.badge = ttk.Label(self, anchor=tk.E, font=('Arial', 9))
+        self.badge.pack(side=tk.BOTTOM, fill=tk.X, pady=(2, 0))
+        
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', **tree_options)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.on_scroll)
+        
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    
+    @classmethod
+    def invalidate_counts(cls):
+        """مسح أعداد النتائج المحفوظة بعد تعديل البيانات"""
+        cls.count_cache.clear()
+    
+    @classmethod
+    def cached_count(cls, key):
+        """العدد المحفوظ لهذا الاستعلام أو None"""
+        if key not in cls.count_cache:
+            return None
+        cls.count_cache.move_to_end(key)
+        return cls.count_cache[key]
+    
+    @classmethod
+    def store_count(cls, key, result):
+        """حفظ نتيجة استعلام العدد، ما لم يفشل (None)، وإعادة العدد"""
+        if not result:
+            return None
+        cls.count_cache[key] = result[0][0]
+        cls.count_cache.move_to_end(key)
+        while len(cls.count_cache) > cls.COUNT_CACHE_SIZE:
+            cls.count_cache.popitem(last=False)
+        return result[0][0]
+    
+    def set_query(self, query, params=(), order=None, count_query=None, count_params=None, tag_index=None,
+                  on_loaded=None):
+        """تعيين استعلام مصدر البيانات وتحميل الدفعة الأولى
+        
+        query: استعلام SELECT بدون ORDER BY أو LIMIT، أعمدته الأولى هي أعمدة الجدول بالترتيب
+               ويجب أن تظهر أعمدة الترتيب فيه بأسمائها
+        order: قائمة (العمود، الاتجاه) تحدد الترتيب ومفتاح الترقيم، ويجب أن تكون فريدة
+        count_query: استعلام عدد أسرع اختياري (الافتراضي COUNT(*) على الاستعلام نفسه)
+        tag_index: رقم العمود الذي تُستخدم قيمته وسماً للصف (للتلوين)
+        on_loaded: دالة تُستدعى بعدد النتائج الكلي بعد تحميل الدفعة الأولى
+        """
+        self.query = query
+        self.params = list(params)
+        self.order = list(order or [('id', 'DESC')])
+        self.count_query = count_query
+        self.count_params = list(count_params if count_params is not None else params)
+        self.tag_index = tag_index
+        self.on_loaded = on_loaded
+        self.reload()
+    
+    def clear(self):
+        """مسح الجدول وإيقاف التحميل"""
+        self.query = None
+        self.on_loaded = None
+        self.reset()
+        self.badge.config(text="")
+    
+    def reset(self):
+        """إفراغ الجدول وإهمال أي دفعات لم تصل بعد"""
+        self.generation += 1
+        self.has_more = False
+        self.loading = False
+        if self.async_db is not None:
+            self.async_db.cancel(self)
+            self.async_db.cancel((self, 'count'))
+        self.tree.delete(*self.tree.get_children())
+        self.last_key = None
+        self.loaded = 0
+    
+    def reload(self):
+        """إعادة التحميل من البداية"""
+        self.reset()
+        if self.query is None:
+            self.badge.config(text="")
+            return
+        self.has_more = True
+        self.load_more(self.visible_rows() + self.prefetch_rows)
+    
+    def visible_rows(self):
+        """عدد الصفوف التي تتسع لها مساحة الجدول الحالية"""
+        row_height = ttk.Style().lookup('Treeview', 'rowheight')
+        try:
+            row_height = int(row_height) or self.DEFAULT_ROW_HEIGHT
+        except (TypeError, ValueError):
+            row_height = self.DEFAULT_ROW_HEIGHT
+        return max(self.tree.winfo_height() // row_height, int(self.tree.cget('height')))
+    
+    def keyset_condition(self):
+        """شرط الصفوف التي تلي آخر صف محمل حسب ترتيب الاستعلام"""
+        conditions = []
+        params = []
+        for position, (column, direction) in enumerate(self.order):
+            operator = '<' if direction.upper() == 'DESC' else '>'
+            parts = [f"{previous} = ?" for previous, _ in self.order[:position]]
+            parts.append(f"{column} {operator} ?")
+            conditions.append("(" + " AND ".join(parts) + ")")
+            params.extend(self.last_key[:position + 1])
+        return "(" + " OR ".join(conditions) + ")", params
+    
+    def load_more(self, limit=None):
+        """جلب الدفعة التالية من الصفوف وإضافتها إلى الجدول"""
+        self.load_pending = False
+        if self.query is None or not self.has_more or self.loading:
+            return
+        
+        limit = max(limit or 0, self.page_size)
+        key_columns = ", ".join(column for column, _ in self.order)
+        order_by = ", ".join(f"{column} {direction}" for column, direction in self.order)
+        
+        query = f"SELECT *, {key_columns} FROM ({self.query})"
+        params = list(self.params)
+        if self.last_key is not None:
+            condition, key_params = self.keyset_condition()
+            query += f" WHERE {condition}"
+            params.extend(key_params)
+        query += f" ORDER BY {order_by} LIMIT ?"
+        params.append(limit)
+        
+        generation = self.generation
+        if self.async_db is None:
+            self.add_rows(self.db_manager.execute_query(query, params), limit, generation)
+        else:
+            self.loading = True
+            self.async_db.query(
+                query, params, key=self,
+                on_success=lambda rows: self.add_rows(rows, limit, generation),
+                on_error=lambda error: self.load_failed(error, generation)
+            )
+    
+    def add_rows(self, rows, limit, generation):
+        """إضافة دفعة وصلت إلى الجدول ما لم يُستبدل الاستعلام بعد طلبها"""
+        if generation != self.generation:
+            return
+        self.loading = False
+        
+        rows = rows or []
+        for row in rows:
+            values = row[:self.column_count]
+            tags = (values[self.tag_index],) if self.tag_index is not None else ()
+            self.tree.insert('', tk.END, values=values, tags=tags)
+        
+        key_size = len(self.order)
+        self.loaded += len(rows)
+        self.has_more = len(rows) == limit
+        if rows:
+            self.last_key = tuple(rows[-1][-key_size:])
+        
+        self.update_badge()
+    
+    def load_failed(self, error, generation):
+        """إيقاف التحميل وعرض الخطأ بدلاً من جدول فارغ بلا رسالة"""
+        if generation != self.generation:
+            return
+        self.loading = False
+        self.has_more = False
+        self.badge.config(text=f"تعذر تحميل السجلات: {error}")
+    
+    def count_key(self):
+        count_query = self.count_query or f"SELECT COUNT(*) FROM ({self.query})"
+        return count_query, tuple(self.count_params)
+    
+    def total_count(self):
+        """عدد النتائج الكلي من الذاكرة المؤقتة أو بحسابه مرة واحدة (None إن فشل الحساب)"""
+        if not self.has_more:
+            # تم تحميل كل النتائج فالعدد معروف
+            return self.loaded
+        
+        key = self.count_key()
+        total = self.cached_count(key)
+        if total is None:
+            total = self.store_count(key, self.db_manager.execute_query(*key))
+        return total
+    
+    def update_badge(self):
+        """عرض عدد الصفوف المحملة والعدد الكلي"""
+        if self.async_db is None or not self.has_more or self.cached_count(self.count_key()) is not None:
+            self.show_count(self.total_count())
+            return
+        
+        key = self.count_key()
+        generation = self.generation
+        self.badge.config(text=f"عرض {self.loaded} من ... سجل")
+        
+        def store(result):
+            total = self.store_count(key, result)
+            if generation == self.generation:
+                self.show_count(total)
+        
+        def failed(error):
+            if generation == self.generation:
+                self.show_count(None)
+        
+        self.async_db.query(key[0], key[1], key=(self, 'count'), on_success=store, on_error=failed)
+    
+    def show_count(self, total):
+        if total is None:
+            self.badge.config(text=f"عرض {self.loaded} سجل (تعذر حساب العدد الكلي)")
+        else:
+            self.badge.config(text=f"عرض {self.loaded} من {total} سجل")
+        if self.on_loaded is not None:
+            on_loaded, self.on_loaded = self.on_loaded, None
+            on_loaded(total)
+    
+    def on_scroll(self, first, last):
+        """تحديث شريط التمرير وجلب الدفعة التالية عند الاقتراب من النهاية"""
+        self.scrollbar.set(first, last)
+        if not self.has_more or self.load_pending or self.loading:
+            return
+        
+        remaining_rows = (1.0 - float(last)) * self.loaded
+        if remaining_rows <= self.prefetch_rows:
+            self.load_pending = True
+            self.after_idle(self.load_more)
@@ -0,0 +1,174 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from datetime import datetime
+
+class QueryMonitorWindow:
+    """عرض ما سجله مراقب الاستعلامات: عدد الاستعلامات لكل إجراء في الواجهة،
+    وأكثر الاستعلامات استهلاكاً للوقت، والاستعلامات البطيئة مع خطط تنفيذها، والأخطاء
+    """
+    
+    def __init__(self, parent, db_manager, monitor):
+        self.parent = parent
+        self.db_manager = db_manager
+        self.monitor = monitor
+        
+        self.setup_window()
+        self.create_widgets()
+        self.load_data()
+    
+    def setup_window(self):
+        """إعداد نافذة مراقبة الاستعلامات"""
+        self.parent.title("مراقبة الاستعلامات")
+        self.parent.geometry("1000x650")
+        self.parent.resizable(True, True)
+        
+        self.main_frame = ttk.Frame(self.parent, padding=10)
+        self.main_frame.pack(fill=tk.BOTH, expand=True)
+    
+    def create_widgets(self):
+        """إنشاء عناصر الواجهة"""
+        buttons_frame = ttk.Frame(self.main_frame)
+        buttons_frame.pack(fill=tk.X)
+        
+        ttk.Button(buttons_frame, text="تحديث", command=self.load_data).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(buttons_frame, text="تصفير", command=self.reset).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(buttons_frame, text="تصدير JSON", command=self.export_json).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(buttons_frame, text="إيقاف المراقبة", command=self.disable).pack(side=tk.RIGHT, padx=5)
+        
+        self.summary_label = ttk.Label(buttons_frame, text="")
+        self.summary_label.pack(side=tk.LEFT, padx=5)
+        
+        self.notebook = ttk.Notebook(self.main_frame)
+        self.notebook.pack(fill=tk.BOTH, expand=True, pady=10)
+        
+        # تبويب الإجراءات: عدد الاستعلامات لكل فتح نافذة أو ضغطة زر
+        actions_frame = ttk.Frame(self.notebook)
+        self.notebook.add(actions_frame, text="الاستعلامات لكل إجراء")
+        self.actions_tree = self.create_tree(actions_frame, (
+            ('الإجراء', 260), ('الاستعلامات', 90), ('الزمن (ms)', 90), ('المتوسط (ms)', 90),
+            ('انتظار الاتصال (ms)', 120), ('الصفوف', 80), ('البطيئة', 70), ('الأخطاء', 70)
+        ))
+        
+        # تبويب الاستعلامات مرتبة بمجموع زمنها
+        statements_frame = ttk.Frame(self.notebook)
+        self.notebook.add(statements_frame, text="الاستعلامات الأكثر استهلاكاً")
+        self.statements_tree = self.create_tree(statements_frame, (
+            ('الاستعلام', 480), ('المرات', 70), ('الزمن (ms)', 90), ('المتوسط (ms)', 90),
+            ('الأبطأ (ms)', 90), ('الصفوف', 80)
+        ))
+        
+        # تبويب الاستعلامات البطيئة مع خطة التنفيذ للسجل المحدد
+        slow_frame = ttk.Frame(self.notebook)
+        self.notebook.add(slow_frame, text="الاستعلامات البطيئة")
+        self.slow_tree = self.create_tree(slow_frame, (
+            ('الوقت', 130), ('الزمن (ms)', 80), ('الصفوف', 70), ('الدالة', 220), ('الإجراء', 200), ('الاستعلام', 400)
+        ))
+        self.slow_tree.bind('<<TreeviewSelect>>', self.show_plan)
+        
+        plan_frame = ttk.LabelFrame(slow_frame, text="خطة التنفيذ", padding=5)
+        plan_frame.pack(fill=tk.X, pady=5)
+        self.plan_text = tk.Text(plan_frame, height=8, wrap=tk.WORD)
+        self.plan_text.pack(fill=tk.X)
+        
+        # تبويب الأخطاء التي ابتلعها execute_query
+        errors_frame = ttk.Frame(self.notebook)
+        self.notebook.add(errors_frame, text="الأخطاء")
+        self.errors_tree = self.create_tree(errors_frame, (
+            ('الوقت', 130), ('الخطأ', 260), ('الدالة', 220), ('الاستعلام', 400)
+        ))
+    
+    def create_tree(self, parent, columns):
+        """جدول بأعمدة (العنوان، العرض) مع شريط تمرير"""
+        frame = ttk.Frame(parent)
+        frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        
+        names = [name for name, _ in columns]
+        tree = ttk.Treeview(frame, columns=names, show='headings')
+        for name, width in columns:
+            tree.heading(name, text=name)
+            tree.column(name, width=width, anchor=tk.E)
+        
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        return tree
+    
+    def load_data(self):
+        """تحميل ملخصات المراقب في الجداول"""
+        for tree in (self.actions_tree, self.statements_tree, self.slow_tree, self.errors_tree):
+            tree.delete(*tree.get_children())
+        
+        actions = self.monitor.action_summary()
+        total = 0
+        for action, summary in actions:
+            total += summary['queries']
+            self.actions_tree.insert('', tk.END, values=(
+                action, summary['queries'], f"{summary['total_ms']:.1f}",
+                f"{summary['total_ms'] / summary['queries']:.2f}", f"{summary['wait_ms']:.1f}",
+                summary['rows'], summary['slow'], summary['errors']
+            ))
+        
+        for text, summary in self.monitor.statement_summary():
+            self.statements_tree.insert('', tk.END, values=(
+                text, summary['count'], f"{summary['total_ms']:.1f}",
+                f"{summary['total_ms'] / summary['count']:.2f}", f"{summary['max_ms']:.1f}", summary['rows']
+            ))
+        
+        # الأحدث أولاً
+        self.slow_events = list(reversed(self.monitor.slow_queries()))
+        for index, event in enumerate(self.slow_events):
+            self.slow_tree.insert('', tk.END, iid=str(index), values=(
+                event.started, f"{event.duration_ms:.1f}", event.rows, event.caller, event.action, event.sql
+            ))
+        
+        for event in reversed(self.monitor.recent_errors()):
+            self.errors_tree.insert('', tk.END, values=(event.started, event.error, event.caller, event.sql))
+        
+        stats = self.db_manager.get_pool_stats()
+        self.summary_label.config(
+            text=f"منذ {self.monitor.started}: {total} استعلام | حد البطء {self.monitor.slow_ms:g} ms"
+                 f" | انتظار الاتصال {stats['waits']} مرة ({stats['wait_time'] * 1000:.0f} ms)"
+        )
+        self.plan_text.delete('1.0', tk.END)
+    
+    def show_plan(self, event=None):
+        """عرض الاستعلام البطيء المحدد وخطة تنفيذه"""
+        selection = self.slow_tree.selection()
+        if not selection:
+            return
+        event = self.slow_events[int(selection[0])]
+        plan = "\n".join(event.plan) if event.plan else "لا توجد خطة (ليس استعلام قراءة)"
+        self.plan_text.delete('1.0', tk.END)
+        self.plan_text.insert(tk.END, f"{event.sql}\n\n{plan}")
+    
+    def reset(self):
+        """تصفير السجلات والبدء من جديد"""
+        if messagebox.askyesno("تأكيد", "هل تريد تصفير سجلات مراقبة الاستعلامات؟", parent=self.parent):
+            self.monitor.reset()
+            self.db_manager.pool.reset_stats()
+            self.load_data()
+    
+    def disable(self):
+        """إيقاف مراقبة الاستعلامات وحفظ ذلك في الإعدادات ثم إغلاق النافذة"""
+        if messagebox.askyesno("تأكيد", "هل تريد إيقاف مراقبة الاستعلامات؟", parent=self.parent):
+            self.db_manager.set_setting('query_monitor', '0')
+            self.db_manager.set_monitor(None)
+            self.parent.destroy()
+    
+    def export_json(self):
+        """تصدير الملخصات والاستعلامات البطيئة إلى ملف JSON"""
+        file_path = filedialog.asksaveasfilename(
+            parent=self.parent,
+            title="تصدير سجل الاستعلامات",
+            defaultextension=".json",
+            filetypes=[("JSON", "*.json")],
+            initialfile=f"query_monitor_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        if not file_path:
+            return
+        try:
+            self.monitor.export_json(file_path, self.db_manager.get_pool_stats())
+            messagebox.showinfo("نجاح", f"تم تصدير سجل الاستعلامات إلى:\n{file_path}", parent=self.parent)
+        except Exception as e:
+            messagebox.showerror("خطأ", f"فشل في التصدير: {e}", parent=self.parent)
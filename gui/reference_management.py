@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from reference_cache import reference_cache
+
 class ReferenceManagement:
     def __init__(self, parent, db_manager):
         self.parent = parent
@@ -324,6 +326,7 @@ class ReferenceManagement:
                 "INSERT INTO incoming_sources (name, description) VALUES (?, ?)",
                 (name, desc)
             )
+            reference_cache.invalidate('incoming_sources')
             self.new_source_name.delete(0, tk.END)
             self.new_source_desc.delete(0, tk.END)
             self.load_incoming_sources()
@@ -344,6 +347,7 @@ class ReferenceManagement:
                 "INSERT INTO outgoing_destinations (name, description) VALUES (?, ?)",
                 (name, desc)
             )
+            reference_cache.invalidate('outgoing_destinations')
             self.new_destination_name.delete(0, tk.END)
             self.new_destination_desc.delete(0, tk.END)
             self.load_outgoing_destinations()
@@ -364,6 +368,7 @@ class ReferenceManagement:
                 "INSERT INTO incoming_types (name, description) VALUES (?, ?)",
                 (name, desc)
             )
+            reference_cache.invalidate('incoming_types')
             self.new_type_name.delete(0, tk.END)
             self.new_type_desc.delete(0, tk.END)
             self.load_incoming_types()
@@ -386,6 +391,7 @@ class ReferenceManagement:
                 "INSERT INTO employees (name, department, position, is_active) VALUES (?, ?, ?, ?)",
                 (name, dept, position, 1 if active else 0)
             )
+            reference_cache.invalidate('employees')
             self.new_employee_name.delete(0, tk.END)
             self.new_employee_dept.delete(0, tk.END)
             self.new_employee_position.delete(0, tk.END)
@@ -407,6 +413,7 @@ class ReferenceManagement:
                 "INSERT INTO specializations (name, description) VALUES (?, ?)",
                 (name, desc)
             )
+            reference_cache.invalidate('specializations')
             self.new_specialization_name.delete(0, tk.END)
             self.new_specialization_desc.delete(0, tk.END)
             self.load_specializations()
@@ -478,6 +485,7 @@ class ReferenceManagement:
                     "DELETE FROM incoming_sources WHERE id = ?",
                     (source_id,)
                 )
+                reference_cache.invalidate('incoming_sources')
                 self.load_incoming_sources()
                 messagebox.showinfo("نجاح", "تم الحذف بنجاح")
             except Exception as e:
@@ -509,6 +517,7 @@ class ReferenceManagement:
                     "DELETE FROM outgoing_destinations WHERE id = ?",
                     (destination_id,)
                 )
+                reference_cache.invalidate('outgoing_destinations')
                 self.load_outgoing_destinations()
                 messagebox.showinfo("نجاح", "تم الحذف بنجاح")
             except Exception as e:
@@ -540,6 +549,7 @@ class ReferenceManagement:
                     "DELETE FROM incoming_types WHERE id = ?",
                     (type_id,)
                 )
+                reference_cache.invalidate('incoming_types')
                 self.load_incoming_types()
                 messagebox.showinfo("نجاح", "تم الحذف بنجاح")
             except Exception as e:
@@ -576,6 +586,7 @@ class ReferenceManagement:
                     "DELETE FROM employees WHERE id = ?",
                     (employee_id,)
                 )
+                reference_cache.invalidate('employees')
                 self.load_employees()
                 messagebox.showinfo("نجاح", "تم الحذف بنجاح")
             except Exception as e:
@@ -612,6 +623,7 @@ class ReferenceManagement:
                     "DELETE FROM specializations WHERE id = ?",
                     (specialization_id,)
                 )
+                reference_cache.invalidate('specializations')
                 self.load_specializations()
                 messagebox.showinfo("نجاح", "تم الحذف بنجاح")
             except Exception as e:
@@ -636,6 +648,7 @@ class ReferenceManagement:
                 "UPDATE employees SET is_active = ? WHERE id = ?",
                 (new_status, employee_id)
             )
+            reference_cache.invalidate('employees')
             self.load_employees()
             status_text = "تم التفعيل" if new_status else "تم التعطيل"
             messagebox.showinfo("نجاح", f"{status_text} للموظف {employee_name}")
@@ -3,6 +3,9 @@ from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import os
 
+from report_engine import DIMENSIONS, MEASURES, ReportSpec, aggregate_report, find_dimension
+from utils.async_db import AsyncDatabaseManager
+
 class ReportsWindow:
     def __init__(self, parent, db_manager, export_manager, report_type):
         self.parent = parent
@@ -64,19 +67,32 @@ class ReportsWindow:
         group_frame = ttk.Frame(parent)
         group_frame.pack(fill=tk.X, pady=2)
         
-        ttk.Label(group_frame, text="التجميع حسب:").pack(side=tk.RIGHT, padx=5)
-        self.group_by = ttk.Combobox(group_frame, width=15, state="readonly")
-        
-        if self.report_type == 'incoming':
-            self.group_by['values'] = ['لا يوجد', 'جهة الوارد', 'نوع الوارد', 'الموظف', 'الاختصاص', 'الشهر']
-        else:
-            self.group_by['values'] = ['لا يوجد', 'جهة الصادر', 'الموظف', 'الاختصاص', 'الشهر']
+        dimension_labels = ['لا يوجد'] + [dimension.label for dimension in DIMENSIONS[self.report_type].values()]
         
+        ttk.Label(group_frame, text="التجميع حسب:").pack(side=tk.RIGHT, padx=5)
+        self.group_by = ttk.Combobox(group_frame, width=15, state="readonly", values=dimension_labels)
         self.group_by.set('لا يوجد')
         self.group_by.pack(side=tk.RIGHT, padx=5)
         
+        # مستوى ثانٍ: قيم البعد الثاني تصبح أعمدة (مثل الجهة × الشهر)
+        ttk.Label(group_frame, text="التقسيم حسب:").pack(side=tk.RIGHT, padx=5)
+        self.pivot_by = ttk.Combobox(group_frame, width=15, state="readonly", values=dimension_labels)
+        self.pivot_by.set('لا يوجد')
+        self.pivot_by.pack(side=tk.RIGHT, padx=5)
+        
         ttk.Button(group_frame, text="توليد التقرير", 
                   command=self.generate_report).pack(side=tk.RIGHT, padx=5)
+        
+        # مقاييس التقرير المجمع
+        measures_frame = ttk.Frame(parent)
+        measures_frame.pack(fill=tk.X, pady=2)
+        
+        ttk.Label(measures_frame, text="المقاييس:").pack(side=tk.RIGHT, padx=5)
+        self.measure_vars = {}
+        for key, measure in MEASURES.items():
+            self.measure_vars[key] = tk.BooleanVar(value=(key == 'count'))
+            ttk.Checkbutton(measures_frame, text=measure.label,
+                            variable=self.measure_vars[key]).pack(side=tk.RIGHT, padx=5)
     
     def setup_results_section(self, parent):
         """إعداد قسم النتائج"""
@@ -118,63 +134,45 @@ class ReportsWindow:
         
         ttk.Button(buttons_frame, text="إغلاق", 
                   command=self.parent.destroy).pack(side=tk.RIGHT, padx=5)
+        
+        # مؤشر تنفيذ الاستعلامات في الخلفية
+        self.progress = ttk.Progressbar(buttons_frame, mode='indeterminate', length=120)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.async_db = AsyncDatabaseManager(self.parent, self.db_manager, self.progress)
     
     def generate_report(self):
         """توليد التقرير"""
         start_date = self.start_date.get().strip()
         end_date = self.end_date.get().strip()
-        group_by = self.group_by.get()
-        
-        try:
-            if self.report_type == 'incoming':
-                data, columns = self.export_manager.generate_incoming_report(start_date, end_date)
-            else:
-                data, columns = self.export_manager.generate_outgoing_report(start_date, end_date)
-            
-            # تطبيق التجميع إذا تم اختياره
-            if group_by != 'لا يوجد':
-                data = self.apply_grouping(data, columns, group_by)
-                columns = self.get_grouped_columns(group_by)
-            
-            # عرض البيانات
-            self.display_data(data, columns)
-            
-        except Exception as e:
-            messagebox.showerror("خطأ", f"فشل في توليد التقرير: {e}")
-    
-    def apply_grouping(self, data, columns, group_by):
-        """تطبيق التجميع على البيانات"""
-        grouped_data = {}
+        group_by = find_dimension(self.report_type, self.group_by.get())
+        pivot_by = find_dimension(self.report_type, self.pivot_by.get())
+        measures = [key for key, var in self.measure_vars.items() if var.get()] or ['count']
         
-        for row in data:
-            if group_by == 'جهة الوارد':
-                key = row[4]  # جهة الوارد
-            elif group_by == 'نوع الوارد':
-                key = row[5]  # نوع الوارد
-            elif group_by == 'الموظف':
-                key = row[6]  # الموظف
-            elif group_by == 'الاختصاص':
-                key = row[7]  # الاختصاص
-            elif group_by == 'جهة الصادر':
-                key = row[4]  # جهة الصادر
-            elif group_by == 'الشهر':
-                key = row[-1][:7]  # السنة-الشهر
-            else:
-                key = 'غير محدد'
-            
-            if key not in grouped_data:
-                grouped_data[key] = 0
-            grouped_data[key] += 1
-        
-        # تحويل إلى قائمة من الصفوف
-        return [(key, count) for key, count in grouped_data.items()]
+        if group_by and pivot_by == group_by:
+            messagebox.showwarning("تحذير", "يرجى اختيار بعد تقسيم مختلف عن بعد التجميع")
+            return
+        
+        spec = None
+        if group_by:
+            spec = ReportSpec(self.report_type, group_by, pivot_by, measures, start_date, end_date)
+        
+        self.async_db.submit(
+            self.fetch_report, start_date, end_date, spec, key='report',
+            on_success=lambda result: self.display_data(*result),
+            on_error=lambda e: messagebox.showerror("خطأ", f"فشل في توليد التقرير: {e}")
+        )
     
-    def get_grouped_columns(self, group_by):
-        """الحصول على أعمدة التقرير المجمع"""
-        if group_by == 'الشهر':
-            return ['الفترة', 'عدد السجلات']
-        else:
-            return [group_by, 'عدد السجلات']
+    def fetch_report(self, start_date, end_date, spec=None):
+        """جلب بيانات التقرير (يُنفذ في خيط عامل)
+        
+        spec: مواصفات التقرير المجمع، يُجمع داخل قاعدة البيانات فلا تُجلب إلا الصفوف المجمعة
+        """
+        if spec:
+            return aggregate_report(self.db_manager, spec)
+        
+        if self.report_type == 'incoming':
+            return self.export_manager.generate_incoming_report(start_date, end_date)
+        return self.export_manager.generate_outgoing_report(start_date, end_date)
     
     def display_data(self, data, columns):
         """عرض البيانات في الجدول"""
@@ -2,7 +2,21 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
 
+from reference_cache import reference_cache
+from search_index import build_match_query, match_condition, rank_expression, search_join
+from utils.async_db import AsyncDatabaseManager
+
 class SearchWindow:
+    # أعمدة فهرس البحث لكل خيار في قائمة حقل البحث (None = جميع الأعمدة)
+    SEARCH_FIELD_COLUMNS = {
+        'جميع الحقول': None,
+        'رقم السجل': ['record_number'],
+        'الرقم': ['number'],
+        'الرقم التسلسلي': ['serial_number'],
+        'العنوان': ['title'],
+        'التفاصيل': ['details'],
+    }
+    
     def __init__(self, parent, db_manager):
         self.parent = parent
         self.db_manager = db_manager
@@ -147,22 +161,19 @@ class SearchWindow:
                   command=self.clear_results).pack(side=tk.RIGHT, padx=5)
         ttk.Button(buttons_frame, text="إغلاق", 
                   command=self.parent.destroy).pack(side=tk.RIGHT, padx=5)
+        
+        # مؤشر تنفيذ الاستعلامات في الخلفية
+        self.progress = ttk.Progressbar(buttons_frame, mode='indeterminate', length=120)
+        self.progress.pack(side=tk.LEFT, padx=5)
+        self.async_db = AsyncDatabaseManager(self.parent, self.db_manager, self.progress)
     
     def load_reference_data(self):
-        """تحميل البيانات المرجعية"""
-        # الموظفين
-        employees = self.db_manager.execute_query(
-            "SELECT id, name FROM employees WHERE is_active = 1 ORDER BY name"
-        )
-        employee_names = [name for _, name in employees]
-        self.employee_combo['values'] = [''] + employee_names
+        """تحميل البيانات المرجعية من الذاكرة المشتركة"""
+        # الموظفين النشطين
+        self.employee_combo['values'] = [''] + reference_cache.get(self.db_manager, 'employees').names
         
         # الاختصاصات
-        specializations = self.db_manager.execute_query(
-            "SELECT id, name FROM specializations ORDER BY name"
-        )
-        specialization_names = [name for _, name in specializations]
-        self.specialization_combo['values'] = [''] + specialization_names
+        self.specialization_combo['values'] = [''] + reference_cache.get(self.db_manager, 'specializations').names
     
     def build_search_query(self):
         """بناء استعلام البحث"""
@@ -174,105 +185,71 @@ class SearchWindow:
         employee = self.employee_combo.get()
         specialization = self.specialization_combo.get()
         
+        # البحث النصي عبر فهرس FTS مقيداً بعمود الحقل المختار
+        match = build_match_query(search_text, self.SEARCH_FIELD_COLUMNS.get(search_field))
+        
         queries = []
-        params = []
         
         if search_type in ['incoming', 'both']:
             query = """
-            SELECT 'وارد' as type, record_number, incoming_number as number, 
-                   serial_number, title, 
-                   (SELECT name FROM incoming_sources WHERE id = incoming_source_id) as entity,
-                   (SELECT name FROM employees WHERE id = employee_id) as employee,
-                   registration_date, id, 'incoming' as record_type
-            FROM incoming_records 
+            SELECT 'وارد' as type, ir.record_number, ir.incoming_number as number, 
+                   ir.serial_number, ir.title, 
+                   ir.incoming_source_id as entity, ir.employee_id as employee,
+                   ir.registration_date, ir.id, 'incoming' as record_type
+            FROM """ + (search_join('incoming', 'ir') if match else "incoming_records ir") + """
             WHERE 1=1
             """
             
-            if search_text:
-                if search_field == 'جميع الحقول':
-                    query += " AND (record_number LIKE ? OR incoming_number LIKE ? OR serial_number LIKE ? OR title LIKE ? OR details LIKE ?)"
-                    params.extend([f"%{search_text}%"] * 5)
-                elif search_field == 'رقم السجل':
-                    query += " AND record_number LIKE ?"
-                    params.append(f"%{search_text}%")
-                elif search_field == 'الرقم':
-                    query += " AND incoming_number LIKE ?"
-                    params.append(f"%{search_text}%")
-                elif search_field == 'الرقم التسلسلي':
-                    query += " AND serial_number LIKE ?"
-                    params.append(f"%{search_text}%")
-                elif search_field == 'العنوان':
-                    query += " AND title LIKE ?"
-                    params.append(f"%{search_text}%")
-                elif search_field == 'التفاصيل':
-                    query += " AND details LIKE ?"
-                    params.append(f"%{search_text}%")
-            
-            if start_date and end_date:
-                query += " AND registration_date BETWEEN ? AND ?"
-                params.extend([start_date, end_date])
-            
-            if employee:
-                query += " AND employee_id IN (SELECT id FROM employees WHERE name = ?)"
-                params.append(employee)
-            
-            if specialization:
-                query += " AND specialization_id IN (SELECT id FROM specializations WHERE name = ?)"
-                params.append(specialization)
-            
+            params = []
+            query, params = self.add_filters(query, params, 'ir', match, 'incoming',
+                                             start_date, end_date, employee, specialization)
             queries.append((query, params))
         
         if search_type in ['outgoing', 'both']:
             query = """
-            SELECT 'صادر' as type, record_number, outgoing_number as number, 
-                   serial_number, title, 
-                   (SELECT name FROM outgoing_destinations WHERE id = outgoing_destination_id) as entity,
-                   (SELECT name FROM employees WHERE id = employee_id) as employee,
-                   registration_date, id, 'outgoing' as record_type
-            FROM outgoing_records 
+            SELECT 'صادر' as type, orc.record_number, orc.outgoing_number as number, 
+                   orc.serial_number, orc.title, 
+                   orc.outgoing_destination_id as entity, orc.employee_id as employee,
+                   orc.registration_date, orc.id, 'outgoing' as record_type
+            FROM """ + (search_join('outgoing', 'orc') if match else "outgoing_records orc") + """
             WHERE 1=1
             """
             
             params_out = []
-            
-            if search_text:
-                if search_field == 'جميع الحقول':
-                    query += " AND (record_number LIKE ? OR outgoing_number LIKE ? OR serial_number LIKE ? OR title LIKE ? OR details LIKE ?)"
-                    params_out.extend([f"%{search_text}%"] * 5)
-                elif search_field == 'رقم السجل':
-                    query += " AND record_number LIKE ?"
-                    params_out.append(f"%{search_text}%")
-                elif search_field == 'الرقم':
-                    query += " AND outgoing_number LIKE ?"
-                    params_out.append(f"%{search_text}%")
-                elif search_field == 'الرقم التسلسلي':
-                    query += " AND serial_number LIKE ?"
-                    params_out.append(f"%{search_text}%")
-                elif search_field == 'العنوان':
-                    query += " AND title LIKE ?"
-                    params_out.append(f"%{search_text}%")
-                elif search_field == 'التفاصيل':
-                    query += " AND details LIKE ?"
-                    params_out.append(f"%{search_text}%")
-            
-            if start_date and end_date:
-                query += " AND registration_date BETWEEN ? AND ?"
-                params_out.extend([start_date, end_date])
-            
-            if employee:
-                query += " AND employee_id IN (SELECT id FROM employees WHERE name = ?)"
-                params_out.append(employee)
-            
-            if specialization:
-                query += " AND specialization_id IN (SELECT id FROM specializations WHERE name = ?)"
-                params_out.append(specialization)
-            
+            query, params_out = self.add_filters(query, params_out, 'orc', match, 'outgoing',
+                                                 start_date, end_date, employee, specialization)
             queries.append((query, params_out))
         
         return queries
     
+    def add_filters(self, query, params, alias, match, record_type,
+                    start_date, end_date, employee, specialization):
+        """إضافة شروط البحث المشتركة بين الوارد والصادر"""
+        if match:
+            query += f" AND {match_condition(record_type)}"
+            params.append(match)
+        
+        if start_date and end_date:
+            query += f" AND {alias}.registration_date BETWEEN ? AND ?"
+            params.extend([start_date, end_date])
+        
+        # الأسماء تُحول إلى معرفات من الذاكرة المشتركة (أسماء الموظفين قد تتكرر)
+        if employee:
+            employee_ids = reference_cache.get(self.db_manager, 'employees').ids_named(employee) or [None]
+            query += f" AND {alias}.employee_id IN ({', '.join('?' * len(employee_ids))})"
+            params.extend(employee_ids)
+        
+        if specialization:
+            query += f" AND {alias}.specialization_id = ?"
+            params.append(reference_cache.get(self.db_manager, 'specializations').ids.get(specialization))
+        
+        if match:
+            query += f" ORDER BY {rank_expression(record_type)}"
+        
+        return query, params
+    
     def perform_search(self):
-        """إجراء البحث"""
+        """إجراء البحث في الخلفية"""
         queries = self.build_search_query()
         
         if not queries:
@@ -282,31 +259,48 @@ class SearchWindow:
         # مسح النتائج السابقة
         self.results_tree.delete(*self.results_tree.get_children())
         
-        total_results = 0
+        # بحث جديد يلغي البحث السابق إن لم يكتمل
+        self.async_db.submit(
+            self.run_search_queries, queries, key='search',
+            on_success=self.display_results,
+            on_error=lambda e: messagebox.showerror("خطأ", f"خطأ في البحث: {e}")
+        )
+    
+    def run_search_queries(self, queries):
+        """تنفيذ استعلامات البحث (يُنفذ في خيط عامل)
+        
+        الجهة والموظف تُقرأ كمعرفات وتُحول إلى أسماء من الذاكرة المشتركة
+        """
+        entities = {
+            'incoming': reference_cache.get(self.db_manager, 'incoming_sources'),
+            'outgoing': reference_cache.get(self.db_manager, 'outgoing_destinations'),
+        }
+        employees = reference_cache.get(self.db_manager, 'employees')
         
+        results = []
         for query, params in queries:
-            try:
-                results = self.db_manager.execute_query(query, params)
-                total_results += len(results)
-                
-                for result in results:
-                    # استخراج البيانات المرئية فقط (بدون ID و RecordType)
-                    visible_data = result[:8]
-                    full_data = result  # كل البيانات بما فيها ID و RecordType
-                    self.results_tree.insert('', tk.END, values=full_data, tags=(result[0],))
-                
-            except Exception as e:
-                messagebox.showerror("خطأ", f"خطأ في البحث: {e}")
-                return
+            for row in self.db_manager.execute_query(query, params) or []:
+                row = list(row)
+                row[5] = entities[row[9]].name_of(row[5])
+                row[6] = employees.name_of(row[6])
+                results.append(row)
+        return results
+    
+    def display_results(self, results):
+        """عرض نتائج البحث"""
+        for result in results:
+            # كل البيانات بما فيها ID و RecordType
+            self.results_tree.insert('', tk.END, values=result, tags=(result[0],))
         
         # تلوين الصفوف حسب النوع
         self.results_tree.tag_configure('وارد', background='#f0f8ff')
         self.results_tree.tag_configure('صادر', background='#fff8f0')
         
-        messagebox.showinfo("نتائج البحث", f"تم العثور على {total_results} نتيجة")
+        messagebox.showinfo("نتائج البحث", f"تم العثور على {len(results)} نتيجة")
     
     def clear_results(self):
         """مسح نتائج البحث"""
+        self.async_db.cancel('search')
         self.results_tree.delete(*self.results_tree.get_children())
         self.search_text.delete(0, tk.END)
         self.employee_combo.set('')
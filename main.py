@@ -5,28 +5,44 @@ from datetime import datetime
 import os
 import shutil
 import sys
-import pandas as pd
+import threading
 
 # إضافة المسارات إلى sys.path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'gui'))
 sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 
 from database import DatabaseManager
-from utils.file_manager import FileManager
-from utils.export_manager import ExportManager
+from query_monitor import query_monitor
+from utils.file_manager import AttachmentReconciler, FileManager
+from utils.export_manager import ExportManager, missing_backends, prewarm_backends
 from utils.printer import PrinterManager
+from utils.backup_manager import BackupManager, BackupScheduler
+from utils.phase_timer import PhaseTimer
 from gui.main_window import MainWindow
 
 class CorrespondenceManagementSystem:
+    # المهلة بالمللي ثانية قبل تحميل مكتبات التصدير في الخلفية
+    PREWARM_DELAY = 2000
+    
     def __init__(self):
-        self.root = tk.Tk()
-        self.setup_environment()
+        # زمن كل مرحلة من مراحل البدء حتى ظهور النافذة الأولى
+        self.timer = PhaseTimer()
+        
+        with self.timer.phase('tk'):
+            self.root = tk.Tk()
+            self.setup_environment()
         
         # تهيئة المديرين
-        self.db_manager = DatabaseManager()
+        with self.timer.phase('database'):
+            self.db_manager = DatabaseManager()
+            if self.db_manager.get_setting('query_monitor', '0') == '1':
+                self.db_manager.set_monitor(query_monitor, float(self.db_manager.get_setting('slow_query_ms', 100)))
         self.file_manager = FileManager()
         self.export_manager = ExportManager(self.db_manager)
         self.printer_manager = PrinterManager(self.db_manager, self.export_manager)
+        self.backup_manager = BackupManager(self.db_manager)
+        self.attachment_reconciler = None
+        self.backup_scheduler = None
         
         # التحقق من المكتبات المطلوبة
         if not self.check_required_libraries():
@@ -35,11 +51,26 @@ class CorrespondenceManagementSystem:
         # إنشاء الواجهة الرئيسية
         try:
             self.main_window = MainWindow(self.root, self.db_manager, self.file_manager, 
-                                        self.export_manager, self.printer_manager)
+                                        self.export_manager, self.printer_manager, self.backup_manager,
+                                        timer=self.timer)
         except Exception as e:
             messagebox.showerror("خطأ", f"فشل في تحميل الواجهة: {e}")
             self.root.destroy()
             return
+        
+        # التحقق الدوري من ملفات المرفقات في الخلفية
+        self.attachment_reconciler = AttachmentReconciler(self.db_manager, self.file_manager)
+        self.attachment_reconciler.start()
+        
+        # النسخ الاحتياطي التلقائي حسب إعداد backup_auto
+        self.backup_scheduler = BackupScheduler(self.backup_manager)
+        self.backup_scheduler.start()
+        
+        # تحميل مكتبات التصدير والطباعة في الخلفية بعد ظهور النافذة
+        if self.db_manager.get_setting('export_prewarm', '1') == '1':
+            self.root.after(self.PREWARM_DELAY, self.prewarm_export_backends)
+        
+        self.root.after_idle(self.first_window_shown)
 
     def setup_environment(self):
         """إعداد بيئة التطبيق"""
@@ -86,21 +117,8 @@ class CorrespondenceManagementSystem:
         self.root.geometry('{}x{}+{}+{}'.format(width, height, x, y))
 
     def check_required_libraries(self):
-        """التحقق من المكتبات المطلوبة"""
-        required_libraries = {
-            'pandas': 'pandas',
-            'openpyxl': 'openpyxl', 
-            'docx': 'python-docx',
-            'reportlab': 'reportlab'
-        }
-        
-        missing_libraries = []
-        
-        for import_name, package_name in required_libraries.items():
-            try:
-                __import__(import_name)
-            except ImportError:
-                missing_libraries.append(package_name)
+        """التحقق من وجود مكتبات التصدير والطباعة دون استيرادها"""
+        missing_libraries = missing_backends()
         
         if missing_libraries:
             missing_text = "\n".join(missing_libraries)
@@ -114,6 +132,14 @@ class CorrespondenceManagementSystem:
         
         return True
 
+    def first_window_shown(self):
+        """تسجيل زمن ظهور النافذة الأولى (أدوات القياس تقرأ المراحل من self.timer)"""
+        self.timer.mark('first_window')
+
+    def prewarm_export_backends(self):
+        """استيراد مكتبات التصدير في خيط خلفي حتى لا يتأخر أول تصدير أو طباعة"""
+        threading.Thread(target=prewarm_backends, name="export-prewarm", daemon=True).start()
+
     def run(self):
         """تشغيل التطبيق"""
         try:
@@ -122,6 +148,14 @@ class CorrespondenceManagementSystem:
             self.root.mainloop()
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ غير متوقع: {e}")
+        finally:
+            # آخر إحصائيات للوحة التحكم تُحفظ للعرض الفوري عند التشغيل التالي
+            if getattr(self, 'main_window', None):
+                self.main_window.statistics.persist()
+            if self.attachment_reconciler:
+                self.attachment_reconciler.stop()
+            if self.backup_scheduler:
+                self.backup_scheduler.stop()
 
     def maximize_window(self):
         """تكبير النافذة"""
@@ -0,0 +1,429 @@
+import sqlite3
+import sys
+
+from search_index import build_match_query, match_condition, rank_expression, search_index_statements, search_join
+from report_engine import ReportSpec, build_report_query
+from sequences import sequence_statements
+from utils.import_manager import import_checkpoint_statements
+from utils.statistics_service import STATISTICS_QUERY
+
+# ============================================================
+# محرك ترحيل مخطط قاعدة البيانات
+# كل ترحيل له رقم إصدار تصاعدي، ويُنفذ مرة واحدة فقط داخل معاملة
+# ويُسجل في جدول schema_version
+# ============================================================
+
+def _add_employee_columns(cursor):
+    """إضافة أعمدة الاتصال والعدادات إلى جدول الموظفين"""
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(employees)")}
+    columns_to_add = [
+        ('email', 'TEXT'),
+        ('phone', 'TEXT'),
+        ('fax_count', 'INTEGER DEFAULT 0'),
+        ('email_count', 'INTEGER DEFAULT 0')
+    ]
+
+    for column_name, column_type in columns_to_add:
+        if column_name not in existing:
+            cursor.execute(f"ALTER TABLE employees ADD COLUMN {column_name} {column_type}")
+
+# الفهارس مختارة حسب الاستعلامات الفعلية في التطبيق:
+# - التقارير حسب نطاق التاريخ مرتبة بتاريخ التسجيل
+# - عدادات الموظفين (الفاكسات والإيميلات) ضمن نطاق تاريخ
+# - التجميع حسب الجهة والنوع والاختصاص
+# - التحقق من الارتباط قبل حذف الكيانات المرجعية
+# - تحميل مرفقات سجل محدد
+RECORD_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_incoming_registration_date ON incoming_records (registration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_incoming_employee_date ON incoming_records (employee_id, registration_date, incoming_type_id)",
+    "CREATE INDEX IF NOT EXISTS idx_incoming_type_date ON incoming_records (incoming_type_id, registration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_incoming_source_date ON incoming_records (incoming_source_id, registration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_incoming_specialization ON incoming_records (specialization_id)",
+    "CREATE INDEX IF NOT EXISTS idx_outgoing_registration_date ON outgoing_records (registration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_outgoing_employee_date ON outgoing_records (employee_id, registration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_outgoing_destination_date ON outgoing_records (outgoing_destination_id, registration_date)",
+    "CREATE INDEX IF NOT EXISTS idx_outgoing_specialization ON outgoing_records (specialization_id)",
+    "CREATE INDEX IF NOT EXISTS idx_attachments_record ON attachments (record_type, record_id)"
+]
+
+# ============================================================
+# العدادات المادية للموظفين (fax_count / email_count) وجدول التجميع الشهري
+# تُحدث تلقائياً عبر مشغلات عند إضافة أو تعديل أو حذف السجلات
+# ============================================================
+
+# شرط كون نوع الوارد إيميلاً (نفس الشرط المستخدم في التقارير)
+EMAIL_TYPE_CONDITION = "(name LIKE '%إيميل%' OR name LIKE '%email%')"
+
+def _is_email_type(type_id_expr):
+    return f"EXISTS (SELECT 1 FROM incoming_types WHERE id = {type_id_expr} AND {EMAIL_TYPE_CONDITION})"
+
+def _month(date_expr):
+    return f"COALESCE(substr({date_expr}, 1, 7), '')"
+
+def _counter_statements(column, row, delta, condition="1"):
+    """أوامر تعديل عداد الموظف والتجميع الشهري لسجل واحد"""
+    sign = '+' if delta > 0 else '-'
+    statements = [
+        f"""UPDATE employees SET {column} = COALESCE({column}, 0) {sign} 1
+            WHERE id = {row}.employee_id AND {condition};""",
+    ]
+    if delta > 0:
+        statements.append(
+            f"""INSERT INTO employee_monthly_stats (employee_id, month, {column})
+            SELECT {row}.employee_id, {_month(row + '.registration_date')}, 1
+            WHERE {row}.employee_id IS NOT NULL AND {condition}
+            ON CONFLICT (employee_id, month) DO UPDATE SET {column} = {column} + 1;"""
+        )
+    else:
+        statements.append(
+            f"""UPDATE employee_monthly_stats SET {column} = {column} - 1
+            WHERE employee_id = {row}.employee_id
+            AND month = {_month(row + '.registration_date')} AND {condition};"""
+        )
+    return "\n".join(statements)
+
+# إعادة حساب جميع العدادات من الصفر (للتهيئة الأولى وللإصلاح)
+RECOMPUTE_EMPLOYEE_COUNTERS = [
+    "DELETE FROM employee_monthly_stats",
+    """UPDATE employees SET
+        fax_count = (SELECT COUNT(*) FROM outgoing_records WHERE employee_id = employees.id),
+        email_count = (SELECT COUNT(*) FROM incoming_records
+                       WHERE employee_id = employees.id
+                       AND incoming_type_id IN (SELECT id FROM incoming_types WHERE """ + EMAIL_TYPE_CONDITION + """))""",
+    """INSERT INTO employee_monthly_stats (employee_id, month, fax_count)
+    SELECT employee_id, """ + _month('registration_date') + """, COUNT(*)
+    FROM outgoing_records WHERE employee_id IS NOT NULL
+    GROUP BY 1, 2""",
+    """INSERT INTO employee_monthly_stats (employee_id, month, email_count)
+    SELECT employee_id, """ + _month('registration_date') + """, COUNT(*)
+    FROM incoming_records
+    WHERE employee_id IS NOT NULL
+    AND incoming_type_id IN (SELECT id FROM incoming_types WHERE """ + EMAIL_TYPE_CONDITION + """)
+    GROUP BY 1, 2
+    ON CONFLICT (employee_id, month) DO UPDATE SET email_count = excluded.email_count""",
+]
+
+EMPLOYEE_COUNTERS = [
+    """CREATE TABLE IF NOT EXISTS employee_monthly_stats (
+        employee_id INTEGER NOT NULL,
+        month TEXT NOT NULL, -- YYYY-MM
+        fax_count INTEGER NOT NULL DEFAULT 0,
+        email_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (employee_id, month)
+    ) WITHOUT ROWID""",
+
+    # الفاكسات = سجلات الصادر
+    f"""CREATE TRIGGER IF NOT EXISTS trg_outgoing_counters_insert
+    AFTER INSERT ON outgoing_records
+    BEGIN
+        {_counter_statements('fax_count', 'NEW', +1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_outgoing_counters_delete
+    AFTER DELETE ON outgoing_records
+    BEGIN
+        {_counter_statements('fax_count', 'OLD', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_outgoing_counters_update
+    AFTER UPDATE OF employee_id, registration_date ON outgoing_records
+    BEGIN
+        {_counter_statements('fax_count', 'OLD', -1)}
+        {_counter_statements('fax_count', 'NEW', +1)}
+    END""",
+
+    # الإيميلات = سجلات الوارد من نوع إيميل
+    f"""CREATE TRIGGER IF NOT EXISTS trg_incoming_counters_insert
+    AFTER INSERT ON incoming_records
+    BEGIN
+        {_counter_statements('email_count', 'NEW', +1, _is_email_type('NEW.incoming_type_id'))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_incoming_counters_delete
+    AFTER DELETE ON incoming_records
+    BEGIN
+        {_counter_statements('email_count', 'OLD', -1, _is_email_type('OLD.incoming_type_id'))}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_incoming_counters_update
+    AFTER UPDATE OF employee_id, incoming_type_id, registration_date ON incoming_records
+    BEGIN
+        {_counter_statements('email_count', 'OLD', -1, _is_email_type('OLD.incoming_type_id'))}
+        {_counter_statements('email_count', 'NEW', +1, _is_email_type('NEW.incoming_type_id'))}
+    END""",
+
+    # إعادة حساب الإيميلات إذا تغير تصنيف نوع وارد (إعادة تسمية إلى إيميل أو منه)
+    f"""CREATE TRIGGER IF NOT EXISTS trg_incoming_types_email_rename
+    AFTER UPDATE OF name ON incoming_types
+    WHEN (OLD.name LIKE '%إيميل%' OR OLD.name LIKE '%email%')
+      <> (NEW.name LIKE '%إيميل%' OR NEW.name LIKE '%email%')
+    BEGIN
+        {";".join(RECOMPUTE_EMPLOYEE_COUNTERS)};
+    END""",
+] + RECOMPUTE_EMPLOYEE_COUNTERS
+
+# ============================================================
+# مخزن المرفقات حسب المحتوى: كل ملف يُخزن مرة واحدة باسم بصمته SHA-256
+# وعدد المرفقات المرتبطة بكل ملف (ref_count) يُحدث عبر مشغلات على جدول المرفقات
+# ============================================================
+
+def _blob_reference_statements(row, delta):
+    sign = '+' if delta > 0 else '-'
+    return f"UPDATE attachment_blobs SET ref_count = ref_count {sign} 1 WHERE hash = {row}.blob_hash;"
+
+ATTACHMENT_BLOB_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS attachment_blobs (
+        hash TEXT PRIMARY KEY, -- SHA-256
+        file_path TEXT NOT NULL,
+        file_size INTEGER NOT NULL,
+        ref_count INTEGER NOT NULL DEFAULT 0,
+        created_date DATETIME DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_attachments_blob ON attachments (blob_hash)",
+    # جمع الملفات غير المرتبطة يقرأ هذا الفهرس الجزئي فقط
+    "CREATE INDEX IF NOT EXISTS idx_attachment_blobs_unreferenced ON attachment_blobs (hash) WHERE ref_count <= 0",
+
+    f"""CREATE TRIGGER IF NOT EXISTS trg_attachments_blob_insert
+    AFTER INSERT ON attachments
+    WHEN NEW.blob_hash IS NOT NULL
+    BEGIN
+        {_blob_reference_statements('NEW', +1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_attachments_blob_delete
+    AFTER DELETE ON attachments
+    WHEN OLD.blob_hash IS NOT NULL
+    BEGIN
+        {_blob_reference_statements('OLD', -1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_attachments_blob_update
+    AFTER UPDATE OF blob_hash ON attachments
+    BEGIN
+        {_blob_reference_statements('OLD', -1)}
+        {_blob_reference_statements('NEW', +1)}
+    END""",
+]
+
+def _add_attachment_blobs(cursor):
+    """ربط المرفقات بمخزن الملفات حسب المحتوى
+
+    المرفقات القديمة تبقى بمساراتها (blob_hash فارغ) وتُحذف ملفاتها مباشرة كما كانت
+    """
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(attachments)")}
+    if 'blob_hash' not in existing:
+        cursor.execute("ALTER TABLE attachments ADD COLUMN blob_hash TEXT REFERENCES attachment_blobs (hash)")
+
+    for statement in ATTACHMENT_BLOB_STATEMENTS:
+        cursor.execute(statement)
+
+def _add_attachment_metadata(cursor):
+    """أعمدة بيانات ملف المرفق المسجلة عند الحفظ ونتيجة آخر تحقق منه
+
+    file_status: NULL (لم يُتحقق بعد)، 'ok'، 'missing' (الملف غير موجود)، 'changed' (تغير محتواه)
+    """
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(attachments)")}
+    columns_to_add = [
+        ('file_mtime', 'REAL'),
+        ('file_status', 'TEXT'),
+        ('verified_date', 'DATETIME')
+    ]
+
+    for column_name, column_type in columns_to_add:
+        if column_name not in existing:
+            cursor.execute(f"ALTER TABLE attachments ADD COLUMN {column_name} {column_type}")
+
+# قائمة الترحيلات مرتبة حسب رقم الإصدار
+# كل خطوة إما دالة تستقبل cursor أو قائمة أوامر SQL
+MIGRATIONS = [
+    (1, "إضافة أعمدة الاتصال والعدادات إلى جدول الموظفين", _add_employee_columns),
+    (2, "فهارس سجلات الوارد والصادر والمرفقات", RECORD_INDEXES),
+    (3, "عدادات الموظفين والتجميع الشهري عبر المشغلات", EMPLOYEE_COUNTERS),
+    (4, "فهرس البحث النصي الكامل للسجلات", search_index_statements()),
+    (5, "مخزن المرفقات حسب المحتوى مع عدّ المراجع", _add_attachment_blobs),
+    (6, "بيانات ملفات المرفقات وحالة التحقق منها", _add_attachment_metadata),
+    (7, "عدادات أرقام السجلات حسب الاتجاه والسنة", sequence_statements()),
+    (8, "مواضع تقدم الاستيراد المجمع", import_checkpoint_statements()),
+]
+
+def get_schema_version(conn):
+    """الحصول على إصدار المخطط الحالي"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_date DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def apply_migrations(conn, migrations=None):
+    """تطبيق الترحيلات المعلقة بالترتيب، كل ترحيل في معاملة مستقلة
+
+    كل ترحيل يُطبق في معاملة BEGIN IMMEDIATE ويُعاد فيها قراءة إصدار المخطط،
+    فإذا فتحت عدة عمليات (عدة أجهزة أو عمال سطر الأوامر) قاعدة بيانات غير مرحّلة
+    معاً تنتظر كل منها قفل الكتابة، ويتخطى من يأتي بعد الأول الترحيل المطبق
+    """
+    if migrations is None:
+        migrations = MIGRATIONS
+
+    if conn.in_transaction:
+        raise sqlite3.OperationalError("لا يمكن تطبيق الترحيلات أثناء معاملة مفتوحة")
+
+    current_version = get_schema_version(conn)
+    applied = []
+
+    for version, description, step in sorted(migrations, key=lambda m: m[0]):
+        if version <= current_version:
+            continue
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            current_version = cursor.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+            if version <= current_version:
+                # طبقته عملية أخرى أثناء انتظار القفل
+                conn.rollback()
+                continue
+            if callable(step):
+                step(cursor)
+            else:
+                for statement in step:
+                    cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+            applied.append(version)
+            print(f"تم تطبيق الترحيل {version}: {description}")
+        except Exception:
+            conn.rollback()
+            print(f"فشل تطبيق الترحيل {version}: {description}")
+            raise
+
+    return applied
+
+# ============================================================
+# التحقق من خطط تنفيذ الاستعلامات الأكثر استخداماً
+# (الاسم، الاستعلام، المعاملات، الجداول التي يجب ألا تُمسح بالكامل)
+# ============================================================
+
+HOT_QUERIES = [
+    (
+        "تقرير الوارد حسب التاريخ",
+        """SELECT ir.record_number, isrc.name, it.name, e.name, s.name, ir.registration_date
+        FROM incoming_records ir
+        LEFT JOIN incoming_sources isrc ON ir.incoming_source_id = isrc.id
+        LEFT JOIN incoming_types it ON ir.incoming_type_id = it.id
+        LEFT JOIN employees e ON ir.employee_id = e.id
+        LEFT JOIN specializations s ON ir.specialization_id = s.id
+        WHERE ir.registration_date BETWEEN ? AND ?
+        ORDER BY ir.registration_date DESC""",
+        ('2024-01-01', '2024-01-31'),
+        ('ir',)
+    ),
+    (
+        "تقرير الصادر حسب التاريخ",
+        """SELECT orc.record_number, od.name, e.name, s.name, orc.registration_date
+        FROM outgoing_records orc
+        LEFT JOIN outgoing_destinations od ON orc.outgoing_destination_id = od.id
+        LEFT JOIN employees e ON orc.employee_id = e.id
+        LEFT JOIN specializations s ON orc.specialization_id = s.id
+        WHERE orc.registration_date BETWEEN ? AND ?
+        ORDER BY orc.registration_date DESC""",
+        ('2024-01-01', '2024-01-31'),
+        ('orc',)
+    ),
+    (
+        "مرفقات السجل",
+        """SELECT id, file_name, file_path, description, blob_hash, file_size, file_status
+        FROM attachments WHERE record_id = ? AND record_type = 'incoming'""",
+        (1,),
+        ('attachments',)
+    ),
+    (
+        "التحقق من ارتباط جهة الوارد",
+        "SELECT COUNT(*) FROM incoming_records WHERE incoming_source_id = ?",
+        (1,),
+        ('incoming_records',)
+    ),
+    (
+        "التحقق من ارتباط جهة الصادر",
+        "SELECT COUNT(*) FROM outgoing_records WHERE outgoing_destination_id = ?",
+        (1,),
+        ('outgoing_records',)
+    ),
+    (
+        "التحقق من ارتباط نوع الوارد",
+        "SELECT COUNT(*) FROM incoming_records WHERE incoming_type_id = ?",
+        (1,),
+        ('incoming_records',)
+    ),
+    (
+        "البحث النصي في الوارد",
+        f"""SELECT ir.id, ir.record_number, ir.title
+        FROM {search_join('incoming', 'ir')}
+        WHERE {match_condition('incoming')}
+        ORDER BY {rank_expression('incoming')}""",
+        (build_match_query('كتاب'),),
+        ('ir',)
+    ),
+    (
+        "الملفات غير المرتبطة في مخزن المرفقات",
+        "SELECT hash, file_path, file_size FROM attachment_blobs WHERE ref_count <= 0",
+        (),
+        ('attachment_blobs',)
+    ),
+    (
+        "إحصائيات لوحة التحكم",
+        STATISTICS_QUERY,
+        {'month_start': '2024-01-01', 'next_month': '2024-02-01'},
+        ('incoming_records', 'outgoing_records')
+    ),
+    (
+        "تقرير الوارد المجمع حسب الجهة والشهر",
+        *build_report_query(ReportSpec('incoming', 'source', start_date='2024-01-01', end_date='2024-12-31'),
+                            ['source', 'month']),
+        ('r',)
+    ),
+]
+
+def explain_query_plan(conn, query, params=()):
+    """الحصول على تفاصيل خطة التنفيذ لاستعلام"""
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return [row[-1] for row in rows]
+
+def is_full_scan(detail, tables):
+    """هل سطر الخطة مسح كامل لأحد الجداول المراقبة (بدون فهرس)؟"""
+    parts = detail.split()
+    if len(parts) < 2 or parts[0] != 'SCAN':
+        return False
+    return parts[1] in tables and 'USING' not in parts
+
+def check_query_plans(conn, hot_queries=None):
+    """التحقق من أن الاستعلامات الأكثر استخداماً لا تلجأ إلى المسح الكامل"""
+    if hot_queries is None:
+        hot_queries = HOT_QUERIES
+
+    failures = []
+    for name, query, params, tables in hot_queries:
+        for detail in explain_query_plan(conn, query, params):
+            if is_full_scan(detail, tables):
+                failures.append((name, detail))
+    return failures
+
+def main(db_path="data/database.db"):
+    """تطبيق الترحيلات ثم فحص خطط التنفيذ - يعيد رمز خروج غير صفري عند الفشل"""
+    conn = sqlite3.connect(db_path)
+    try:
+        apply_migrations(conn)
+        failures = check_query_plans(conn)
+    finally:
+        conn.close()
+
+    if failures:
+        for name, detail in failures:
+            print(f"مسح كامل في الاستعلام '{name}': {detail}")
+        return 1
+
+    print("جميع الاستعلامات الأساسية تستخدم الفهارس")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:]))
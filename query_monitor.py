@@ -0,0 +1,211 @@
+import json
+import os
+import sys
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import List, Optional
+
+# ============================================================
+# مراقبة استعلامات قاعدة البيانات: زمن كل استعلام وزمن انتظار الاتصال
+# وعدد الصفوف، والدالة في الواجهة التي طلبته (أقرب دالة من مجلد gui)
+# والإجراء الذي بدأه (أبعد دالة من gui، مثل MainWindow.open_incoming_form)،
+# فيظهر عدد الاستعلامات لكل إجراء. الاستعلامات البطيئة تُحفظ في سجل دوار
+# مع خطة تنفيذها (EXPLAIN QUERY PLAN)، والأخطاء التي يبتلعها execute_query
+# تُسجل أيضاً. تُفعّل بربطها بـ DatabaseManager.set_monitor
+# ============================================================
+
+GUI_DIRECTORY = os.sep + 'gui' + os.sep
+
+# الإجراء المنسوب إليه استعلام لم يُطلب من الواجهة (خيوط الخلفية، سطر الأوامر)
+BACKGROUND_ACTION = 'خلفية'
+
+@dataclass
+class QueryEvent:
+    """استعلام واحد منفذ"""
+    sql: str
+    started: str  # وقت التنفيذ
+    duration_ms: float
+    wait_ms: float  # انتظار اتصال متاح في المجمع
+    rows: int
+    caller: str
+    action: str
+    thread: str
+    error: Optional[str] = None
+    plan: List[str] = field(default_factory=list)
+
+def normalize_sql(sql):
+    """نص الاستعلام في سطر واحد لتجميع الاستعلامات المتطابقة"""
+    return " ".join(str(sql).split())
+
+def gui_frames(frame):
+    """دوال الواجهة في مكدس الاستدعاء من الأقرب إلى الأبعد: (الصنف.الدالة)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        if GUI_DIRECTORY in code.co_filename:
+            owner = frame.f_locals.get('self')
+            names.append(f"{type(owner).__name__}.{code.co_name}" if owner is not None else code.co_name)
+        frame = frame.f_back
+    return names
+
+class QueryMonitor:
+    """سجل الاستعلامات المنفذة وملخصاتها، مشترك بين الخيوط
+    
+    slow_ms: الاستعلام الأبطأ من هذا الحد يُحفظ في سجل الاستعلامات البطيئة مع خطة تنفيذه
+    """
+    
+    def __init__(self, slow_ms=100, slow_log_size=200, errors_size=100):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.slow_log = deque(maxlen=slow_log_size)
+        self.errors = deque(maxlen=errors_size)
+        self.reset()
+    
+    def reset(self):
+        with self._lock:
+            self.started = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self.actions = {}  # الإجراء -> ملخص
+            self.statements = {}  # نص الاستعلام -> ملخص
+            self.plans = {}  # نص الاستعلام -> خطة التنفيذ (تُحسب مرة واحدة)
+            self.slow_log.clear()
+            self.errors.clear()
+    
+    def capture_context(self):
+        """سياق الواجهة الحالي (الإجراء، الدالة) لنسبة استعلامات الخيوط العاملة إليه"""
+        context = getattr(self._local, 'context', None)
+        if context:
+            return context
+        names = gui_frames(sys._getframe(1))
+        return (names[-1], names[0]) if names else None
+    
+    @contextmanager
+    def context(self, context):
+        """تنفيذ كتلة (في خيط عامل) باسم إجراء الواجهة الذي أرسلها"""
+        previous = getattr(self._local, 'context', None)
+        self._local.context = context or previous
+        try:
+            yield
+        finally:
+            self._local.context = previous
+    
+    def caller(self):
+        """(الإجراء، الدالة) للاستعلام الجاري"""
+        names = gui_frames(sys._getframe(2))
+        context = getattr(self._local, 'context', None)
+        if context:
+            return context[0], names[0] if names else context[1]
+        if names:
+            return names[-1], names[0]
+        return BACKGROUND_ACTION, BACKGROUND_ACTION
+    
+    def record(self, sql, elapsed, wait=0.0, rows=0, conn=None, params=None, error=None):
+        """تسجيل استعلام انتهى: elapsed زمن تنفيذه و wait زمن انتظار الاتصال بالثواني
+        
+        conn الاتصال الذي نُفذ عليه (ما زال محجوزاً) لحساب خطة الاستعلام البطيء
+        """
+        duration_ms = elapsed * 1000
+        action, caller = self.caller()
+        text = normalize_sql(sql)
+        event = QueryEvent(
+            sql=text,
+            started=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            duration_ms=round(duration_ms, 3),
+            wait_ms=round(wait * 1000, 3),
+            rows=rows,
+            caller=caller,
+            action=action,
+            thread=threading.current_thread().name,
+            error=str(error) if error is not None else None,
+        )
+        
+        slow = duration_ms >= self.slow_ms and error is None
+        if slow:
+            event.plan = self.query_plan(conn, text, sql, params)
+        
+        with self._lock:
+            summary = self.actions.setdefault(action, {'queries': 0, 'total_ms': 0.0, 'wait_ms': 0.0,
+                                                       'rows': 0, 'errors': 0, 'slow': 0, 'callers': {}})
+            summary['queries'] += 1
+            summary['total_ms'] += duration_ms
+            summary['wait_ms'] += event.wait_ms
+            summary['rows'] += rows
+            summary['errors'] += error is not None
+            summary['slow'] += slow
+            summary['callers'][caller] = summary['callers'].get(caller, 0) + 1
+            
+            statement = self.statements.setdefault(text, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0})
+            statement['count'] += 1
+            statement['total_ms'] += duration_ms
+            statement['max_ms'] = max(statement['max_ms'], duration_ms)
+            statement['rows'] += rows
+            
+            if slow:
+                self.slow_log.append(event)
+            if error is not None:
+                self.errors.append(event)
+        return event
+    
+    def query_plan(self, conn, text, sql, params):
+        """خطة تنفيذ استعلام القراءة (مرة واحدة لكل نص استعلام)
+        
+        الخطة تُحسب خارج القفل حتى لا تنتظرها الخيوط الأخرى، وإن سبق خيط آخر إلى
+        حسابها تُستخدم خطته
+        """
+        with self._lock:
+            if text in self.plans:
+                return self.plans[text]
+        plan = []
+        if conn is not None and text.split(' ', 1)[0].upper() in ('SELECT', 'WITH'):
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+                plan = [row[-1] for row in rows]
+            except Exception as e:
+                plan = [f"تعذر الحصول على الخطة: {e}"]
+        with self._lock:
+            return self.plans.setdefault(text, plan)
+    
+    def action_summary(self):
+        """ملخص الإجراءات مرتباً بعدد الاستعلامات: قائمة (الإجراء، الملخص)"""
+        with self._lock:
+            items = [(action, dict(summary, callers=dict(summary['callers'])))
+                     for action, summary in self.actions.items()]
+        return sorted(items, key=lambda item: item[1]['queries'], reverse=True)
+    
+    def statement_summary(self):
+        """الاستعلامات مرتبة بمجموع زمنها: قائمة (نص الاستعلام، الملخص)"""
+        with self._lock:
+            items = [(text, dict(summary)) for text, summary in self.statements.items()]
+        return sorted(items, key=lambda item: item[1]['total_ms'], reverse=True)
+    
+    def slow_queries(self):
+        with self._lock:
+            return list(self.slow_log)
+    
+    def recent_errors(self):
+        with self._lock:
+            return list(self.errors)
+    
+    def to_dict(self, pool_stats=None):
+        return {
+            'since': self.started,
+            'generated': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'slow_ms': self.slow_ms,
+            'pool': pool_stats,
+            'actions': [dict(summary, action=action) for action, summary in self.action_summary()],
+            'statements': [dict(summary, sql=text) for text, summary in self.statement_summary()],
+            'slow_queries': [asdict(event) for event in self.slow_queries()],
+            'errors': [asdict(event) for event in self.recent_errors()],
+        }
+    
+    def export_json(self, file_path, pool_stats=None):
+        """حفظ الملخصات والاستعلامات البطيئة والأخطاء في ملف JSON"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(pool_stats), f, ensure_ascii=False, indent=2)
+        return file_path
+
+# المراقب المشترك في العملية
+query_monitor = QueryMonitor()
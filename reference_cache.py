@@ -0,0 +1,80 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+# ============================================================
+# ذاكرة مؤقتة مشتركة للجداول المرجعية (الجهات، الأنواع، الموظفون، الاختصاصات)
+# تُقرأ كل جدول مرة واحدة ثم تُخدم النماذج ونافذة البحث من الذاكرة.
+# كل جدول له رقم إصدار يرفعه أي تعديل عليه (إدارة الكيانات المرجعية،
+# استعادة قاعدة البيانات)، فيُعاد تحميله عند الطلب التالي فقط
+# ============================================================
+
+# استعلام كل جدول مرجعي: (id، name، is_active) مرتبة بالاسم
+REFERENCE_TABLES = {
+    'incoming_sources': "SELECT id, name, 1 FROM incoming_sources ORDER BY name",
+    'outgoing_destinations': "SELECT id, name, 1 FROM outgoing_destinations ORDER BY name",
+    'incoming_types': "SELECT id, name, 1 FROM incoming_types ORDER BY name",
+    'employees': "SELECT id, name, is_active FROM employees ORDER BY name",
+    'specializations': "SELECT id, name, 1 FROM specializations ORDER BY name",
+}
+
+@dataclass
+class ReferenceData:
+    """محتوى جدول مرجعي واحد"""
+    names: List[str] = field(default_factory=list)  # الأسماء النشطة بالترتيب للقوائم المنسدلة
+    ids: Dict[str, int] = field(default_factory=dict)  # الاسم -> id (للنشطة فقط)
+    by_id: Dict[int, str] = field(default_factory=dict)  # id -> الاسم (لجميع الصفوف)
+    
+    @classmethod
+    def from_rows(cls, rows):
+        data = cls()
+        for row_id, name, is_active in rows:
+            data.by_id[row_id] = name
+            if is_active:
+                data.names.append(name)
+                data.ids[name] = row_id
+        return data
+    
+    def name_of(self, row_id):
+        return self.by_id.get(row_id)
+    
+    def ids_named(self, name):
+        """جميع المعرفات التي تحمل هذا الاسم (أسماء الموظفين غير فريدة)"""
+        return [row_id for row_id, row_name in self.by_id.items() if row_name == name]
+
+class ReferenceCache:
+    """ذاكرة مؤقتة للجداول المرجعية مشتركة بين جميع النوافذ"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.versions = dict.fromkeys(REFERENCE_TABLES, 0)
+        self._tables = {}  # (مسار قاعدة البيانات، الجدول) -> (الإصدار، ReferenceData)
+    
+    def get(self, db_manager, table):
+        """محتوى الجدول من الذاكرة، أو من قاعدة البيانات إن تغير إصداره منذ آخر قراءة"""
+        key = (db_manager.db_path, table)
+        with self._lock:
+            version = self.versions[table]
+            cached = self._tables.get(key)
+            if cached and cached[0] == version:
+                return cached[1]
+        
+        rows = db_manager.execute_query(REFERENCE_TABLES[table])
+        if rows is None:
+            # خطأ في القراءة: لا يُحفظ في الذاكرة حتى يُعاد المحاولة في الطلب التالي
+            return ReferenceData()
+        data = ReferenceData.from_rows(rows)
+        
+        with self._lock:
+            # تعديل أثناء القراءة يرفع الإصدار فتُهمل هذه النتيجة في الطلب التالي
+            self._tables[key] = (version, data)
+        return data
+    
+    def invalidate(self, table=None):
+        """رفع إصدار جدول (أو جميع الجداول) بعد تعديله"""
+        with self._lock:
+            for name in ([table] if table else list(self.versions)):
+                self.versions[name] += 1
+
+# الذاكرة المشتركة في العملية
+reference_cache = ReferenceCache()
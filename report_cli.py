@@ -0,0 +1,228 @@
+import argparse
+import calendar
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from database import DatabaseManager
+from migrations import apply_migrations
+from report_engine import DIMENSIONS, MEASURES, ReportSpec, aggregate_report
+from utils.export_manager import ExportManager
+
+# ============================================================
+# توليد التقارير والتصدير من سطر الأوامر دون واجهة (لا يستورد tkinter)
+# لجدولة تقارير نهاية الشهر ليلاً. قاعدة البيانات تُرحّل مرة واحدة في العملية
+# الرئيسية، ثم يُولد كل تقرير في عملية عاملة مستقلة تفتحها للقراءة فقط
+# باتصالاتها الخاصة، فتُنفذ عدة تقارير على التوازي
+#
+# أمثلة:
+#   python report_cli.py incoming outgoing --month 2024-01 --format pdf
+#   python report_cli.py incoming --from 2024-01-01 --to 2024-12-31 --group-by source --pivot-by month
+#   python report_cli.py --batch month_end.json --workers 4
+# ============================================================
+
+REPORTS = {
+    'incoming': 'تقرير الوارد',
+    'outgoing': 'تقرير الصادر',
+    'employees': 'تقرير الموظفين',
+}
+
+FORMATS = ('xlsx', 'pdf', 'docx', 'csv')
+
+@dataclass
+class ReportJob:
+    """تقرير واحد في الدفعة وملف مخرجاته"""
+    report: str
+    output_format: str = 'xlsx'
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    group_by: Optional[str] = None
+    pivot_by: Optional[str] = None
+    measures: List[str] = field(default_factory=lambda: ['count'])
+    output: Optional[str] = None
+    
+    def output_path(self, output_dir):
+        if self.output:
+            return self.output
+        parts = [self.report]
+        if self.group_by:
+            parts.append(self.group_by)
+        if self.pivot_by:
+            parts.append(self.pivot_by)
+        parts += [self.start_date or 'all', self.end_date or 'all']
+        return os.path.join(output_dir, f"{'_'.join(parts)}.{self.output_format}")
+
+def month_dates(month):
+    """أول وآخر يوم في شهر بصيغة YYYY-MM"""
+    year, number = (int(part) for part in month.split('-'))
+    return f"{year:04d}-{number:02d}-01", f"{year:04d}-{number:02d}-{calendar.monthrange(year, number)[1]:02d}"
+
+def validate_job(job):
+    """رسالة الخطأ في مواصفات التقرير، أو None"""
+    if job.report not in REPORTS:
+        return f"تقرير غير معروف: {job.report} (المتاح: {', '.join(REPORTS)})"
+    if job.output_format not in FORMATS:
+        return f"صيغة غير معروفة: {job.output_format} (المتاح: {', '.join(FORMATS)})"
+    if job.report == 'employees' and (job.group_by or job.pivot_by):
+        return "تقرير الموظفين لا يدعم التجميع"
+    if job.pivot_by and not job.group_by:
+        return "التقسيم (--pivot-by) يتطلب التجميع (--group-by)"
+    if job.pivot_by and job.pivot_by == job.group_by:
+        return "بعد التقسيم يجب أن يختلف عن بعد التجميع"
+    dimensions = DIMENSIONS.get(job.report, {})
+    for key in (job.group_by, job.pivot_by):
+        if key and key not in dimensions:
+            return f"بعد تجميع غير معروف لتقرير {job.report}: {key} (المتاح: {', '.join(dimensions)})"
+    unknown = [key for key in job.measures if key not in MEASURES]
+    if unknown:
+        return f"مقاييس غير معروفة: {', '.join(unknown)} (المتاح: {', '.join(MEASURES)})"
+    return None
+
+def report_data(db_manager, export_manager, job):
+    """صفوف التقرير وأعمدته: مجمعة داخل قاعدة البيانات أو مفصلة كما في نوافذ التقارير"""
+    if job.group_by:
+        spec = ReportSpec(job.report, job.group_by, job.pivot_by, job.measures, job.start_date, job.end_date)
+        return aggregate_report(db_manager, spec)
+    if job.report == 'incoming':
+        return export_manager.generate_incoming_report(job.start_date, job.end_date)
+    if job.report == 'outgoing':
+        return export_manager.generate_outgoing_report(job.start_date, job.end_date)
+    data, columns, _, _ = export_manager.generate_employee_report(job.start_date, job.end_date)
+    return data, columns
+
+def write_report(export_manager, data, columns, file_path, output_format, title):
+    if output_format == 'pdf':
+        return export_manager.export_to_pdf(data, columns, file_path, title)
+    if output_format == 'docx':
+        return export_manager.export_to_word(data, columns, file_path, title)
+    if output_format == 'csv':
+        return export_manager.export_to_csv(data, columns, file_path)
+    return export_manager.export_to_excel(data, columns, file_path, title)
+
+def run_job(db_path, job, output_dir):
+    """توليد تقرير واحد (يُنفذ في عملية عاملة): (المسار، نجح؟، عدد الصفوف، الزمن بالثواني)"""
+    started = time.perf_counter()
+    file_path = job.output_path(output_dir)
+    db_manager = None
+    try:
+        db_manager = DatabaseManager(db_path, pool_size=1, read_only=True)
+        export_manager = ExportManager(db_manager)
+        data, columns = report_data(db_manager, export_manager, job)
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        ok = bool(columns) and write_report(export_manager, data, columns, file_path,
+                                            job.output_format, REPORTS[job.report])
+        return file_path, ok, len(data), time.perf_counter() - started
+    except Exception as e:
+        print(f"فشل في توليد {file_path}: {e}")
+        return file_path, False, 0, time.perf_counter() - started
+    finally:
+        if db_manager is not None:
+            db_manager.close()
+
+def prepare_database(db_path):
+    """تطبيق الترحيلات المعلقة مرة واحدة قبل بدء العمليات العاملة
+    
+    إنشاء الجداول والبيانات الأولية ووضع التخزين من عمل البرنامج نفسه، فلا يُنشأ
+    هنا DatabaseManager كامل على قاعدة البيانات
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path, timeout=30.0)
+        conn.execute("PRAGMA foreign_keys = ON")
+        apply_migrations(conn)
+        return True
+    except Exception as e:
+        print(f"فشل في ترحيل قاعدة البيانات {db_path}: {e}")
+        return False
+    finally:
+        if conn is not None:
+            conn.close()
+
+def run_jobs(db_path, jobs, output_dir, workers):
+    """توليد التقارير على التوازي في عمليات عاملة، بترتيب الدفعة"""
+    if workers <= 1 or len(jobs) == 1:
+        return [run_job(db_path, job, output_dir) for job in jobs]
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        return list(executor.map(run_job, [db_path] * len(jobs), jobs, [output_dir] * len(jobs)))
+
+def load_batch(batch_path, defaults):
+    """تقارير ملف الدفعة: قائمة JSON من الكائنات بحقول ReportJob (أو month بدل التاريخين)
+    
+    كل حقل غير محدد يؤخذ من خيارات سطر الأوامر
+    """
+    with open(batch_path, encoding='utf-8') as f:
+        entries = json.load(f)
+    jobs = []
+    for entry in entries:
+        values = dict(defaults)
+        if 'month' in entry:
+            values['start_date'], values['end_date'] = month_dates(entry.pop('month'))
+        values.update(entry)
+        jobs.append(ReportJob(**values))
+    return jobs
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="توليد تقارير نظام إدارة المراسلات دون واجهة")
+    parser.add_argument('reports', nargs='*', metavar='REPORT', help=f"التقارير المطلوبة: {', '.join(REPORTS)}")
+    parser.add_argument('--db', default="data/database.db", help="مسار قاعدة البيانات")
+    parser.add_argument('--from', dest='start_date', help="بداية الفترة YYYY-MM-DD")
+    parser.add_argument('--to', dest='end_date', help="نهاية الفترة YYYY-MM-DD")
+    parser.add_argument('--month', help="شهر كامل YYYY-MM بدل --from و --to")
+    parser.add_argument('--group-by', help=f"التجميع داخل قاعدة البيانات: {', '.join(DIMENSIONS['incoming'])}, destination")
+    parser.add_argument('--pivot-by', help="بعد ثانٍ تصبح قيمه أعمدة (مثل month)")
+    parser.add_argument('--measures', default='count', help=f"مقاييس التجميع مفصولة بفواصل: {', '.join(MEASURES)}")
+    parser.add_argument('--format', dest='output_format', default='xlsx', choices=FORMATS, help="صيغة الملفات")
+    parser.add_argument('--output-dir', default="reports", help="مجلد ملفات التقارير")
+    parser.add_argument('--batch', help="ملف JSON بقائمة تقارير لكل منها خياراته")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="عدد العمليات العاملة")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    
+    if args.month:
+        args.start_date, args.end_date = month_dates(args.month)
+    defaults = {
+        'output_format': args.output_format,
+        'start_date': args.start_date,
+        'end_date': args.end_date,
+        'group_by': args.group_by,
+        'pivot_by': args.pivot_by,
+        'measures': [key.strip() for key in args.measures.split(',') if key.strip()],
+    }
+    
+    jobs = [ReportJob(report, **defaults) for report in args.reports]
+    if args.batch:
+        jobs += load_batch(args.batch, defaults)
+    if not jobs:
+        print("لم يُحدد أي تقرير (REPORT أو --batch)")
+        return 2
+    
+    errors = [(job, validate_job(job)) for job in jobs]
+    errors = [(job, error) for job, error in errors if error]
+    if errors:
+        for job, error in errors:
+            print(f"{job.report}: {error}")
+        return 2
+    if not os.path.exists(args.db):
+        print(f"قاعدة البيانات غير موجودة: {args.db}")
+        return 2
+    if not prepare_database(args.db):
+        return 2
+    
+    started = time.perf_counter()
+    results = run_jobs(args.db, jobs, args.output_dir, args.workers)
+    failed = 0
+    for job, (file_path, ok, rows, seconds) in zip(jobs, results):
+        print(f"{'✓' if ok else '✗'} {file_path}  ({rows} صف، {seconds:.1f} ث)")
+        failed += not ok
+    print(f"{len(jobs) - failed}/{len(jobs)} تقرير في {time.perf_counter() - started:.1f} ث")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
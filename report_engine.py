@@ -0,0 +1,183 @@
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from search_index import RECORD_TABLES
+
+# ============================================================
+# محرك تجميع التقارير: التجميع يتم داخل SQLite (GROUP BY) على معرفات
+# الجداول المرجعية، ثم تُربط الأسماء بالصفوف المجمعة فقط، فلا تُنقل
+# سجلات التقرير الخام إلى بايثون أو إلى الواجهة مهما كان عددها.
+# يدعم مستوى تقسيم ثانٍ (جدول محوري، مثل الجهة × الشهر) وعدة مقاييس
+# ============================================================
+
+# القيمة المعروضة لمفتاح تجميع فارغ (سجل بلا جهة أو موظف...)
+UNSPECIFIED = 'غير محدد'
+
+@dataclass(frozen=True)
+class Dimension:
+    """بُعد تجميع: التعبير المجمع عليه في جدول السجلات r، والجدول المرجعي لاسمه"""
+    label: str
+    expression: str
+    name_table: Optional[str] = None
+
+@dataclass(frozen=True)
+class Measure:
+    """مقياس محسوب لكل مجموعة، وقيمته لخلية فارغة في الجدول المحوري"""
+    label: str
+    expression: str
+    empty: object = 0
+    join: Optional[str] = None
+
+# أبعاد التجميع لكل نوع سجلات
+DIMENSIONS = {
+    'incoming': {
+        'source': Dimension('جهة الوارد', 'r.incoming_source_id', 'incoming_sources'),
+        'type': Dimension('نوع الوارد', 'r.incoming_type_id', 'incoming_types'),
+        'employee': Dimension('الموظف', 'r.employee_id', 'employees'),
+        'specialization': Dimension('الاختصاص', 'r.specialization_id', 'specializations'),
+        'month': Dimension('الشهر', 'substr(r.registration_date, 1, 7)'),
+        'year': Dimension('السنة', 'substr(r.registration_date, 1, 4)'),
+    },
+    'outgoing': {
+        'destination': Dimension('جهة الصادر', 'r.outgoing_destination_id', 'outgoing_destinations'),
+        'employee': Dimension('الموظف', 'r.employee_id', 'employees'),
+        'specialization': Dimension('الاختصاص', 'r.specialization_id', 'specializations'),
+        'month': Dimension('الشهر', 'substr(r.registration_date, 1, 7)'),
+        'year': Dimension('السنة', 'substr(r.registration_date, 1, 4)'),
+    },
+}
+
+# المقاييس المتاحة، {record_type} يُستبدل بنوع السجلات
+MEASURES = {
+    'count': Measure('عدد السجلات', 'COUNT(*)'),
+    'attachments': Measure(
+        'عدد المرفقات', 'COALESCE(SUM(ac.attachment_count), 0)',
+        join="""LEFT JOIN (SELECT record_id, COUNT(*) AS attachment_count FROM attachments
+            WHERE record_type = '{record_type}' GROUP BY record_id) ac ON ac.record_id = r.id"""
+    ),
+    'employees': Measure('عدد الموظفين', 'COUNT(DISTINCT r.employee_id)'),
+    'first_date': Measure('أول تاريخ', 'MIN(r.registration_date)', ''),
+    'last_date': Measure('آخر تاريخ', 'MAX(r.registration_date)', ''),
+}
+
+@dataclass
+class ReportSpec:
+    """مواصفات تقرير مجمع
+    
+    group_by: مفتاح البعد في DIMENSIONS (صفوف التقرير)
+    pivot_by: بعد اختياري ثانٍ تصبح قيمه أعمدة
+    measures: مفاتيح المقاييس في MEASURES
+    """
+    record_type: str
+    group_by: str
+    pivot_by: Optional[str] = None
+    measures: List[str] = field(default_factory=lambda: ['count'])
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+
+def dimension_label(record_type, key):
+    return DIMENSIONS[record_type][key].label
+
+def find_dimension(record_type, label):
+    """مفتاح البعد من اسمه المعروض، أو None"""
+    for key, dimension in DIMENSIONS[record_type].items():
+        if dimension.label == label:
+            return key
+    return None
+
+def build_report_query(spec, dimension_keys):
+    """استعلام التجميع حسب أبعاد محددة: (الاستعلام، المعاملات)
+    
+    الصفوف: مفتاح كل بعد (المعرف أو الفترة)، ثم اسمه، ثم قيمة كل مقياس
+    """
+    table = RECORD_TABLES[spec.record_type]
+    dimensions = [DIMENSIONS[spec.record_type][key] for key in dimension_keys]
+    measures = [MEASURES[key] for key in spec.measures]
+    
+    keys = [f"{dimension.expression} AS k{i}" for i, dimension in enumerate(dimensions)]
+    values = [f"{measure.expression} AS m{i}" for i, measure in enumerate(measures)]
+    joins = [measure.join.format(record_type=spec.record_type) for measure in measures if measure.join]
+    
+    conditions, params = [], []
+    if spec.start_date:
+        conditions.append("r.registration_date >= ?")
+        params.append(spec.start_date)
+    if spec.end_date:
+        conditions.append("r.registration_date <= ?")
+        params.append(spec.end_date)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    group = ", ".join(f"k{i}" for i in range(len(dimensions)))
+    
+    # أسماء الكيانات تُربط بالصفوف المجمعة فقط بعد التجميع
+    names, name_joins = [], []
+    for i, dimension in enumerate(dimensions):
+        if dimension.name_table:
+            names.append(f"COALESCE(t{i}.name, '{UNSPECIFIED}')")
+            name_joins.append(f"LEFT JOIN {dimension.name_table} t{i} ON t{i}.id = g.k{i}")
+        else:
+            names.append(f"COALESCE(g.k{i}, '{UNSPECIFIED}')")
+    
+    query = f"""
+        SELECT {', '.join([f'g.k{i}' for i in range(len(dimensions))] + names
+                          + [f'g.m{i}' for i in range(len(measures))])}
+        FROM (
+            SELECT {', '.join(keys + values)}
+            FROM {table} r
+            {' '.join(joins)}
+            {where}
+            GROUP BY {group}
+        ) g
+        {' '.join(name_joins)}
+        ORDER BY {', '.join(str(len(dimensions) + i + 1) for i in range(len(dimensions)))}
+    """
+    return query, params
+
+def report_columns(spec):
+    """أعمدة التقرير المجمع بدون تقسيم: البعد ثم المقاييس"""
+    return [dimension_label(spec.record_type, spec.group_by)] + [MEASURES[key].label for key in spec.measures]
+
+def aggregate_report(db_manager, spec):
+    """تنفيذ التقرير المجمع: (الصفوف، الأعمدة)، الصفوف مجمعة فقط"""
+    query, params = build_report_query(spec, [spec.group_by])
+    totals = db_manager.execute_query(query, params)
+    if totals is None:
+        raise RuntimeError("فشل في تنفيذ استعلام التجميع")
+    if not spec.pivot_by:
+        return [row[1:] for row in totals], report_columns(spec)
+    
+    query, params = build_report_query(spec, [spec.group_by, spec.pivot_by])
+    cells = db_manager.execute_query(query, params)
+    if cells is None:
+        raise RuntimeError("فشل في تنفيذ استعلام التجميع")
+    return pivot_rows(spec, totals, cells)
+
+def pivot_rows(spec, totals, cells):
+    """تحويل صفوف (مفتاح الصف، مفتاح العمود، اسماهما، المقاييس...) إلى جدول محوري
+    
+    كل قيمة من البعد الثاني عمود لكل مقياس، وأعمدة الإجمالي في النهاية
+    من استعلام التجميع حسب البعد الأول (إجمالي صحيح لكل المقاييس)
+    """
+    measures = [MEASURES[key] for key in spec.measures]
+    pivot_names = {}
+    table = {}
+    for cell in cells:
+        pivot_names[cell[1]] = cell[3]
+        table.setdefault(cell[0], {})[cell[1]] = cell[4:]
+    pivot_keys = sorted(pivot_names, key=lambda key: (str(pivot_names[key]), str(key)))
+    
+    columns = [dimension_label(spec.record_type, spec.group_by)]
+    for key in pivot_keys:
+        if len(measures) == 1:
+            columns.append(str(pivot_names[key]))
+        else:
+            columns += [f"{pivot_names[key]} - {measure.label}" for measure in measures]
+    columns += [f"الإجمالي - {measure.label}" if len(measures) > 1 else "الإجمالي" for measure in measures]
+    
+    rows = []
+    for total in totals:
+        row = [total[1]]
+        row_cells = table.get(total[0], {})
+        for key in pivot_keys:
+            row += row_cells.get(key, [measure.empty for measure in measures])
+        rows.append(tuple(row + list(total[2:])))
+    return rows, columns
@@ -0,0 +1,176 @@
+import re
+
+# ============================================================
+# فهرس البحث النصي الكامل (FTS5) لسجلات الوارد والصادر
+# النصوص تُطبع (normalize) قبل الفهرسة وقبل البحث بنفس القواعد:
+# توحيد أشكال الألف والهمزة، والتاء المربوطة/الهاء، والياء/الألف المقصورة،
+# وحذف التشكيل والتطويل
+# ============================================================
+
+# الحروف التي تُوحد إلى شكل واحد
+ARABIC_FOLDING = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ؤ': 'و', 'ئ': 'ي',
+    'ة': 'ه',
+    'ى': 'ي',
+}
+
+# التشكيل (الفتحتان حتى همزة تحت الحرف) والألف الخنجرية والتطويل
+ARABIC_STRIPPED = [chr(code) for code in range(0x064B, 0x0656)] + ['ٰ', 'ـ']
+
+_TRANSLATION = str.maketrans({**ARABIC_FOLDING, **{char: None for char in ARABIC_STRIPPED}})
+
+# نفس تقسيم الكلمات الذي يستخدمه مقسم unicode61
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+def normalize_arabic(text):
+    """تطبيع النص العربي للبحث"""
+    if text is None:
+        return ''
+    return str(text).translate(_TRANSLATION).lower()
+
+def normalize_sql(expr):
+    """تعبير SQL يطبق نفس التطبيع داخل المشغلات دون الحاجة لدوال مسجلة"""
+    sql = f"COALESCE({expr}, '')"
+    for char in ARABIC_STRIPPED:
+        sql = f"replace({sql}, '{char}', '')"
+    for char, replacement in ARABIC_FOLDING.items():
+        sql = f"replace({sql}, '{char}', '{replacement}')"
+    return sql
+
+# أعمدة الفهرس لكل نوع سجل: (عمود الفهرس، التعبير المصدر، الوزن في bm25)
+# r هو اسم السجل في استعلام الفهرسة
+SEARCH_COLUMNS = {
+    'incoming': [
+        ('record_number', 'r.record_number', 10.0),
+        ('number', 'r.incoming_number', 10.0),
+        ('serial_number', 'r.serial_number', 10.0),
+        ('title', 'r.title', 5.0),
+        ('details', 'r.details', 1.0),
+        ('entity', '(SELECT name FROM incoming_sources WHERE id = r.incoming_source_id)', 2.0),
+        ('type', '(SELECT name FROM incoming_types WHERE id = r.incoming_type_id)', 2.0),
+        ('employee', '(SELECT name FROM employees WHERE id = r.employee_id)', 2.0),
+    ],
+    'outgoing': [
+        ('record_number', 'r.record_number', 10.0),
+        ('number', 'r.outgoing_number', 10.0),
+        ('serial_number', 'r.serial_number', 10.0),
+        ('title', 'r.title', 5.0),
+        ('details', 'r.details', 1.0),
+        ('entity', '(SELECT name FROM outgoing_destinations WHERE id = r.outgoing_destination_id)', 2.0),
+        ('employee', '(SELECT name FROM employees WHERE id = r.employee_id)', 2.0),
+    ],
+}
+
+RECORD_TABLES = {'incoming': 'incoming_records', 'outgoing': 'outgoing_records'}
+SEARCH_TABLES = {'incoming': 'incoming_fts', 'outgoing': 'outgoing_fts'}
+
+# الجداول المرجعية التي تظهر أسماؤها في الفهرس: (الجدول، نوع السجل، عمود الربط)
+REFERENCE_COLUMNS = [
+    ('incoming_sources', 'incoming', 'incoming_source_id'),
+    ('incoming_types', 'incoming', 'incoming_type_id'),
+    ('employees', 'incoming', 'employee_id'),
+    ('outgoing_destinations', 'outgoing', 'outgoing_destination_id'),
+    ('employees', 'outgoing', 'employee_id'),
+]
+
+def _index_rows(record_type, condition):
+    """أمر إدراج صفوف الفهرس للسجلات التي تحقق الشرط"""
+    columns = SEARCH_COLUMNS[record_type]
+    names = ", ".join(name for name, _, _ in columns)
+    values = ", ".join(normalize_sql(source) for _, source, _ in columns)
+    return (f"INSERT INTO {SEARCH_TABLES[record_type]} (rowid, {names}) "
+            f"SELECT r.id, {values} FROM {RECORD_TABLES[record_type]} r WHERE {condition};")
+
+def _delete_rows(record_type, condition):
+    return f"DELETE FROM {SEARCH_TABLES[record_type]} WHERE rowid IN (SELECT id FROM {RECORD_TABLES[record_type]} r WHERE {condition});"
+
+def rebuild_statements():
+    """أوامر إعادة بناء الفهرس بالكامل من جداول السجلات"""
+    statements = []
+    for record_type, fts_table in SEARCH_TABLES.items():
+        statements.append(f"DELETE FROM {fts_table}")
+        statements.append(_index_rows(record_type, "1").rstrip(';'))
+    return statements
+
+def search_index_statements():
+    """إنشاء جداول FTS5 والمشغلات التي تبقيها متزامنة مع السجلات"""
+    statements = []
+    for record_type, fts_table in SEARCH_TABLES.items():
+        records_table = RECORD_TABLES[record_type]
+        names = ", ".join(name for name, _, _ in SEARCH_COLUMNS[record_type])
+        statements.append(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5("
+            f"{names}, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        statements.append(
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_insert
+            AFTER INSERT ON {records_table}
+            BEGIN
+                {_index_rows(record_type, 'r.id = NEW.id')}
+            END"""
+        )
+        statements.append(
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_update
+            AFTER UPDATE ON {records_table}
+            BEGIN
+                DELETE FROM {fts_table} WHERE rowid = OLD.id;
+                {_index_rows(record_type, 'r.id = NEW.id')}
+            END"""
+        )
+        statements.append(
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{fts_table}_delete
+            AFTER DELETE ON {records_table}
+            BEGIN
+                DELETE FROM {fts_table} WHERE rowid = OLD.id;
+            END"""
+        )
+
+    # إعادة فهرسة السجلات المرتبطة عند تغيير اسم جهة أو نوع أو موظف
+    for reference_table, record_type, foreign_key in REFERENCE_COLUMNS:
+        condition = f"r.{foreign_key} = NEW.id"
+        statements.append(
+            f"""CREATE TRIGGER IF NOT EXISTS trg_{SEARCH_TABLES[record_type]}_{reference_table}_rename
+            AFTER UPDATE OF name ON {reference_table}
+            WHEN OLD.name IS NOT NEW.name
+            BEGIN
+                {_delete_rows(record_type, condition)}
+                {_index_rows(record_type, condition)}
+            END"""
+        )
+
+    return statements + rebuild_statements()
+
+def build_match_query(text, columns=None):
+    """تحويل نص البحث إلى تعبير MATCH
+
+    كل كلمة (أو مقطع متصل مثل IN-2024-001) تصبح عبارة مع مطابقة البادئة،
+    والكلمات تُربط بـ AND. تعيد None إذا لم يحتوِ النص على كلمات قابلة للبحث
+    """
+    phrases = []
+    for chunk in normalize_arabic(text).split():
+        tokens = _TOKEN_PATTERN.findall(chunk)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"*')
+
+    if not phrases:
+        return None
+
+    match = " ".join(phrases)
+    if columns:
+        match = "{" + " ".join(columns) + "} : (" + match + ")"
+    return match
+
+def rank_expression(record_type):
+    """ترتيب النتائج حسب الصلة بأوزان الأعمدة"""
+    weights = ", ".join(str(weight) for _, _, weight in SEARCH_COLUMNS[record_type])
+    return f"bm25({SEARCH_TABLES[record_type]}, {weights})"
+
+def search_join(record_type, record_alias):
+    """جزء FROM الذي يربط جدول الفهرس بجدول السجلات"""
+    fts_table = SEARCH_TABLES[record_type]
+    return (f"{fts_table} JOIN {RECORD_TABLES[record_type]} {record_alias} "
+            f"ON {record_alias}.id = {fts_table}.rowid")
+
+def match_condition(record_type):
+    return f"{SEARCH_TABLES[record_type]} MATCH ?"
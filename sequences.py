@@ -0,0 +1,86 @@
+from search_index import RECORD_TABLES
+
+# ============================================================
+# تسلسلات أرقام السجلات: عداد لكل اتجاه (وارد/صادر) ولكل سنة في جدول
+# record_sequences. الرقم يُحجز بزيادة العداد داخل معاملة BEGIN IMMEDIATE
+# نفسها التي يُدخل فيها السجل، فلا يحصل مستخدمان على الرقم نفسه ولا تبقى
+# فجوات إن فشل الإدخال (تُلغى الزيادة مع المعاملة)
+# ============================================================
+
+# بادئة رقم السجل لكل اتجاه: IN-2024-0001
+RECORD_PREFIXES = {'incoming': 'IN', 'outgoing': 'OUT'}
+
+# الرقم التسلسلي مستمر عبر السنوات فيُحفظ عداده بالسنة 0
+SERIAL_YEAR = 0
+
+def format_record_number(record_type, year, number):
+    return f"{RECORD_PREFIXES[record_type]}-{year}-{number:04d}"
+
+def _seed_statements(record_type):
+    """تهيئة العدادات من أعلى الأرقام الموجودة في السجلات الحالية"""
+    table = RECORD_TABLES[record_type]
+    prefix = RECORD_PREFIXES[record_type]
+    year_start = len(prefix) + 2
+    number_start = year_start + 5
+    return [
+        f"""INSERT OR REPLACE INTO record_sequences (record_type, year, last_value)
+        SELECT '{record_type}', CAST(substr(record_number, {year_start}, 4) AS INTEGER),
+               MAX(CAST(substr(record_number, {number_start}) AS INTEGER))
+        FROM {table}
+        WHERE record_number GLOB '{prefix}-[0-9][0-9][0-9][0-9]-[0-9]*'
+        GROUP BY substr(record_number, {year_start}, 4);""",
+        
+        f"""INSERT OR REPLACE INTO record_sequences (record_type, year, last_value)
+        SELECT '{record_type}', {SERIAL_YEAR}, COALESCE(MAX(CAST(serial_number AS INTEGER)), 0)
+        FROM {table};""",
+    ]
+
+def sequence_statements():
+    """جدول العدادات وتهيئته من السجلات الموجودة (ترحيل)"""
+    statements = ["""
+        CREATE TABLE IF NOT EXISTS record_sequences (
+            record_type TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            last_value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (record_type, year)
+        ) WITHOUT ROWID;
+    """]
+    for record_type in RECORD_PREFIXES:
+        statements += _seed_statements(record_type)
+    return statements
+
+def next_value(cursor, record_type, year):
+    """زيادة العداد وإرجاع القيمة الجديدة (يجب أن يُستدعى داخل معاملة كتابة)"""
+    return reserve_block(cursor, record_type, year, 1)
+
+def reserve_block(cursor, record_type, year, count):
+    """زيادة العداد بعدد من القيم دفعة واحدة وإرجاع أولها (للاستيراد المجمع)"""
+    cursor.execute(
+        """INSERT INTO record_sequences (record_type, year, last_value) VALUES (?, ?, ?)
+        ON CONFLICT(record_type, year) DO UPDATE SET last_value = last_value + excluded.last_value""",
+        (record_type, year, count)
+    )
+    last_value = cursor.execute(
+        "SELECT last_value FROM record_sequences WHERE record_type = ? AND year = ?",
+        (record_type, year)
+    ).fetchone()[0]
+    return last_value - count + 1
+
+def current_value(cursor, record_type, year):
+    row = cursor.execute(
+        "SELECT last_value FROM record_sequences WHERE record_type = ? AND year = ?",
+        (record_type, year)
+    ).fetchone()
+    return row[0] if row else 0
+
+def reserve_record_numbers(cursor, record_type, year):
+    """حجز رقم السجل والرقم التسلسلي التاليين: (رقم السجل، الرقم التسلسلي)"""
+    record_number = format_record_number(record_type, year, next_value(cursor, record_type, year))
+    serial_number = str(next_value(cursor, record_type, SERIAL_YEAR))
+    return record_number, serial_number
+
+def peek_record_numbers(cursor, record_type, year):
+    """الأرقام التي سيحصل عليها السجل التالي إن حُفظ الآن (للعرض فقط، دون حجز)"""
+    record_number = format_record_number(record_type, year, current_value(cursor, record_type, year) + 1)
+    serial_number = str(current_value(cursor, record_type, SERIAL_YEAR) + 1)
+    return record_number, serial_number
@@ -7,7 +7,6 @@ setup(
     author="فريق التطوير",
     packages=find_packages(),
     install_requires=[
-        "pandas>=1.5.0",
         "openpyxl>=3.0.0", 
         "python-docx>=0.8.0",
         "reportlab>=3.6.0",
@@ -18,6 +17,7 @@ setup(
     entry_points={
         'console_scripts': [
             'correspondence-system=main:main',
+            'correspondence-reports=report_cli:main',
         ],
     },
     classifiers=[
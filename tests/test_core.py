@@ -0,0 +1,359 @@
+import csv
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from report_engine import UNSPECIFIED, ReportSpec, aggregate_report
+from sequences import sequence_statements
+from utils.file_manager import FileManager
+from utils.import_manager import ImportManager
+from utils.snapshot_manager import SnapshotManager
+from utils.statistics_service import StatisticsService
+
+# ============================================================
+# اختبارات المسارات الأكثر عرضة للكسر دون واجهة (لا تحتاج Tk):
+# حجز أرقام السجلات وتهيئة عداداتها، والجدول المحوري لمحرك التقارير،
+# والاستيراد المجمع (كتل الأرقام وملف المرفوضات والاستئناف)، وملفات المرفقات
+# في وحدة العمل (الإلغاء والحذف بعدد المراجع وحذف الملفات غير المرتبطة)،
+# واللقطات التزايدية (الإنشاء والتحقق والاستعادة)، وصلاحية إحصائيات لوحة التحكم
+#
+# التشغيل من مجلد المشروع:
+#   python -m pytest -q tests
+# ============================================================
+
+RECORD = {'incoming_number': 'W-1', 'title': 'سجل اختبار', 'registration_date': '2024-03-10'}
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "test.db"), storage_profile='rollback')
+    yield manager
+    manager.close()
+
+def record_numbers(db, table='incoming_records'):
+    return [tuple(row) for row in db.execute_query(f"SELECT record_number, serial_number FROM {table} ORDER BY id")]
+
+# ------------------------------------------------------------
+# أرقام السجلات
+# ------------------------------------------------------------
+
+def test_record_numbers_are_consecutive_per_year_and_serial_continues(db):
+    """رقم السجل متتالٍ لكل سنة، والرقم التسلسلي مستمر عبر السنوات"""
+    assert db.insert_record('incoming', RECORD, 2024)[1:] == ('IN-2024-0001', '1')
+    assert db.insert_record('incoming', RECORD, 2024)[1:] == ('IN-2024-0002', '2')
+    assert db.insert_record('incoming', RECORD, 2025)[1:] == ('IN-2025-0001', '3')
+    assert db.insert_record('outgoing', {'outgoing_number': 'W-1', 'title': 'صادر'}, 2024)[1:] == ('OUT-2024-0001', '1')
+    assert db.peek_record_numbers('incoming', 2024) == ('IN-2024-0003', '4')
+
+def test_failed_insert_does_not_consume_a_number(db):
+    """إلغاء المعاملة يلغي زيادة العداد، فلا تبقى فجوة"""
+    with pytest.raises(RuntimeError):
+        with db.unit_of_work() as work:
+            work.insert_record('incoming', RECORD, 2024)
+            raise RuntimeError("فشل بعد الحجز")
+    assert db.insert_record('incoming', {'title': 'بدون رقم وارد'}, 2024) is None
+    
+    assert db.insert_record('incoming', RECORD, 2024)[1:] == ('IN-2024-0001', '1')
+
+def test_concurrent_reservations_are_unique_and_gapless(db):
+    """الحجز من عدة خيوط معاً لا يكرر رقماً ولا يترك فجوة"""
+    threads_count, per_thread = 4, 15
+    errors = []
+    
+    def insert_many():
+        for _ in range(per_thread):
+            if db.insert_record('incoming', RECORD, 2024) is None:
+                errors.append("فشل الإدخال")
+    
+    threads = [threading.Thread(target=insert_many) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert not errors
+    numbers = record_numbers(db)
+    total = threads_count * per_thread
+    assert sorted(number for number, _ in numbers) == [f"IN-2024-{i:04d}" for i in range(1, total + 1)]
+    assert sorted(int(serial) for _, serial in numbers) == list(range(1, total + 1))
+
+def test_sequences_are_seeded_from_existing_records(db):
+    """تهيئة العدادات (الترحيل 7) تبدأ بعد أعلى رقم موجود لكل سنة وأعلى رقم تسلسلي"""
+    db.execute_many(
+        "INSERT INTO incoming_records (record_number, incoming_number, serial_number, title) VALUES (?, ?, ?, ?)",
+        [('IN-2023-0041', 'A', '97', 'قديم'), ('IN-2023-0007', 'B', '12', 'قديم'),
+         ('IN-2024-0003', 'C', '98', 'قديم'), ('رقم-يدوي', 'D', '5', 'رقم بصيغة أخرى')]
+    )
+    with db.pool.connection() as conn:
+        conn.execute("DELETE FROM record_sequences")
+        for statement in sequence_statements()[1:]:
+            conn.execute(statement)
+        conn.commit()
+    
+    assert db.insert_record('incoming', RECORD, 2023)[1:] == ('IN-2023-0042', '99')
+    assert db.insert_record('incoming', RECORD, 2024)[1:] == ('IN-2024-0004', '100')
+    assert db.insert_record('incoming', RECORD, 2025)[1:] == ('IN-2025-0001', '101')
+
+# ------------------------------------------------------------
+# محرك التقارير المجمعة
+# ------------------------------------------------------------
+
+def insert_incoming(db, rows):
+    """سجلات وارد مباشرة: (جهة الوارد، تاريخ التسجيل)"""
+    for source_id, registration_date in rows:
+        db.insert_record('incoming', dict(RECORD, incoming_source_id=source_id,
+                                          registration_date=registration_date), int(registration_date[:4]))
+
+def source_name(db, source_id):
+    return db.execute_query("SELECT name FROM incoming_sources WHERE id = ?", (source_id,))[0][0]
+
+def test_pivot_report_fills_missing_cells_and_totals(db):
+    """الجهة × الشهر: الخلايا الفارغة بقيمة المقياس الفارغة، والإجمالي من التجميع حسب الجهة"""
+    insert_incoming(db, [(1, '2024-01-05'), (1, '2024-01-20'), (1, '2024-02-02'),
+                         (2, '2024-02-14'), (None, '2024-01-30'), (2, '2023-12-31')])
+    spec = ReportSpec('incoming', 'source', 'month', ['count'], '2024-01-01', '2024-12-31')
+    
+    rows, columns = aggregate_report(db, spec)
+    
+    assert columns == ['جهة الوارد', '2024-01', '2024-02', 'الإجمالي']
+    assert {row[0]: row[1:] for row in rows} == {
+        source_name(db, 1): (2, 1, 3),
+        source_name(db, 2): (0, 1, 1),
+        UNSPECIFIED: (1, 0, 1),
+    }
+    assert [row[0] for row in rows] == sorted(row[0] for row in rows)
+
+def test_pivot_report_with_several_measures(db):
+    """لكل قيمة من البعد الثاني عمود لكل مقياس، والقيمة الفارغة لمقياس التاريخ نص فارغ"""
+    insert_incoming(db, [(1, '2024-01-05'), (1, '2024-01-20'), (2, '2024-02-14')])
+    spec = ReportSpec('incoming', 'source', 'month', ['count', 'last_date'])
+    
+    rows, columns = aggregate_report(db, spec)
+    
+    assert columns == ['جهة الوارد', '2024-01 - عدد السجلات', '2024-01 - آخر تاريخ',
+                       '2024-02 - عدد السجلات', '2024-02 - آخر تاريخ',
+                       'الإجمالي - عدد السجلات', 'الإجمالي - آخر تاريخ']
+    assert {row[0]: row[1:] for row in rows} == {
+        source_name(db, 1): (2, '2024-01-20', 0, '', 2, '2024-01-20'),
+        source_name(db, 2): (0, '', 1, '2024-02-14', 1, '2024-02-14'),
+    }
+
+def test_grouped_report_without_pivot(db):
+    insert_incoming(db, [(1, '2024-01-05'), (2, '2024-02-14'), (2, '2024-03-01')])
+    
+    rows, columns = aggregate_report(db, ReportSpec('incoming', 'month', measures=['count', 'employees']))
+    
+    assert columns == ['الشهر', 'عدد السجلات', 'عدد الموظفين']
+    assert rows == [('2024-01', 1, 0), ('2024-02', 1, 0), ('2024-03', 1, 0)]
+
+# ------------------------------------------------------------
+# الاستيراد المجمع
+# ------------------------------------------------------------
+
+class Interrupted(Exception):
+    pass
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        csv.writer(f).writerows([['رقم الوارد', 'العنوان', 'التاريخ', 'الجهة']] + rows)
+    return str(path)
+
+def read_rejects(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.reader(f))
+
+def test_import_reserves_number_blocks_and_writes_rejects(db, tmp_path):
+    """الأرقام تُحجز كتلةً لكل سنة بترتيب الملف، والصفوف المرفوضة تُكتب مع سببها"""
+    db.insert_record('incoming', RECORD, 2024)
+    file_path = write_csv(tmp_path / "records.csv", [
+        ['A-1', 'أول', '2024-01-05', 'جهة جديدة'],
+        ['A-2', '', '2024-01-06', ''],
+        ['A-3', 'ثالث', '2023/12/31', 'جهة جديدة'],
+        ['A-4', 'رابع', 'ليس تاريخاً', ''],
+        ['A-5', 'خامس', '10/02/2024', ''],
+    ])
+    
+    result = ImportManager(db, batch_size=2).import_file(file_path, 'incoming')
+    
+    assert (result.rows, result.inserted, result.rejected) == (5, 3, 2)
+    assert result.created == {'incoming_sources': 1}
+    assert record_numbers(db)[1:] == [('IN-2024-0002', '2'), ('IN-2023-0001', '3'), ('IN-2024-0003', '4')]
+    assert db.insert_record('incoming', RECORD, 2024)[1:] == ('IN-2024-0004', '5')
+    
+    rejects = read_rejects(result.rejects_path)
+    assert result.rejects_path == str(tmp_path / "records.rejected.csv")
+    assert rejects[0] == ['رقم الصف', 'رقم الوارد', 'العنوان', 'التاريخ', 'الجهة', 'سبب الرفض']
+    assert [row[:2] for row in rejects[1:]] == [['2', 'A-2'], ['4', 'A-4']]
+    assert all(row[-1] for row in rejects[1:])
+
+def test_import_resumes_after_last_completed_batch(db, tmp_path):
+    """التوقف بعد دفعة مؤكدة يستأنف من الصف التالي دون تكرار سجل أو صف مرفوض"""
+    file_path = write_csv(tmp_path / "records.csv", [
+        [f'A-{i}', '' if i == 2 else f'سجل {i}', '2024-01-05', ''] for i in range(1, 8)
+    ])
+    
+    def stop_after_first_batch(done):
+        raise Interrupted(done)
+    
+    with pytest.raises(Interrupted):
+        ImportManager(db, batch_size=3).import_file(file_path, 'incoming', progress=stop_after_first_batch)
+    assert len(record_numbers(db)) == 2
+    
+    result = ImportManager(db, batch_size=3).import_file(file_path, 'incoming')
+    
+    assert (result.resumed_from, result.rows, result.inserted, result.rejected) == (3, 4, 4, 0)
+    assert [number for number, _ in record_numbers(db)] == [f"IN-2024-{i:04d}" for i in range(1, 7)]
+    assert [row[1] for row in read_rejects(result.rejects_path)[1:]] == ['A-2']
+    assert db.execute_query("SELECT rows_done, inserted, rejected, completed FROM import_checkpoints")[0] == (7, 6, 1, 1)
+    
+    again = ImportManager(db, batch_size=3).import_file(file_path, 'incoming')
+    assert again.already_done and len(record_numbers(db)) == 6
+
+# ------------------------------------------------------------
+# المرفقات في وحدة العمل
+# ------------------------------------------------------------
+
+@pytest.fixture
+def file_manager(tmp_path):
+    return FileManager(str(tmp_path / "attachments"))
+
+def write_source(tmp_path, name="letter.pdf", content=b"%PDF attachment"):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+def blob_rows(db):
+    return [tuple(row) for row in db.execute_query("SELECT hash, ref_count FROM attachment_blobs")]
+
+def test_rollback_removes_staged_blob(db, file_manager, tmp_path):
+    """إلغاء وحدة العمل يحذف الملف المنسوخ إلى المخزن ولا يترك صفاً ولا رقماً محجوزاً"""
+    source_path = write_source(tmp_path)
+    with pytest.raises(RuntimeError):
+        with db.unit_of_work(file_manager) as work:
+            saved_file = work.stage_file(source_path)
+            record_id = work.insert_record('incoming', RECORD, 2024)[0]
+            work.add_attachment(record_id, 'incoming', saved_file)
+            assert os.path.exists(saved_file['file_path'])
+            raise RuntimeError("فشل قبل الحفظ")
+    
+    assert not os.path.exists(saved_file['file_path'])
+    assert not os.listdir(file_manager.attachments_dir)
+    assert db.execute_query("SELECT COUNT(*) FROM attachments")[0][0] == 0
+    assert blob_rows(db) == []
+    assert db.insert_record('incoming', RECORD, 2024)[1:] == ('IN-2024-0001', '1')
+
+def test_shared_blob_is_removed_with_its_last_reference(db, file_manager, tmp_path):
+    """الملف المرفق بسجلين يُخزن مرة واحدة ويبقى حتى يُحذف آخر سجل يشير إليه"""
+    record_ids = []
+    for name in ("first.pdf", "second.pdf"):
+        with db.unit_of_work(file_manager) as work:
+            saved_file = work.stage_file(write_source(tmp_path, name))
+            record_id = work.insert_record('incoming', RECORD, 2024)[0]
+            work.add_attachment(record_id, 'incoming', saved_file)
+            record_ids.append(record_id)
+    file_path = saved_file['file_path']
+    assert saved_file['deduplicated']
+    assert blob_rows(db) == [(saved_file['hash'], 2)]
+    
+    with db.unit_of_work(file_manager) as work:
+        assert work.delete_record('incoming', record_ids[0]) == 1
+    assert os.path.exists(file_path)
+    assert blob_rows(db) == [(saved_file['hash'], 1)]
+    
+    with db.unit_of_work(file_manager) as work:
+        assert work.delete_record('incoming', record_ids[1]) == 1
+    assert not os.path.exists(file_path)
+    assert not os.listdir(file_manager.attachments_dir)
+    assert blob_rows(db) == []
+    assert db.execute_query("SELECT COUNT(*) FROM attachments")[0][0] == 0
+
+def test_collect_garbage_removes_unreferenced_blobs(db, file_manager, tmp_path):
+    """الملفات التي بقيت صفوفها دون مرفقات تُحذف مع صفوفها، والمرفقة تبقى"""
+    content = b"x" * 1200
+    kept = file_manager.save_attachment(write_source(tmp_path, "kept.pdf"), None, None)
+    orphan = file_manager.save_attachment(write_source(tmp_path, "orphan.pdf", content), None, None)
+    for saved_file in (kept, orphan):
+        assert db.add_attachment(1, 'incoming', saved_file, file_manager=file_manager)
+    db.execute_query("DELETE FROM attachments WHERE blob_hash = ?", (orphan['hash'],))
+    
+    assert file_manager.collect_garbage(db) == (1, len(content))
+    
+    assert not os.path.exists(orphan['file_path'])
+    assert os.path.exists(kept['file_path'])
+    assert blob_rows(db) == [(kept['hash'], 1)]
+    assert file_manager.collect_garbage(db) == (0, 0)
+
+# ------------------------------------------------------------
+# اللقطات التزايدية
+# ------------------------------------------------------------
+
+def attach(db, file_manager, source_path):
+    with db.unit_of_work(file_manager) as work:
+        saved_file = work.stage_file(source_path)
+        record_id = work.insert_record('incoming', RECORD, 2024)[0]
+        work.add_attachment(record_id, 'incoming', saved_file)
+    return saved_file
+
+def test_incremental_snapshots_verify_and_restore(db, file_manager, tmp_path):
+    """لقطتان في الثانية نفسها لا تستبدل إحداهما الأخرى، والملفات المعاد استخدامها تبقى في أرشيفها"""
+    snapshots = SnapshotManager(db, file_manager, str(tmp_path / "snapshots"))
+    first = attach(db, file_manager, write_source(tmp_path, "first.pdf", b"first"))
+    
+    first_path, added, reused = snapshots.create_snapshot()
+    assert (added, reused) == (1, 0)
+    second_path, added, reused = snapshots.create_snapshot()
+    assert (added, reused) == (0, 1)
+    assert second_path != first_path and os.path.exists(first_path)
+    
+    # أرشيف تالف أحدث من الجميع: اللقطة التالية تُبنى على آخر بيان سليم وتسجله أساساً لها
+    with open(os.path.join(snapshots.snapshot_dir, "snapshot_99991231_235959_999999.zip"), 'wb') as f:
+        f.write(b"not a zip")
+    second = attach(db, file_manager, write_source(tmp_path, "second.pdf", b"second"))
+    third_path, added, reused = snapshots.create_snapshot()
+    assert (added, reused) == (1, 1)
+    third = os.path.basename(third_path)
+    assert snapshots.read_manifest(third)['base'] == os.path.basename(second_path)
+    
+    for path in (first_path, second_path, third_path):
+        assert snapshots.verify_snapshot(os.path.basename(path)) == []
+    
+    for saved_file in (first, second):
+        os.remove(saved_file['file_path'])
+    assert snapshots.restore_snapshot(third) == []
+    with open(first['file_path'], 'rb') as f:
+        assert f.read() == b"first"
+    with open(second['file_path'], 'rb') as f:
+        assert f.read() == b"second"
+    assert db.execute_query("SELECT COUNT(*) FROM attachments")[0][0] == 2
+
+# ------------------------------------------------------------
+# إحصائيات لوحة التحكم
+# ------------------------------------------------------------
+
+def test_statistics_detect_writes_not_counted_by_record_added(db):
+    """الإدخال المحسوب بـ record_added لا يُعد تغييراً، والكتابة من مكان آخر تُعيد الحساب"""
+    statistics = StatisticsService(db, persist_interval=0)
+    assert statistics.get()['incoming_total'] == 0
+    assert statistics.is_fresh()
+    
+    token = statistics.change_token()
+    db.insert_record('incoming', RECORD, 2024)
+    statistics.record_added('incoming', RECORD['registration_date'], token)
+    assert statistics.is_fresh()
+    assert statistics.cached()['incoming_total'] == 1
+    
+    # كتابة من مكان آخر بعد آخر حساب: التحديث المحلي للإدخال التالي يُهمل
+    db.insert_record('incoming', RECORD, 2024)
+    token = statistics.change_token()
+    db.insert_record('incoming', RECORD, 2024)
+    statistics.record_added('incoming', RECORD['registration_date'], token)
+    assert not statistics.is_fresh()
+    assert statistics.get()['incoming_total'] == 3
+    
+    # حفظ الإحصائيات في الإعدادات ليس تغييراً في البيانات
+    statistics.persist()
+    assert statistics.is_fresh()
@@ -0,0 +1,178 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+# ============================================================
+# تنفيذ استعلامات قاعدة البيانات في خيوط عاملة دون تجميد الواجهة
+# النتائج تُعاد إلى خيط Tk عبر طابور يُقرأ بـ after، ولا تُستدعى
+# دوال الواجهة من الخيوط العاملة أبداً
+# ============================================================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# عدد الخيوط أقل من حجم مجمع الاتصالات ليبقى اتصال متاح لخيط الواجهة
+MAX_WORKERS = 3
+
+def get_executor():
+    """مجمع الخيوط المشترك بين جميع النوافذ"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='db-worker')
+        return _executor
+
+class AsyncTask:
+    """طلب واحد مُرسل للتنفيذ في الخلفية"""
+    
+    def __init__(self, key, on_success, on_error, progress):
+        self.key = key
+        self.on_success = on_success
+        self.on_error = on_error
+        self.progress = progress
+        self.future = None
+        self.cancelled = False
+        self.context = None  # إجراء الواجهة الذي أرسل الطلب (لمراقب الاستعلامات)
+    
+    def cancel(self):
+        """إلغاء الطلب: لا يبدأ إن لم يكن قد بدأ، وتُهمل نتيجته إن كان قيد التنفيذ"""
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+class AsyncDatabaseManager:
+    """تشغيل استعلامات DatabaseManager في الخلفية لنافذة واحدة
+    
+    الطلبات التي تحمل نفس المفتاح (key) يلغي أحدثها ما سبقه، مثل البحث
+    عند كل ضغطة مفتاح. يمكن ربط مؤشر تقدم (ttk.Progressbar) يعمل ما دامت
+    هناك طلبات قيد التنفيذ
+    """
+    
+    POLL_INTERVAL = 30  # بالمللي ثانية
+    
+    def __init__(self, widget, db_manager, progress=None):
+        self.widget = widget
+        self.db_manager = db_manager
+        self.progress = progress
+        
+        self.results = queue.Queue()
+        self.pending = set()
+        self.latest = {}  # المفتاح -> أحدث طلب
+        self.busy = {}  # مؤشر التقدم -> عدد الطلبات الجارية
+        self.polling = False
+    
+    def submit(self, func, *args, on_success=None, on_error=None, key=None, progress=None, **kwargs):
+        """تنفيذ دالة في الخلفية واستدعاء on_success(result) أو on_error(exception) في خيط الواجهة"""
+        if key is not None and key in self.latest:
+            self.latest[key].cancel()
+        
+        task = AsyncTask(key, on_success, on_error, progress or self.progress)
+        monitor = self.db_manager.monitor
+        if monitor is not None:
+            task.context = monitor.capture_context()
+        if key is not None:
+            self.latest[key] = task
+        
+        self.pending.add(task)
+        self.start_progress(task.progress)
+        task.future = get_executor().submit(self.run, task, func, args, kwargs)
+        self.schedule_poll()
+        return task
+    
+    def query(self, query, params=(), **options):
+        """تنفيذ استعلام في الخلفية: أخطاؤه تصل إلى on_error بدلاً من نتيجة فارغة"""
+        return self.submit(self.db_manager.run_query, query, params, **options)
+    
+    def cancel(self, key):
+        """إلغاء الطلب الجاري بهذا المفتاح إن وُجد"""
+        task = self.latest.pop(key, None)
+        if task is not None:
+            task.cancel()
+    
+    def cancel_all(self):
+        for task in list(self.pending):
+            task.cancel()
+        self.latest.clear()
+    
+    def run(self, task, func, args, kwargs):
+        """يُنفذ في الخيط العامل"""
+        if task.cancelled:
+            self.results.put((task, None, None))
+            return
+        monitor = self.db_manager.monitor
+        try:
+            with monitor.context(task.context) if monitor is not None else nullcontext():
+                result = func(*args, **kwargs)
+            self.results.put((task, result, None))
+        except Exception as e:
+            self.results.put((task, None, e))
+    
+    def schedule_poll(self):
+        if not self.polling:
+            self.polling = True
+            self.widget.after(self.POLL_INTERVAL, self.poll)
+    
+    def poll(self):
+        """تسليم النتائج الجاهزة في خيط الواجهة"""
+        self.polling = False
+        try:
+            if not self.widget.winfo_exists():
+                self.cancel_all()
+                return
+        except Exception:
+            return
+        
+        try:
+            while True:
+                try:
+                    task, result, error = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.finish(task, result, error)
+            
+            # الطلبات الملغاة قبل بدئها لا تصل إلى الطابور
+            for task in [t for t in self.pending if t.future.cancelled()]:
+                self.finish(task, None, None)
+        finally:
+            # خطأ في دالة استدعاء لا يوقف تسليم باقي النتائج
+            if self.pending:
+                self.schedule_poll()
+    
+    def finish(self, task, result, error):
+        if task not in self.pending:
+            return
+        self.pending.discard(task)
+        self.stop_progress(task.progress)
+        
+        if task.key is not None and self.latest.get(task.key) is task:
+            del self.latest[task.key]
+        
+        if task.cancelled:
+            return
+        
+        if error is not None:
+            if task.on_error:
+                task.on_error(error)
+            else:
+                print(f"خطأ في تنفيذ طلب الخلفية: {error}")
+        elif task.on_success:
+            task.on_success(result)
+    
+    def start_progress(self, progress):
+        if progress is None:
+            return
+        self.busy[progress] = self.busy.get(progress, 0) + 1
+        if self.busy[progress] == 1:
+            progress.start(10)
+    
+    def stop_progress(self, progress):
+        if progress is None or progress not in self.busy:
+            return
+        self.busy[progress] -= 1
+        if self.busy[progress] <= 0:
+            del self.busy[progress]
+            try:
+                progress.stop()
+            except Exception:
+                pass
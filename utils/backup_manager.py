@@ -0,0 +1,274 @@
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# ============================================================
+# النسخ الاحتياطي المتصل لقاعدة البيانات عبر واجهة النسخ في SQLite
+# النسخة تُؤخذ من اتصال مفتوح على دفعات من الصفحات، فهي متسقة حتى أثناء
+# الكتابة ولا توقف الواجهة، ثم تُضغط (gzip افتراضياً، أو zstd إن ثُبتت مكتبة zstandard)
+# ويُتحقق من سلامتها بعد كتابتها
+# ============================================================
+
+BACKUP_PREFIX = "database_backup_"
+
+# امتداد ملف النسخة لكل طريقة ضغط
+COMPRESSION_EXTENSIONS = {
+    'zstd': '.db.zst',
+    'gzip': '.db.gz',
+    'none': '.db',
+}
+
+class BackupManager:
+    """إنشاء النسخ الاحتياطية والتحقق منها واستعادتها وحذف القديم منها
+    
+    الإعدادات تُقرأ من جدول system_settings:
+    backup_auto، backup_interval_hours، backup_keep_count، backup_keep_days، backup_compression
+    """
+    
+    # عدد الصفحات المنسوخة في كل خطوة والتوقف بين الخطوات
+    PAGES_PER_STEP = 256
+    STEP_PAUSE = 0.005
+    
+    COPY_CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, db_manager, backup_dir="backups"):
+        self.db_manager = db_manager
+        self.backup_dir = backup_dir
+        self._lock = threading.Lock()
+        os.makedirs(backup_dir, exist_ok=True)
+    
+    @staticmethod
+    def available_compressions():
+        """طرق الضغط المتاحة في هذه البيئة"""
+        methods = ['gzip', 'none']
+        if zstandard is not None:
+            methods.insert(0, 'zstd')
+        return methods
+    
+    def compression_method(self, compression=None):
+        """طريقة الضغط المطلوبة أو المحددة في الإعدادات، مع الرجوع إلى gzip إن لم تتوفر"""
+        compression = compression or self.db_manager.get_setting('backup_compression', 'gzip')
+        if compression not in self.available_compressions():
+            print(f"طريقة الضغط {compression} غير متاحة (مكتبة zstandard غير مثبتة)، يُستخدم gzip بدلاً منها")
+            return 'gzip'
+        return compression
+    
+    def create_backup(self, compression=None, progress=None):
+        """إنشاء نسخة احتياطية مضغوطة والتحقق منها
+        
+        progress: دالة اختيارية تُستدعى (المتبقي، الإجمالي) بعد كل خطوة نسخ (من الخيط المنفذ)
+        يعيد مسار النسخة أو None عند الفشل
+        """
+        compression = self.compression_method(compression)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_path = os.path.join(self.backup_dir, f"{BACKUP_PREFIX}{timestamp}{COMPRESSION_EXTENSIONS[compression]}")
+        
+        with self._lock:
+            snapshot_path = None
+            try:
+                snapshot_path = self.temp_path('.db')
+                if not self.db_manager.backup_database(
+                    snapshot_path, pages=self.PAGES_PER_STEP, pause=self.STEP_PAUSE, progress=progress
+                ):
+                    return None
+                
+                # الكتابة إلى ملف مؤقت ثم إعادة التسمية حتى لا تبقى نسخة ناقصة باسم صحيح
+                partial_path = backup_path + '.part'
+                self.compress_file(snapshot_path, partial_path, compression)
+                os.replace(partial_path, backup_path)
+                
+                if not self.verify_backup(backup_path):
+                    print(f"فشل التحقق من النسخة الاحتياطية: {backup_path}")
+                    os.remove(backup_path)
+                    return None
+                
+                self.db_manager.set_setting('backup_last_date', datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                            'تاريخ آخر نسخة احتياطية')
+                return backup_path
+            except Exception as e:
+                print(f"خطأ في النسخ الاحتياطي: {e}")
+                return None
+            finally:
+                for path in (snapshot_path, backup_path + '.part'):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+    
+    def temp_path(self, suffix):
+        fd, path = tempfile.mkstemp(suffix=suffix, dir=self.backup_dir)
+        os.close(fd)
+        return path
+    
+    def compression_of(self, backup_path):
+        """طريقة ضغط النسخة من امتداد الملف"""
+        if backup_path.endswith('.zst'):
+            return 'zstd'
+        if backup_path.endswith('.gz'):
+            return 'gzip'
+        return 'none'
+    
+    def compress_file(self, source_path, target_path, compression):
+        with open(source_path, 'rb') as source:
+            if compression == 'zstd':
+                with open(target_path, 'wb') as target:
+                    zstandard.ZstdCompressor(level=10, threads=-1).copy_stream(source, target)
+            elif compression == 'gzip':
+                with gzip.open(target_path, 'wb', compresslevel=6) as target:
+                    shutil.copyfileobj(source, target, self.COPY_CHUNK_SIZE)
+            else:
+                with open(target_path, 'wb') as target:
+                    shutil.copyfileobj(source, target, self.COPY_CHUNK_SIZE)
+    
+    def decompress_file(self, source_path, target_path):
+        compression = self.compression_of(source_path)
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError("مكتبة zstandard غير مثبتة لفك ضغط هذه النسخة")
+        
+        with open(target_path, 'wb') as target:
+            if compression == 'zstd':
+                with open(source_path, 'rb') as source:
+                    zstandard.ZstdDecompressor().copy_stream(source, target)
+            elif compression == 'gzip':
+                with gzip.open(source_path, 'rb') as source:
+                    shutil.copyfileobj(source, target, self.COPY_CHUNK_SIZE)
+            else:
+                with open(source_path, 'rb') as source:
+                    shutil.copyfileobj(source, target, self.COPY_CHUNK_SIZE)
+    
+    @staticmethod
+    def check_integrity(db_path):
+        """تشغيل PRAGMA integrity_check على ملف قاعدة بيانات"""
+        conn = sqlite3.connect(db_path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()
+            return result is not None and result[0] == 'ok'
+        finally:
+            conn.close()
+    
+    def verify_backup(self, backup_path):
+        """فك ضغط النسخة إلى ملف مؤقت والتحقق من سلامة قاعدة البيانات فيها"""
+        restored_path = self.temp_path('.db')
+        try:
+            self.decompress_file(backup_path, restored_path)
+            return self.check_integrity(restored_path)
+        except Exception as e:
+            print(f"خطأ في التحقق من النسخة الاحتياطية: {e}")
+            return False
+        finally:
+            os.remove(restored_path)
+    
+    def restore_backup(self, backup_path):
+        """استعادة نسخة احتياطية (مضغوطة أو لا) بعد التحقق من سلامتها"""
+        with self._lock:
+            restored_path = self.temp_path('.db')
+            try:
+                self.decompress_file(backup_path, restored_path)
+                if not self.check_integrity(restored_path):
+                    print(f"النسخة الاحتياطية تالفة: {backup_path}")
+                    return False
+                return self.db_manager.restore_database(restored_path)
+            except Exception as e:
+                print(f"خطأ في استعادة النسخة الاحتياطية: {e}")
+                return False
+            finally:
+                os.remove(restored_path)
+    
+    def list_backups(self):
+        """النسخ الاحتياطية الموجودة من الأحدث إلى الأقدم: قائمة (المسار، تاريخ التعديل)"""
+        backups = []
+        for name in os.listdir(self.backup_dir):
+            if name.startswith(BACKUP_PREFIX) and name.endswith(tuple(COMPRESSION_EXTENSIONS.values())):
+                path = os.path.join(self.backup_dir, name)
+                backups.append((path, os.path.getmtime(path)))
+        backups.sort(key=lambda backup: backup[1], reverse=True)
+        return backups
+    
+    def prune_backups(self, keep_count=None, keep_days=None):
+        """حذف النسخ الزائدة عن العدد المحدد أو الأقدم من المدة المحددة
+        
+        أحدث نسخة لا تُحذف أبداً. يعيد قائمة الملفات المحذوفة
+        """
+        if keep_count is None:
+            keep_count = int(self.db_manager.get_setting('backup_keep_count', 10))
+        if keep_days is None:
+            keep_days = int(self.db_manager.get_setting('backup_keep_days', 30))
+        
+        cutoff = time.time() - keep_days * 86400
+        removed = []
+        for index, (path, mtime) in enumerate(self.list_backups()):
+            if index == 0:
+                continue
+            if index >= keep_count or mtime < cutoff:
+                try:
+                    os.remove(path)
+                    removed.append(path)
+                except OSError as e:
+                    print(f"خطأ في حذف النسخة الاحتياطية القديمة: {e}")
+        return removed
+    
+    def backup_due(self):
+        """هل حان موعد النسخة التلقائية حسب backup_auto و backup_interval_hours"""
+        if self.db_manager.get_setting('backup_auto', '1') != '1':
+            return False
+        
+        last_backup = self.db_manager.get_setting('backup_last_date')
+        if not last_backup:
+            return True
+        interval = timedelta(hours=float(self.db_manager.get_setting('backup_interval_hours', 24)))
+        try:
+            return datetime.now() - datetime.strptime(last_backup, '%Y-%m-%d %H:%M:%S') >= interval
+        except ValueError:
+            return True
+    
+    def run_scheduled_backup(self):
+        """نسخة تلقائية إن حان موعدها ثم حذف النسخ القديمة"""
+        if not self.backup_due():
+            return None
+        backup_path = self.create_backup()
+        if backup_path:
+            self.prune_backups()
+        return backup_path
+
+class BackupScheduler:
+    """فحص دوري في الخلفية لموعد النسخ الاحتياطي التلقائي"""
+    
+    def __init__(self, backup_manager, check_interval=600, initial_delay=120):
+        self.backup_manager = backup_manager
+        self.check_interval = check_interval
+        self.initial_delay = initial_delay
+        self.last_backup = None
+        
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """تشغيل المجدول"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="database-backup", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """إيقاف المجدول"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        wait = self.initial_delay
+        while not self._stop_event.wait(wait):
+            backup_path = self.backup_manager.run_scheduled_backup()
+            if backup_path:
+                self.last_backup = backup_path
+            wait = self.check_interval
@@ -1,14 +1,86 @@
-import pandas as pd
-from docx import Document
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.units import cm
+import importlib
+import importlib.util
 import os
 from datetime import datetime
+from itertools import chain, islice
+from dataclasses import dataclass
+from typing import Optional
+
+from search_index import RECORD_TABLES, build_match_query, match_condition, rank_expression, search_join
+
+@dataclass
+class ExportSpec:
+    """مواصفات البيانات المعروضة في جدول: نوع السجلات ومرشحات العرض نفسها
+    
+    record_type: 'incoming' أو 'outgoing' أو 'both' (نتائج البحث في النوعين)
+    """
+    record_type: str
+    search_text: str = ""
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    employee_id: Optional[int] = None
+
+# أعمدة التصدير لكل نوع سجلات كما تظهر في جداول النافذة الرئيسية (بدون ID)
+RECORD_EXPORTS = {
+    'incoming': {
+        'title': 'سجلات الوارد',
+        'alias': 'ir',
+        'columns': ['رقم السجل', 'رقم الوارد', 'الرقم التسلسلي', 'العنوان',
+                    'جهة الوارد', 'النوع', 'الموظف', 'التاريخ'],
+        'select': """ir.record_number, ir.incoming_number, ir.serial_number, ir.title,
+               isrc.name, it.name, e.name, ir.registration_date""",
+        'joins': """LEFT JOIN incoming_sources isrc ON ir.incoming_source_id = isrc.id
+        LEFT JOIN incoming_types it ON ir.incoming_type_id = it.id
+        LEFT JOIN employees e ON ir.employee_id = e.id""",
+        'search_select': """'📥 وارد' AS kind, ir.record_number AS record_number, ir.incoming_number AS number,
+               ir.serial_number AS serial_number, ir.title AS title, ir.registration_date AS registration_date""",
+    },
+    'outgoing': {
+        'title': 'سجلات الصادر',
+        'alias': 'orc',
+        'columns': ['رقم السجل', 'رقم الصادر', 'الرقم التسلسلي', 'العنوان',
+                    'جهة الصادر', 'الموظف', 'التاريخ'],
+        'select': """orc.record_number, orc.outgoing_number, orc.serial_number, orc.title,
+               od.name, e.name, orc.registration_date""",
+        'joins': """LEFT JOIN outgoing_destinations od ON orc.outgoing_destination_id = od.id
+        LEFT JOIN employees e ON orc.employee_id = e.id""",
+        'search_select': """'📤 صادر' AS kind, orc.record_number AS record_number, orc.outgoing_number AS number,
+               orc.serial_number AS serial_number, orc.title AS title, orc.registration_date AS registration_date""",
+    },
+}
+
+# أعمدة نتائج البحث في النوعين، وأسماؤها المستعارة في search_select
+SEARCH_EXPORT_COLUMNS = ['النوع', 'رقم السجل', 'الرقم', 'الرقم التسلسلي', 'العنوان', 'التاريخ']
+SEARCH_RESULT_NAMES = ['kind', 'record_number', 'number', 'serial_number', 'title', 'registration_date']
+
+# مكتبات التصدير والطباعة: اسم الاستيراد -> اسم الحزمة
+# تُستورد داخل دوال التصدير عند أول استخدام فقط لأن استيرادها يؤخر فتح النافذة عدة ثوانٍ
+EXPORT_BACKENDS = {
+    'openpyxl': 'openpyxl',
+    'docx': 'python-docx',
+    'reportlab': 'reportlab',
+}
+
+# الوحدات التي تستوردها دوال التصدير فعلياً، تُحمّل مسبقاً في الخلفية عند الطلب
+PREWARM_MODULES = (
+    'openpyxl', 'openpyxl.cell', 'openpyxl.styles', 'openpyxl.utils',
+    'docx',
+    'reportlab.lib.pagesizes', 'reportlab.platypus', 'reportlab.lib.styles',
+    'reportlab.lib.colors', 'reportlab.lib.units',
+)
+
+def missing_backends():
+    """أسماء حزم التصدير غير المثبتة، دون استيرادها"""
+    return [package for module, package in EXPORT_BACKENDS.items()
+            if importlib.util.find_spec(module) is None]
+
+def prewarm_backends():
+    """استيراد مكتبات التصدير مسبقاً حتى لا يتأخر أول تصدير أو طباعة"""
+    for module in PREWARM_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"تعذر تحميل مكتبة التصدير {module}: {e}")
 
 class ExportManager:
     def __init__(self, db_manager):
@@ -35,62 +107,106 @@ class ExportManager:
             return default
         return row[index] if row[index] is not None else default
     
+    # حجم دفعة القراءة من المؤشر، وعدد الصفوف الأولى المستخدمة لحساب عرض الأعمدة
+    EXCEL_CHUNK_SIZE = 1000
+    EXCEL_WIDTH_SAMPLE = 500
+    EXCEL_MAX_WIDTH = 50
+    
     def export_to_excel(self, data, columns, file_path, sheet_name="بيانات"):
         """تصدير البيانات إلى Excel"""
         try:
-            # التأكد من أن البيانات ليست None
-            if data is None:
-                data = []
-            
-            # معالجة البيانات
-            processed_data = []
-            for row in data:
-                if row is not None:
-                    processed_row = [str(cell) if cell is not None else "" for cell in row]
-                    processed_data.append(processed_row)
-            
-            # التأكد من وجود بيانات
-            if not processed_data:
-                processed_data = [["لا توجد بيانات" for _ in columns]]
-            
-            df = pd.DataFrame(processed_data, columns=columns)
-            
-            # إنشاء كاتب Excel
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                
-                # الحصول على ورقة العمل وتعديلها
-                worksheet = writer.sheets[sheet_name]
-                
-                # ضبط اتجاه النص للخلايا
-                for row in worksheet.iter_rows():
-                    for cell in row:
-                        cell.alignment = cell.alignment.copy(
-                            horizontal='right',
-                            vertical='center'
-                        )
-                
-                # ضبط عرض الأعمدة تلقائياً
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
+            self.write_excel_rows(data if data is not None else [], columns, file_path, sheet_name)
+            return True
+        except Exception as e:
+            print(f"خطأ في التصدير إلى Excel: {e}")
+            return False
+    
+    def export_query_to_excel(self, query, params, columns, file_path, sheet_name="بيانات", chunk_size=None):
+        """تصدير نتيجة استعلام إلى Excel بالقراءة من المؤشر على دفعات
+        
+        استهلاك الذاكرة ثابت مهما كان عدد الصفوف
+        """
+        try:
+            rows = self.db_manager.iter_query(query, params, chunk_size or self.EXCEL_CHUNK_SIZE)
+            self.write_excel_rows(rows, columns, file_path, sheet_name)
             return True
         except Exception as e:
             print(f"خطأ في التصدير إلى Excel: {e}")
             return False
     
+    def write_excel_rows(self, rows, columns, file_path, sheet_name="بيانات"):
+        """كتابة الصفوف في ورقة عمل للكتابة فقط (write-only) دون الاحتفاظ بها في الذاكرة"""
+        from openpyxl import Workbook
+        
+        workbook = Workbook(write_only=True)
+        self.add_excel_sheet(workbook, rows, columns, sheet_name)
+        workbook.save(file_path)
+    
+    def add_excel_sheet(self, workbook, rows, columns, sheet_name):
+        """إضافة ورقة إلى مصنف للكتابة فقط وكتابة الصفوف فيها"""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Font
+        from openpyxl.utils import get_column_letter
+        
+        worksheet = workbook.create_sheet(title=sheet_name)
+        worksheet.sheet_view.rightToLeft = True
+        
+        # عرض الأعمدة يُحسب من عينة محدودة من الصفوف الأولى
+        rows = (row for row in rows if row is not None)
+        sample = list(islice(rows, self.EXCEL_WIDTH_SAMPLE))
+        
+        for index, column in enumerate(columns):
+            max_length = len(str(column))
+            for row in sample:
+                if index < len(row) and row[index] is not None:
+                    max_length = max(max_length, len(str(row[index])))
+            width = min(max_length + 2, self.EXCEL_MAX_WIDTH)
+            worksheet.column_dimensions[get_column_letter(index + 1)].width = width
+        
+        alignment = Alignment(horizontal='right', vertical='center')
+        
+        header = []
+        for column in columns:
+            cell = WriteOnlyCell(worksheet, value=str(column))
+            cell.font = Font(bold=True)
+            cell.alignment = alignment
+            header.append(cell)
+        worksheet.append(header)
+        
+        # خلية منسقة مسبقاً لكل عمود يُعاد استخدامها، فكل صف يُكتب إلى الملف فور إضافته
+        cells = []
+        for _ in columns:
+            cell = WriteOnlyCell(worksheet)
+            cell.alignment = alignment
+            cells.append(cell)
+        
+        if not sample:
+            sample = [["لا توجد بيانات" for _ in columns]]
+        
+        for row in chain(sample, rows):
+            for cell, value in zip(cells, row):
+                cell.value = value
+            worksheet.append(cells[:len(row)])
+    
+    def export_to_csv(self, data, columns, file_path):
+        """تصدير البيانات إلى CSV (UTF-8 مع BOM ليقرأه Excel بالعربية)"""
+        try:
+            import csv
+            
+            with open(file_path, 'w', newline='', encoding='utf-8-sig') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(data if data is not None else [])
+            return True
+        except Exception as e:
+            print(f"خطأ في التصدير إلى CSV: {e}")
+            return False
+    
     def export_to_word(self, data, columns, file_path, title="تقرير"):
         """تصدير البيانات إلى Word"""
         try:
+            from docx import Document
+            
             # التأكد من أن البيانات ليست None
             if data is None:
                 data = []
@@ -136,6 +252,12 @@ class ExportManager:
     def export_to_pdf(self, data, columns, file_path, title="تقرير"):
         """تصدير البيانات إلى PDF"""
         try:
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.lib.units import cm
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+            
             # التأكد من أن البيانات ليست None
             if data is None:
                 data = []
@@ -207,6 +329,129 @@ class ExportManager:
             print(f"خطأ في التصدير إلى PDF: {e}")
             return False
     
+    def record_filters(self, spec, record_type):
+        """مصدر ومرشحات استعلام نوع سجلات واحد حسب المواصفات
+    
+        يعيد (FROM، الشروط، المعاملات، تعبير الصلة أو None بدون بحث نصي)
+        """
+        alias = RECORD_EXPORTS[record_type]['alias']
+        conditions = []
+        params = []
+        relevance = None
+    
+        match = build_match_query(spec.search_text) if spec.search_text else None
+        if match:
+            source = search_join(record_type, alias)
+            relevance = rank_expression(record_type)
+            conditions.append(match_condition(record_type))
+            params.append(match)
+        else:
+            source = f"{RECORD_TABLES[record_type]} {alias}"
+            if spec.search_text:
+                # نص بحث بلا كلمات قابلة للبحث لا يطابق شيئاً، كما في نتائج البحث
+                conditions.append("0")
+    
+        if spec.start_date:
+            conditions.append(f"{alias}.registration_date >= ?")
+            params.append(spec.start_date)
+        if spec.end_date:
+            conditions.append(f"{alias}.registration_date <= ?")
+            params.append(spec.end_date)
+        if spec.employee_id:
+            conditions.append(f"{alias}.employee_id = ?")
+            params.append(spec.employee_id)
+    
+        where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        return source, where, params, relevance
+    
+    def build_export_query(self, spec):
+        """تحويل المواصفات إلى استعلام بالترتيب نفسه الظاهر في الجدول
+    
+        يعيد (الاستعلام، المعاملات، أسماء الأعمدة)
+        """
+        if spec.record_type in RECORD_EXPORTS:
+            export = RECORD_EXPORTS[spec.record_type]
+            source, where, params, relevance = self.record_filters(spec, spec.record_type)
+            order_by = f"{export['alias']}.id DESC"
+            if relevance:
+                order_by = f"{relevance}, {order_by}"
+            query = f"""
+            SELECT {export['select']}
+            FROM {source}
+            {export['joins']}
+            {where}
+            ORDER BY {order_by}
+            """
+            return query, params, list(export['columns'])
+    
+        record_types = list(RECORD_EXPORTS) if spec.record_type == 'both' else [spec.record_type]
+        parts = []
+        params = []
+        for record_type in record_types:
+            export = RECORD_EXPORTS[record_type]
+            source, where, part_params, relevance = self.record_filters(spec, record_type)
+            parts.append(f"""
+            SELECT {export['search_select']},
+                   {relevance or 0} AS relevance, {export['alias']}.id AS id, '{record_type}' AS record_type
+            FROM {source}
+            {where}
+            """)
+            params.extend(part_params)
+    
+        query = f"""
+        SELECT {", ".join(SEARCH_RESULT_NAMES)}
+        FROM ({" UNION ALL ".join(parts)})
+        ORDER BY relevance ASC, record_type ASC, id DESC
+        """
+        return query, params, list(SEARCH_EXPORT_COLUMNS)
+    
+    def iter_spec_rows(self, spec):
+        """صفوف المواصفات من المؤشر على دفعات، مع أسماء الأعمدة"""
+        query, params, columns = self.build_export_query(spec)
+        return self.db_manager.iter_query(query, params, self.EXCEL_CHUNK_SIZE), columns
+    
+    def spec_title(self, spec):
+        if spec.record_type in RECORD_EXPORTS:
+            return RECORD_EXPORTS[spec.record_type]['title']
+        return "نتائج البحث"
+    
+    def export_spec(self, spec, file_path, title=None):
+        """تصدير البيانات المطابقة للمواصفات مباشرة من قاعدة البيانات
+    
+        الصيغة تُحدد من امتداد الملف. Excel يُكتب أثناء القراءة من المؤشر،
+        أما PDF و Word فيبنيان الجدول كاملاً في الذاكرة قبل الحفظ
+        """
+        title = title or self.spec_title(spec)
+        try:
+            rows, columns = self.iter_spec_rows(spec)
+            if file_path.endswith('.pdf'):
+                return self.export_to_pdf(list(rows), columns, file_path, title)
+            if file_path.endswith('.docx'):
+                return self.export_to_word(list(rows), columns, file_path, title)
+            self.write_excel_rows(rows, columns, file_path, title)
+            return True
+        except Exception as e:
+            print(f"خطأ في تصدير البيانات: {e}")
+            return False
+    
+    def export_specs_to_excel(self, specs, file_path):
+        """تصدير عدة مواصفات إلى ملف Excel واحد، ورقة لكل منها
+    
+        specs: قائمة (اسم الورقة، المواصفات)
+        """
+        try:
+            from openpyxl import Workbook
+            
+            workbook = Workbook(write_only=True)
+            for sheet_name, spec in specs:
+                rows, columns = self.iter_spec_rows(spec)
+                self.add_excel_sheet(workbook, rows, columns, sheet_name)
+            workbook.save(file_path)
+            return True
+        except Exception as e:
+            print(f"خطأ في التصدير إلى Excel: {e}")
+            return False
+    
     def generate_incoming_report(self, start_date=None, end_date=None):
         """إنشاء تقرير الوارد"""
         try:
@@ -308,51 +553,30 @@ class ExportManager:
             
             employees = self.safe_execute_query(employee_query, params)
             
-            # حساب الإحصائيات التفصيلية
-            processed_data = []
+            # حساب الإحصائيات لجميع الموظفين في استعلام تجميعي واحد
+            all_stats = self.db_manager.get_all_employee_stats(start_date, end_date)
+            
+            employee_rows = []
             total_faxes = 0
             total_emails = 0
             
             for emp in employees:
                 if emp is None:
                     continue
-                    
-                emp_id = self.safe_get_column(emp, 0, 0)
                 
-                # حساب الفاكسات (سجلات الصادر)
-                fax_query = """
-                SELECT COUNT(*) FROM outgoing_records 
-                WHERE employee_id = ?
-                """
-                fax_params = [emp_id]
-                
-                # حساب الإيميلات (سجلات الوارد من نوع إيميل)
-                email_query = """
-                SELECT COUNT(*) FROM incoming_records 
-                WHERE employee_id = ? 
-                AND incoming_type_id IN (SELECT id FROM incoming_types WHERE name LIKE '%إيميل%' OR name LIKE '%email%')
-                """
-                email_params = [emp_id]
-                
-                if start_date and end_date:
-                    fax_query += " AND registration_date BETWEEN ? AND ?"
-                    email_query += " AND registration_date BETWEEN ? AND ?"
-                    fax_params.extend([start_date, end_date])
-                    email_params.extend([start_date, end_date])
-                
-                fax_count_result = self.safe_execute_query(fax_query, fax_params)
-                email_count_result = self.safe_execute_query(email_query, email_params)
-                
-                fax_count = fax_count_result[0][0] if fax_count_result and fax_count_result[0] else 0
-                email_count = email_count_result[0][0] if email_count_result and email_count_result[0] else 0
-                
-                total_comm = fax_count + email_count
-                
-                total_faxes += fax_count
-                total_emails += email_count
+                emp_id = self.safe_get_column(emp, 0, 0)
+                stats = all_stats.get(emp_id, {'fax_count': 0, 'email_count': 0, 'total': 0})
                 
-                # حساب النسبة المئوية
-                total_all = total_faxes + total_emails
+                total_faxes += stats['fax_count']
+                total_emails += stats['email_count']
+                employee_rows.append((emp, stats))
+            
+            # حساب النسبة المئوية من المجموع الكلي
+            total_all = total_faxes + total_emails
+            processed_data = []
+            
+            for emp, stats in employee_rows:
+                total_comm = stats['total']
                 percentage = (total_comm / total_all * 100) if total_all > 0 else 0
                 
                 status_text = "نشط" if self.safe_get_column(emp, 4, 0) else "غير نشط"
@@ -361,8 +585,8 @@ class ExportManager:
                     self.safe_get_column(emp, 1, "غير معروف"),  # الاسم
                     self.safe_get_column(emp, 2, "غير محدد"),  # القسم
                     self.safe_get_column(emp, 3, "غير محدد"),  # المنصب
-                    fax_count,
-                    email_count,
+                    stats['fax_count'],
+                    stats['email_count'],
                     total_comm,
                     f"{percentage:.1f}%",
                     status_text
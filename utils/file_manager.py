@@ -1,10 +1,23 @@
 import os
-import shutil
+import hashlib
+import mimetypes
+import tempfile
+import threading
 from datetime import datetime
 import tkinter as tk
 from tkinter import filedialog
 
 class FileManager:
+    """إدارة ملفات المرفقات
+    
+    الملفات تُخزن حسب محتواها: اسم الملف هو بصمته SHA-256 داخل مجلدين فرعيين
+    من أول أحرف البصمة، فالملف نفسه المرفق بعدة سجلات يُخزن مرة واحدة.
+    عدد المرفقات المرتبطة بكل ملف يُحفظ في جدول attachment_blobs
+    """
+    
+    # حجم القطعة المقروءة في كل مرة عند النسخ وحساب البصمة
+    COPY_CHUNK_SIZE = 1024 * 1024
+    
     def __init__(self, attachments_dir="data/attachments"):
         self.attachments_dir = attachments_dir
         os.makedirs(attachments_dir, exist_ok=True)
@@ -29,30 +42,142 @@ class FileManager:
         return file_path
     
     def save_attachment(self, source_path, record_id, record_type):
-        """حفظ المرفق في المجلد المخصص"""
+        """حفظ المرفق في مخزن الملفات حسب المحتوى
+        
+        يعيد بيانات الملف المخزن لتسجيلها عبر DatabaseManager.add_attachment
+        """
         if not source_path or not os.path.exists(source_path):
             return None
         
-        # إنشاء اسم فريد للملف
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        original_name = os.path.basename(source_path)
-        name, ext = os.path.splitext(original_name)
-        new_filename = f"{record_type}_{record_id}_{timestamp}{ext}"
-        
-        # المسار الجديد
-        new_path = os.path.join(self.attachments_dir, new_filename)
-        
         try:
-            shutil.copy2(source_path, new_path)
+            file_hash, file_path, file_size, deduplicated = self.store_blob(source_path)
+            file_name = os.path.basename(source_path)
             return {
-                'file_name': original_name,
-                'file_path': new_path,
-                'saved_name': new_filename
+                'file_name': file_name,
+                'file_path': file_path,
+                'saved_name': os.path.basename(file_path),
+                'hash': file_hash,
+                'file_size': file_size,
+                'file_type': self.guess_type(file_name),
+                'file_mtime': os.path.getmtime(file_path),
+                'deduplicated': deduplicated,
+                'source_path': source_path
             }
         except Exception as e:
             print(f"خطأ في حفظ الملف: {e}")
             return None
     
+    def guess_type(self, file_name):
+        """نوع MIME من امتداد الملف"""
+        return mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    
+    def hash_file(self, file_path):
+        """بصمة SHA-256 لملف بقراءته على أجزاء"""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as source:
+            while True:
+                chunk = source.read(self.COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def blob_dir(self, file_hash):
+        """مجلد الملف في المخزن: ab/cd من أول أربعة أحرف من البصمة"""
+        return os.path.join(self.attachments_dir, file_hash[:2], file_hash[2:4])
+    
+    def find_blob(self, file_hash):
+        """مسار ملف مخزن بهذه البصمة (بأي امتداد) أو None"""
+        directory = self.blob_dir(file_hash)
+        try:
+            for name in os.listdir(directory):
+                if os.path.splitext(name)[0] == file_hash:
+                    return os.path.join(directory, name)
+        except FileNotFoundError:
+            pass
+        return None
+    
+    def store_blob(self, source_path):
+        """نسخ الملف إلى المخزن مع حساب بصمته في القراءة نفسها
+        
+        النسخ يتم إلى ملف مؤقت ثم يُنقل إلى مكانه، فلا يظهر في المخزن ملف ناقص.
+        إذا كان المحتوى مخزناً من قبل تُحذف النسخة المؤقتة ويُستخدم الموجود.
+        يعيد (البصمة، المسار، الحجم، هل كان موجوداً)
+        """
+        digest = hashlib.sha256()
+        file_size = 0
+        
+        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=self.attachments_dir)
+        try:
+            with os.fdopen(fd, 'wb') as target, open(source_path, 'rb') as source:
+                while True:
+                    chunk = source.read(self.COPY_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    target.write(chunk)
+                    file_size += len(chunk)
+            
+            file_hash = digest.hexdigest()
+            existing = self.find_blob(file_hash)
+            if existing:
+                os.remove(temp_path)
+                return file_hash, existing, file_size, True
+            
+            ext = os.path.splitext(source_path)[1].lower()
+            file_path = os.path.join(self.blob_dir(file_hash), file_hash + ext)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            try:
+                os.replace(temp_path, file_path)
+            except FileNotFoundError:
+                # حذف متزامن أزال المجلد الفرعي الفارغ بين إنشائه والنقل
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                os.replace(temp_path, file_path)
+            return file_hash, file_path, file_size, False
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def collect_garbage(self, db_manager):
+        """حذف الملفات التي لم يعد أي مرفق يشير إليها
+        
+        الصفوف تُحذف في وحدة عمل، والملفات بعد حفظها تحت قفل الكتابة ما لم يُعد
+        تسجيل الملف نفسه في هذه الأثناء (انظر UnitOfWork).
+        يعيد عدد الملفات المحذوفة والمساحة المحررة بالبايت
+        """
+        removed = 0
+        freed = 0
+        try:
+            with db_manager.unit_of_work(self) as work:
+                for file_hash, file_path, file_size in db_manager.get_unreferenced_blobs():
+                    if work.delete_blob(file_hash):
+                        removed += 1
+                        freed += file_size or 0
+        except Exception as e:
+            print(f"خطأ في حذف الملفات غير المرتبطة: {e}")
+            return 0, 0
+        return removed, freed
+    
+    def remove_empty_dirs(self, directory):
+        """حذف مجلدات المخزن الفرعية التي أصبحت فارغة"""
+        root = os.path.abspath(self.attachments_dir)
+        directory = os.path.abspath(directory)
+        while directory != root and directory.startswith(root):
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+            directory = os.path.dirname(directory)
+    
+    def storage_report(self, db_manager):
+        """حجم المرفقات المخزن والمساحة الموفرة بعدم تكرار الملفات"""
+        stats = db_manager.get_attachment_storage_stats()
+        return self.format_storage(stats['stored_bytes'], stats['saved_bytes'])
+    
+    def format_storage(self, stored_bytes, saved_bytes):
+        return f"{self._format_size(stored_bytes)} (موفر {self._format_size(saved_bytes)})"
+    
     def delete_attachment(self, file_path):
         """حذف ملف مرفق"""
         try:
@@ -73,6 +198,16 @@ class FileManager:
             print(f"خطأ في فتح الملف: {e}")
         return False
     
+    def display_size(self, file_size, file_status=None):
+        """نص الحجم المسجل في قاعدة البيانات للعرض دون الوصول إلى الملف"""
+        if file_status == 'missing':
+            return "مفقود"
+        if file_status == 'changed':
+            return "تغير الملف"
+        if file_size is None:
+            return "غير معروف"
+        return self._format_size(file_size)
+    
     def get_attachment_size(self, file_path):
         """الحصول على حجم الملف"""
         try:
@@ -89,4 +224,103 @@ class FileManager:
             if size_bytes < 1024.0:
                 return f"{size_bytes:.2f} {unit}"
             size_bytes /= 1024.0
-        return f"{size_bytes:.2f} TB"
\ No newline at end of file
+        return f"{size_bytes:.2f} TB"
+
+class AttachmentReconciler:
+    """التحقق الدوري في الخلفية من ملفات المرفقات مقابل البيانات المسجلة لها
+    
+    يمر على المرفقات على دفعات صغيرة مع توقف قصير بين الدفعات حتى لا يثقل على
+    قاعدة البيانات أو مجلد الشبكة. الملف غير الموجود يُعلّم 'missing'، والملف
+    الذي تغير حجمه أو تاريخ تعديله تُعاد حساب بصمته ويُعلّم 'changed' إن اختلفت
+    """
+    
+    def __init__(self, db_manager, file_manager, interval=3600, batch_size=200, batch_pause=0.5, initial_delay=60):
+        self.db_manager = db_manager
+        self.file_manager = file_manager
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.initial_delay = initial_delay
+        self.runs = 0
+        self.last_result = None
+    
+        self._stop_event = threading.Event()
+        self._thread = None
+    
+    def start(self):
+        """تشغيل التحقق الدوري (أول مرور بعد initial_delay حتى لا يبطئ بدء التشغيل)"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="attachment-reconciler", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """إيقاف التحقق (يتوقف بعد الدفعة الجارية)"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        wait = self.initial_delay
+        while not self._stop_event.wait(wait):
+            self.reconcile()
+            wait = self.interval
+    
+    def reconcile(self):
+        """مرور كامل على المرفقات بترتيب الرقم، دفعة بعد دفعة"""
+        counts = {'checked': 0, 'ok': 0, 'missing': 0, 'changed': 0}
+        last_id = 0
+        try:
+            while not self._stop_event.is_set():
+                rows = self.db_manager.get_attachments_batch(last_id, self.batch_size)
+                if not rows:
+                    break
+    
+                updates = [self.check_attachment(row) for row in rows]
+                self.db_manager.update_attachment_checks(updates)
+    
+                for update in updates:
+                    counts[update[3]] += 1
+                counts['checked'] += len(rows)
+                last_id = rows[-1][0]
+                self._stop_event.wait(self.batch_pause)
+        except Exception as e:
+            print(f"خطأ في التحقق من المرفقات: {e}")
+            return None
+    
+        self.runs += 1
+        self.last_result = dict(counts, time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        if counts['missing'] or counts['changed']:
+            print(f"تحقق المرفقات: {counts['missing']} ملف مفقود، {counts['changed']} ملف متغير")
+        return self.last_result
+    
+    def check_attachment(self, row):
+        """مقارنة ملف مرفق بالبيانات المسجلة له
+    
+        يعيد (الحجم، النوع، تاريخ التعديل، الحالة، رقم المرفق) لتحديث الصف
+        """
+        attachment_id, file_name, file_path, file_size, file_type, file_mtime, blob_hash = row
+        file_type = file_type or self.file_manager.guess_type(file_name)
+    
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return file_size, file_type, file_mtime, 'missing', attachment_id
+    
+        if stat.st_size == file_size and stat.st_mtime == file_mtime:
+            return file_size, file_type, file_mtime, 'ok', attachment_id
+    
+        if blob_hash:
+            # ملف المخزن اسمه بصمته: المحتوى سليم ما دامت البصمة مطابقة
+            if self.file_manager.hash_file(file_path) == blob_hash:
+                return stat.st_size, file_type, stat.st_mtime, 'ok', attachment_id
+            return file_size, file_type, file_mtime, 'changed', attachment_id
+    
+        if file_size is None or file_mtime is None:
+            # مرفق قديم يُتحقق منه لأول مرة: تسجيل بيانات ملفه الحالية
+            return stat.st_size, file_type, stat.st_mtime, 'ok', attachment_id
+    
+        return file_size, file_type, file_mtime, 'changed', attachment_id
+    
\ No newline at end of file
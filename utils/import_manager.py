@@ -0,0 +1,441 @@
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from reference_cache import reference_cache
+from search_index import RECORD_TABLES
+from sequences import SERIAL_YEAR, format_record_number, reserve_block
+from utils.validators import Validators
+
+# ============================================================
+# الاستيراد المجمع لسجلات الوارد والصادر من ملفات CSV أو Excel:
+# الملف يُقرأ صفاً صفاً دون تحميله كاملاً، والأعمدة تُربط بحقول السجل،
+# وأسماء الجهات والأنواع والموظفين تُحول إلى معرفاتها من خريطة في الذاكرة
+# (وتُنشأ الأسماء الجديدة عند الحاجة). كل دفعة تُتحقق منها ثم تُدخل
+# بـ executemany في معاملة واحدة تحجز أرقام السجلات من العدادات وتحفظ
+# موضع التقدم، فيُستأنف الاستيراد المتوقف من آخر دفعة مكتملة.
+# الصفوف المرفوضة تُكتب مع سبب رفضها في ملف CSV بجوار الملف المستورد
+# ============================================================
+
+@dataclass(frozen=True)
+class ImportField:
+    """حقل يمكن استيراده: العمود في جدول السجلات، والاسم المعروض وأسماؤه البديلة في رأس الملف"""
+    column: str
+    label: str
+    required: bool = False
+    reference: Optional[str] = None  # الجدول المرجعي الذي يُحول الاسم إلى معرفه
+    aliases: Tuple[str, ...] = ()
+
+IMPORT_FIELDS = {
+    'incoming': {
+        'number': ImportField('incoming_number', 'رقم الوارد', True, aliases=('incoming_number', 'الرقم')),
+        'title': ImportField('title', 'العنوان', True, aliases=('الموضوع',)),
+        'source': ImportField('incoming_source_id', 'جهة الوارد', reference='incoming_sources',
+                              aliases=('الجهة',)),
+        'type': ImportField('incoming_type_id', 'النوع', reference='incoming_types', aliases=('نوع الوارد',)),
+        'employee': ImportField('employee_id', 'الموظف', reference='employees'),
+        'specialization': ImportField('specialization_id', 'الاختصاص', reference='specializations'),
+        'registration_date': ImportField('registration_date', 'التاريخ', True, aliases=('تاريخ التسجيل',)),
+        'details': ImportField('details', 'التفاصيل'),
+    },
+    'outgoing': {
+        'number': ImportField('outgoing_number', 'رقم الصادر', True, aliases=('outgoing_number', 'الرقم')),
+        'title': ImportField('title', 'العنوان', True, aliases=('الموضوع',)),
+        'destination': ImportField('outgoing_destination_id', 'جهة الصادر', reference='outgoing_destinations',
+                                   aliases=('الجهة',)),
+        'employee': ImportField('employee_id', 'الموظف', reference='employees'),
+        'specialization': ImportField('specialization_id', 'الاختصاص', reference='specializations'),
+        'registration_date': ImportField('registration_date', 'التاريخ', True, aliases=('تاريخ التسجيل',)),
+        'details': ImportField('details', 'التفاصيل'),
+    },
+}
+
+# صيغ التاريخ المقبولة في الملفات، تُحول جميعها إلى YYYY-MM-DD
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d %H:%M:%S')
+
+REJECT_REASON_COLUMN = 'سبب الرفض'
+ROW_NUMBER_COLUMN = 'رقم الصف'
+
+def import_checkpoint_statements():
+    """جدول مواضع تقدم الاستيراد (ترحيل)"""
+    return ["""
+        CREATE TABLE IF NOT EXISTS import_checkpoints (
+            source_key TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            record_type TEXT NOT NULL,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            updated_date DATETIME DEFAULT CURRENT_TIMESTAMP
+        );
+    """]
+
+def default_mapping(record_type, headers):
+    """ربط أعمدة الملف بالحقول حسب أسمائها: عمود الملف -> مفتاح الحقل"""
+    names = {}
+    for key, import_field in IMPORT_FIELDS[record_type].items():
+        for name in (key, import_field.column, import_field.label) + import_field.aliases:
+            names.setdefault(name, key)
+    mapping = {}
+    for header in headers:
+        key = names.get(str(header).strip()) if header is not None else None
+        if key and key not in mapping.values():
+            mapping[header] = key
+    return mapping
+
+def normalize_date(value):
+    """التاريخ بصيغة YYYY-MM-DD إن أمكن، وإلا القيمة كما هي ليرفضها التحقق"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip() if value is not None else ""
+    # YYYY-MM-DD و YYYY/MM/DD (أغلب الملفات) دون strptime، وصحة القيم يتحقق منها validate_date
+    if len(text) == 10 and text[4] in '-/' and text[7] == text[4]:
+        return f"{text[:4]}-{text[5:7]}-{text[8:]}"
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return text
+
+def iter_file_rows(file_path):
+    """رأس الملف ثم صفوفه واحداً تلو الآخر (CSV أو XLSX) دون تحميل الملف كاملاً"""
+    if file_path.lower().endswith(('.xlsx', '.xlsm')):
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for row in workbook.active.iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        with open(file_path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.reader(f)
+
+@dataclass
+class ImportResult:
+    """نتيجة الاستيراد"""
+    rows: int = 0  # الصفوف المعالجة في هذا التشغيل
+    inserted: int = 0
+    rejected: int = 0
+    resumed_from: int = 0  # الصفوف المعالجة في تشغيلات سابقة
+    seconds: float = 0.0
+    rejects_path: Optional[str] = None
+    created: Dict[str, int] = field(default_factory=dict)  # عدد الأسماء المرجعية المنشأة لكل جدول
+    already_done: bool = False
+    
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+class ImportManager:
+    """استيراد مجمع للسجلات التاريخية
+    
+    create_missing: إنشاء الجهات والأنواع والموظفين غير الموجودين بدل رفض صفوفهم
+    """
+    
+    BATCH_SIZE = 5000
+    
+    def __init__(self, db_manager, batch_size=None, create_missing=True):
+        self.db_manager = db_manager
+        self.batch_size = batch_size or self.BATCH_SIZE
+        self.create_missing = create_missing
+        self.reference_ids = {}  # الجدول -> {الاسم: المعرف}
+    
+    def source_key(self, file_path, record_type):
+        """مفتاح موضع التقدم: الملف نفسه بحجمه ووقت تعديله، فتعديل الملف يبدأ الاستيراد من جديد"""
+        stat = os.stat(file_path)
+        return f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{record_type}"
+    
+    def rejects_path(self, file_path):
+        return os.path.splitext(file_path)[0] + ".rejected.csv"
+    
+    def load_checkpoint(self, source_key):
+        rows = self.db_manager.execute_query(
+            "SELECT rows_done, inserted, rejected, completed FROM import_checkpoints WHERE source_key = ?",
+            (source_key,)
+        )
+        return rows[0] if rows else (0, 0, 0, 0)
+    
+    def reference_map(self, table):
+        """خريطة الاسم -> المعرف لجدول مرجعي، من الذاكرة المشتركة (النشطة أولاً)"""
+        if table not in self.reference_ids:
+            data = reference_cache.get(self.db_manager, table)
+            ids = dict(data.ids)
+            for row_id, name in sorted(data.by_id.items()):
+                ids.setdefault(name, row_id)
+            self.reference_ids[table] = ids
+        return self.reference_ids[table]
+    
+    def import_file(self, file_path, record_type, mapping=None, progress=None):
+        """استيراد ملف كامل أو استئنافه من آخر موضع محفوظ
+        
+        mapping: عمود الملف -> مفتاح الحقل في IMPORT_FIELDS (يُستنتج من رأس الملف إن لم يُحدد)
+        progress: دالة اختيارية تُستدعى بعدد الصفوف المعالجة بعد كل دفعة
+        """
+        started = time.perf_counter()
+        source_key = self.source_key(file_path, record_type)
+        rows_done, _, _, completed = self.load_checkpoint(source_key)
+        result = ImportResult(resumed_from=rows_done, rejects_path=self.rejects_path(file_path))
+        if completed:
+            result.already_done = True
+            return result
+        
+        rows = iter_file_rows(file_path)
+        headers = next(rows, None)
+        if not headers:
+            raise ValueError("الملف فارغ")
+        mapping = mapping or default_mapping(record_type, headers)
+        fields = IMPORT_FIELDS[record_type]
+        missing = [fields[key].label for key, import_field in fields.items()
+                   if import_field.required and key not in mapping.values()]
+        if missing:
+            raise ValueError(f"أعمدة مطلوبة غير موجودة في الملف: {', '.join(missing)}")
+        positions = {key: headers.index(header) for header, key in mapping.items()}
+        
+        # الصفوف المعالجة في تشغيل سابق تُتخطى دون معالجة
+        for _ in range(rows_done):
+            if next(rows, None) is None:
+                break
+        
+        rejects = RejectWriter(result.rejects_path, headers, append=rows_done > 0)
+        try:
+            batch = []
+            row_number = rows_done + 1  # رقم الصف في الملف بعد الرأس
+            for values in rows:
+                batch.append((row_number, values))
+                row_number += 1
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch, record_type, positions, source_key, file_path, rejects, result)
+                    batch = []
+                    if progress:
+                        progress(rows_done + result.rows)
+            self.import_batch(batch, record_type, positions, source_key, file_path, rejects, result,
+                              completed=True)
+            if progress:
+                progress(rows_done + result.rows)
+        finally:
+            rejects.close()
+            # الأسماء المنشأة في الدفعات المؤكدة تظهر في النماذج وفي الاستئناف التالي
+            for table in result.created:
+                reference_cache.invalidate(table)
+        
+        result.seconds = time.perf_counter() - started
+        return result
+    
+    def prepare_batch(self, batch, record_type, positions):
+        """استخراج قيم الحقول والتحقق منها عموداً عموداً: (الصفوف المقبولة، المرفوضة)
+        
+        الصف المقبول: (رقم الصف، {مفتاح الحقل: القيمة})، والمرفوض: (رقم الصف، القيم، السبب)
+        """
+        fields = IMPORT_FIELDS[record_type]
+        columns = {}
+        for key, position in positions.items():
+            values = [row[position] if position < len(row) else None for _, row in batch]
+            if key == 'registration_date':
+                values = [normalize_date(value) for value in values]
+            else:
+                values = [str(value).strip() if value is not None else "" for value in values]
+            columns[key] = values
+        
+        errors = [[] for _ in batch]
+        for key, values in columns.items():
+            label = fields[key].label
+            checks = []
+            if fields[key].required:
+                checks.append(Validators.validate_required)
+            if key == 'registration_date':
+                checks.append(Validators.validate_date)
+            for check in checks:
+                for index, error in enumerate(check(value, label) for value in values):
+                    if error:
+                        errors[index].append(error)
+        
+        accepted, rejected = [], []
+        for index, (row_number, row) in enumerate(batch):
+            if errors[index]:
+                rejected.append((row_number, row, "؛ ".join(errors[index])))
+            else:
+                accepted.append((row_number, {key: values[index] for key, values in columns.items()}))
+        return accepted, rejected
+    
+    def resolve_references(self, cursor, accepted, record_type, result):
+        """تحويل الأسماء المرجعية إلى معرفات، وإنشاء الجديدة منها أو رفض صفوفها"""
+        references = {key: import_field for key, import_field in IMPORT_FIELDS[record_type].items()
+                      if import_field.reference}
+        resolved, rejected = [], []
+        for row_number, values in accepted:
+            error = None
+            for key, import_field in references.items():
+                name = values.get(key)
+                if not name:
+                    values[key] = None
+                    continue
+                ids = self.reference_map(import_field.reference)
+                if name not in ids:
+                    if not self.create_missing:
+                        error = f"{import_field.label} غير معروف: {name}"
+                        break
+                    table = import_field.reference
+                    cursor.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+                    if cursor.rowcount:
+                        ids[name] = cursor.lastrowid
+                        result.created[table] = result.created.get(table, 0) + 1
+                    else:
+                        # أُضيف من مكان آخر بعد تحميل الخريطة
+                        ids[name] = cursor.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+                values[key] = ids[name]
+            if error:
+                rejected.append((row_number, error))
+            else:
+                resolved.append((row_number, values))
+        return resolved, rejected
+    
+    def import_batch(self, batch, record_type, positions, source_key, file_path, rejects, result,
+                     completed=False):
+        """معالجة دفعة في معاملة واحدة: الإدخال وحجز الأرقام وحفظ موضع التقدم معاً"""
+        accepted, rejected = self.prepare_batch(batch, record_type, positions)
+        rows_by_number = dict(batch)
+        fields = IMPORT_FIELDS[record_type]
+        created_before = dict(result.created)
+        
+        with self.db_manager.pool.connection() as conn:
+            if conn.in_transaction:
+                # تأكيدها هنا يحفظ عمل معاملة خارجية في منتصفه
+                raise sqlite3.OperationalError("لا يمكن استيراد دفعة أثناء معاملة مفتوحة على الاتصال")
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                accepted, unresolved = self.resolve_references(cursor, accepted, record_type, result)
+                rejected += [(row_number, rows_by_number[row_number], reason) for row_number, reason in unresolved]
+                
+                # أرقام السجلات تُحجز كتلةً لكل سنة، والأرقام التسلسلية كتلةً واحدة، بترتيب الملف
+                keys = list(positions)
+                columns = ['record_number', 'serial_number'] + [fields[key].column for key in keys]
+                rows = []
+                if accepted:
+                    years = {}
+                    for _, values in accepted:
+                        year = int(values['registration_date'][:4])
+                        years[year] = years.get(year, 0) + 1
+                    next_numbers = {year: reserve_block(cursor, record_type, year, count)
+                                    for year, count in years.items()}
+                    serial = reserve_block(cursor, record_type, SERIAL_YEAR, len(accepted))
+                    for _, values in accepted:
+                        year = int(values['registration_date'][:4])
+                        record_number = format_record_number(record_type, year, next_numbers[year])
+                        next_numbers[year] += 1
+                        rows.append([record_number, str(serial)] + [values[key] for key in keys])
+                        serial += 1
+                    cursor.executemany(
+                        f"INSERT INTO {RECORD_TABLES[record_type]} ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))})",
+                        rows
+                    )
+                
+                cursor.execute(
+                    """INSERT INTO import_checkpoints
+                    (source_key, file_path, record_type, rows_done, inserted, rejected, completed, updated_date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(source_key) DO UPDATE SET
+                        rows_done = rows_done + excluded.rows_done,
+                        inserted = inserted + excluded.inserted,
+                        rejected = rejected + excluded.rejected,
+                        completed = excluded.completed,
+                        updated_date = CURRENT_TIMESTAMP""",
+                    (source_key, os.path.abspath(file_path), record_type, len(batch), len(rows),
+                     len(rejected), int(completed))
+                )
+                
+                # الصفوف المرفوضة تُكتب قبل تأكيد المعاملة: توقف بينهما قد يكررها عند الاستئناف ولا يفقدها
+                rejects.write(sorted(rejected, key=lambda item: item[0]))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                # المعرفات المنشأة في المعاملة الملغاة لم تعد موجودة، فتُعاد قراءة الخرائط
+                self.reference_ids = {}
+                result.created = created_before
+                raise
+        
+        result.rows += len(batch)
+        result.inserted += len(rows)
+        result.rejected += len(rejected)
+
+class RejectWriter:
+    """ملف الصفوف المرفوضة: رقم الصف وقيمه الأصلية وسبب الرفض، يُنشأ عند أول صف مرفوض"""
+    
+    def __init__(self, file_path, headers, append=False):
+        self.file_path = file_path
+        self.headers = [ROW_NUMBER_COLUMN] + [str(header) for header in headers] + [REJECT_REASON_COLUMN]
+        self.append = append
+        self._file = None
+        self._writer = None
+    
+    def write(self, rejected):
+        if not rejected:
+            return
+        if self._file is None:
+            exists = self.append and os.path.exists(self.file_path)
+            self._file = open(self.file_path, 'a' if exists else 'w', newline='', encoding='utf-8-sig')
+            self._writer = csv.writer(self._file)
+            if not exists:
+                self._writer.writerow(self.headers)
+        for row_number, values, reason in rejected:
+            self._writer.writerow([row_number] + list(values) + [reason])
+        self._file.flush()
+    
+    def close(self):
+        if self._file:
+            self._file.close()
+
+def main(argv=None):
+    """استيراد ملف من سطر الأوامر: python -m utils.import_manager FILE --type incoming"""
+    from database import DatabaseManager
+    
+    parser = argparse.ArgumentParser(description="استيراد سجلات الوارد أو الصادر من ملف CSV أو Excel")
+    parser.add_argument('file', help="ملف CSV أو XLSX")
+    parser.add_argument('--type', dest='record_type', choices=list(IMPORT_FIELDS), required=True)
+    parser.add_argument('--db', default="data/database.db", help="مسار قاعدة البيانات")
+    parser.add_argument('--batch-size', type=int, default=ImportManager.BATCH_SIZE)
+    parser.add_argument('--no-create', action='store_true', help="رفض الصفوف ذات الأسماء المرجعية غير الموجودة")
+    args = parser.parse_args(argv)
+    
+    db_manager = DatabaseManager(args.db)
+    try:
+        importer = ImportManager(db_manager, args.batch_size, create_missing=not args.no_create)
+        result = importer.import_file(
+            args.file, args.record_type,
+            progress=lambda done: print(f"\r{done} صف", end="", flush=True)
+        )
+    except (OSError, ValueError) as e:
+        print(f"فشل الاستيراد: {e}")
+        return 1
+    finally:
+        db_manager.close()
+    
+    print()
+    if result.already_done:
+        print("تم استيراد هذا الملف سابقاً")
+        return 0
+    if result.resumed_from:
+        print(f"استئناف بعد {result.resumed_from} صف")
+    print(f"أُدخل {result.inserted} سجل، رُفض {result.rejected} صف "
+          f"({result.rows_per_second:.0f} صف/ث)")
+    for table, count in result.created.items():
+        print(f"أُنشئ {count} اسم جديد في {table}")
+    if result.rejected:
+        print(f"الصفوف المرفوضة: {result.rejects_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
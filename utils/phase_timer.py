@@ -0,0 +1,45 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================================================
+# تسجيل زمن مراحل بدء التشغيل (بناء الواجهة، أول فتح لكل تبويب،
+# تحديث لوحة التحكم في الخلفية...) لمقارنتها بين الإصدارات
+# ============================================================
+
+class PhaseTimer:
+    """زمن كل مرحلة بالمللي ثانية، وزمن المعالم منذ بدء التشغيل"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def phase(self, name):
+        """قياس زمن تنفيذ كتلة الكود"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+    
+    def record(self, name, started):
+        """تسجيل زمن مرحلة بدأت عند started (قيمة من time.perf_counter)"""
+        with self._lock:
+            self.phases[name] = (time.perf_counter() - started) * 1000
+    
+    def mark(self, name):
+        """تسجيل معلم: الزمن المنقضي منذ إنشاء المؤقت"""
+        self.record(name, self.started)
+    
+    def get(self, name):
+        return self.phases.get(name)
+    
+    def report(self):
+        """المراحل بترتيب تسجيلها: قائمة (الاسم، الزمن بالمللي ثانية)"""
+        with self._lock:
+            return list(self.phases.items())
+    
+    def summary(self):
+        return "، ".join(f"{name}: {elapsed:.0f} ms" for name, elapsed in self.report())
@@ -10,23 +10,14 @@ class PrinterManager:
         self.db_manager = db_manager
         self.export_manager = export_manager
     
-    def print_treeview_data(self, treeview, title="طباعة البيانات"):
-        """طباعة بيانات من Treeview"""
+    def print_spec_data(self, spec, title="طباعة البيانات"):
+        """طباعة جميع البيانات المطابقة لمواصفات العرض (ExportSpec) من قاعدة البيانات
+        
+        لا تقتصر على الصفوف المحملة حالياً في الجدول
+        """
         try:
-            # جمع البيانات من Treeview
-            data = []
-            columns = []
-            
-            # الحصول على الأعمدة المرئية فقط
-            for col in treeview['columns']:
-                if treeview.column(col).get('width', 0) > 0:  # استبعاد الأعمدة المخفية
-                    columns.append(treeview.heading(col)['text'])
-            
-            # الحصول على البيانات
-            for item in treeview.get_children():
-                values = treeview.item(item)['values']
-                if values:  # التأكد من وجود قيم
-                    data.append(values)
+            rows, columns = self.export_manager.iter_spec_rows(spec)
+            data = list(rows)
             
             if not data:
                 messagebox.showwarning("تحذير", "لا توجد بيانات للطباعة")
@@ -169,8 +160,8 @@ class PrinterManager:
             messagebox.showerror("خطأ", f"فشل في طباعة تقرير الموظفين: {e}")
             return False
     
-    def quick_print_current_view(self, treeview, report_type):
-        """طباعة سريعة للعرض الحالي"""
+    def quick_print_current_view(self, spec, report_type):
+        """طباعة سريعة للعرض الحالي حسب مواصفاته"""
         titles = {
             'incoming': 'سجلات الوارد',
             'outgoing': 'سجلات الصادر', 
@@ -179,7 +170,7 @@ class PrinterManager:
         }
         
         title = f"{titles.get(report_type, 'تقرير')} - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        return self.print_treeview_data(treeview, title)
+        return self.print_spec_data(spec, title)
     
     def print_selected_record(self, treeview, record_type):
         """طباعة سجل محدد"""
@@ -0,0 +1,325 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils.backup_manager import BackupManager
+
+# ============================================================
+# لقطات كاملة: قاعدة البيانات مع ملفات المرفقات في أرشيف ZIP واحد
+# كل لقطة تحتوي بيان (manifest.json) بجميع ملفات المرفقات وبصماتها والأرشيف
+# الذي يحمل كل ملف، فاللقطة التالية تضيف فقط الملفات الجديدة أو المتغيرة
+# وتشير إلى الأرشيفات السابقة للباقي. الاستعادة تقرأ الملفات المطلوبة فقط
+# من أرشيفاتها مباشرة وتتحقق من بصماتها على عدة خيوط
+# ============================================================
+
+SNAPSHOT_PREFIX = "snapshot_"
+MANIFEST_NAME = "manifest.json"
+DATABASE_MEMBER = "database.db"
+ATTACHMENTS_PREFIX = "attachments/"
+
+class SnapshotManager:
+    """إنشاء لقطات تزايدية لقاعدة البيانات والمرفقات واستعادتها"""
+    
+    COPY_CHUNK_SIZE = 1024 * 1024
+    RESTORE_WORKERS = 4
+    
+    def __init__(self, db_manager, file_manager, snapshot_dir="backups/snapshots"):
+        self.db_manager = db_manager
+        self.file_manager = file_manager
+        self.snapshot_dir = snapshot_dir
+        self._lock = threading.Lock()
+        os.makedirs(snapshot_dir, exist_ok=True)
+    
+    def list_snapshots(self):
+        """أسماء أرشيفات اللقطات من الأحدث إلى الأقدم"""
+        names = [name for name in os.listdir(self.snapshot_dir)
+                 if name.startswith(SNAPSHOT_PREFIX) and name.endswith('.zip')]
+        return sorted(names, reverse=True)
+    
+    def snapshot_path(self, name):
+        return os.path.join(self.snapshot_dir, name)
+    
+    def read_manifest(self, name):
+        with zipfile.ZipFile(self.snapshot_path(name)) as archive:
+            return json.loads(archive.read(MANIFEST_NAME).decode('utf-8'))
+    
+    def latest_manifest(self):
+        """(اسم أحدث لقطة سليمة، بيانها) أو (None، None)"""
+        for name in self.list_snapshots():
+            try:
+                return name, self.read_manifest(name)
+            except Exception as e:
+                print(f"تعذر قراءة بيان اللقطة {name}: {e}")
+        return None, None
+    
+    def reserve_snapshot_name(self):
+        """اسم أرشيف جديد فريد، يُحجز بإنشاء ملفه حصرياً فلا تستبدل لقطة لقطة سابقة"""
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        counter = 0
+        while True:
+            name = f"{SNAPSHOT_PREFIX}{stamp}{f'_{counter}' if counter else ''}.zip"
+            try:
+                with open(self.snapshot_path(name), 'xb'):
+                    return name
+            except FileExistsError:
+                counter += 1
+    
+    def attachment_files(self):
+        """ملفات مجلد المرفقات بمسارات نسبية (بدون الملفات المؤقتة)"""
+        root = self.file_manager.attachments_dir
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith('.part'):
+                    continue
+                path = os.path.join(directory, name)
+                yield os.path.relpath(path, root).replace(os.sep, '/'), path
+    
+    def relative_attachment_path(self, file_path):
+        """مسار ملف مرفق نسبةً إلى مجلد المرفقات، أو None إن كان خارجه"""
+        root = os.path.abspath(self.file_manager.attachments_dir)
+        path = os.path.abspath(file_path)
+        if os.path.commonpath([root, path]) != root:
+            return None
+        return os.path.relpath(path, root).replace(os.sep, '/')
+    
+    def record_attachments(self):
+        """ملفات كل سجل: 'incoming:12' -> قائمة المسارات النسبية"""
+        records = {}
+        for record_type, record_id, file_path in self.db_manager.execute_query(
+            "SELECT record_type, record_id, file_path FROM attachments"
+        ) or []:
+            relative_path = self.relative_attachment_path(file_path)
+            if relative_path:
+                records.setdefault(f"{record_type}:{record_id}", []).append(relative_path)
+        return records
+    
+    def create_snapshot(self, progress=None):
+        """إنشاء لقطة جديدة تضيف فقط ملفات المرفقات الجديدة أو المتغيرة
+        
+        يعيد (مسار الأرشيف، عدد الملفات المضافة، عدد الملفات المعاد استخدامها) أو None
+        """
+        with self._lock:
+            base_name, previous = self.latest_manifest()
+            previous_files = previous['files'] if previous else {}
+            name = self.reserve_snapshot_name()
+            path = self.snapshot_path(name)
+            partial_path = path + '.part'
+            completed = False
+            
+            fd, database_copy = tempfile.mkstemp(suffix='.db', dir=self.snapshot_dir)
+            os.close(fd)
+            try:
+                if not self.db_manager.backup_database(
+                    database_copy, pages=BackupManager.PAGES_PER_STEP, pause=BackupManager.STEP_PAUSE
+                ):
+                    return None
+                if not BackupManager.check_integrity(database_copy):
+                    print("نسخة قاعدة البيانات في اللقطة تالفة")
+                    return None
+                
+                files = {}
+                added = reused = 0
+                with zipfile.ZipFile(partial_path, 'w', allowZip64=True) as archive:
+                    archive.write(database_copy, DATABASE_MEMBER, compress_type=zipfile.ZIP_DEFLATED)
+                    
+                    for relative_path, file_path in self.attachment_files():
+                        stat = os.stat(file_path)
+                        entry = self.unchanged_entry(previous_files.get(relative_path), file_path, stat)
+                        if entry is None:
+                            # الملفات المرفقة مضغوطة غالباً (PDF، صور) فتُخزن بدون ضغط
+                            file_hash = self.write_member(archive, ATTACHMENTS_PREFIX + relative_path, file_path)
+                            entry = {'sha256': file_hash, 'archive': name}
+                            added += 1
+                        else:
+                            reused += 1
+                        entry.update(size=stat.st_size, mtime=stat.st_mtime)
+                        files[relative_path] = entry
+                        if progress:
+                            progress(added + reused)
+                    
+                    manifest = {
+                        'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        'base': base_name,
+                        'database_sha256': self.hash_file(database_copy),
+                        'files': files,
+                        'records': self.record_attachments(),
+                    }
+                    archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1),
+                                     compress_type=zipfile.ZIP_DEFLATED)
+                
+                # الاسم محجوز لهذه اللقطة، فالاستبدال لا يمس إلا ملف الحجز الفارغ
+                os.replace(partial_path, path)
+                completed = True
+                return path, added, reused
+            except Exception as e:
+                print(f"خطأ في إنشاء اللقطة: {e}")
+                return None
+            finally:
+                temp_paths = [database_copy, partial_path] + ([] if completed else [path])
+                for temp_path in temp_paths:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+    
+    def unchanged_entry(self, previous_entry, file_path, stat):
+        """مدخل البيان السابق إن لم يتغير الملف منذ اللقطة السابقة
+        
+        الحجم وتاريخ التعديل المتطابقان يكفيان، وإن تغير التاريخ وحده تُقارن البصمة
+        """
+        if previous_entry is None or previous_entry['size'] != stat.st_size:
+            return None
+        if previous_entry['mtime'] == stat.st_mtime:
+            return {'sha256': previous_entry['sha256'], 'archive': previous_entry['archive']}
+        if self.hash_file(file_path) == previous_entry['sha256']:
+            return {'sha256': previous_entry['sha256'], 'archive': previous_entry['archive']}
+        return None
+    
+    def write_member(self, archive, member_name, file_path):
+        """نسخ ملف إلى الأرشيف مع حساب بصمته في القراءة نفسها"""
+        digest = hashlib.sha256()
+        info = zipfile.ZipInfo.from_file(file_path, member_name)
+        info.compress_type = zipfile.ZIP_STORED
+        with open(file_path, 'rb') as source, archive.open(info, 'w', force_zip64=True) as target:
+            while True:
+                chunk = source.read(self.COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                target.write(chunk)
+        return digest.hexdigest()
+    
+    def hash_file(self, file_path):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as source:
+            while True:
+                chunk = source.read(self.COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def extract_file(self, relative_path, entry, target_path=None):
+        """استخراج ملف واحد من الأرشيف الذي يحمله والتحقق من بصمته
+        
+        target_path=None يتحقق فقط دون الكتابة. يعيد (المسار النسبي، نجح؟، رسالة الخطأ)
+        """
+        temp_path = None
+        try:
+            digest = hashlib.sha256()
+            with zipfile.ZipFile(self.snapshot_path(entry['archive'])) as archive:
+                with archive.open(ATTACHMENTS_PREFIX + relative_path) as source:
+                    target = None
+                    if target_path:
+                        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                        fd, temp_path = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(target_path))
+                        target = os.fdopen(fd, 'wb')
+                    try:
+                        while True:
+                            chunk = source.read(self.COPY_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            digest.update(chunk)
+                            if target:
+                                target.write(chunk)
+                    finally:
+                        if target:
+                            target.close()
+            
+            if digest.hexdigest() != entry['sha256']:
+                return relative_path, False, "البصمة غير مطابقة"
+            if target_path:
+                os.replace(temp_path, target_path)
+                os.utime(target_path, (entry['mtime'], entry['mtime']))
+                temp_path = None
+            return relative_path, True, None
+        except Exception as e:
+            return relative_path, False, str(e)
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+    
+    def process_files(self, entries, restore):
+        """استخراج الملفات أو التحقق منها على عدة خيوط، يعيد قائمة الإخفاقات"""
+        root = self.file_manager.attachments_dir
+        
+        def task(item):
+            relative_path, entry = item
+            target_path = os.path.join(root, *relative_path.split('/')) if restore else None
+            return self.extract_file(relative_path, entry, target_path)
+        
+        with ThreadPoolExecutor(max_workers=self.RESTORE_WORKERS, thread_name_prefix='snapshot') as executor:
+            results = list(executor.map(task, entries.items()))
+        return [(relative_path, error) for relative_path, ok, error in results if not ok]
+    
+    def verify_snapshot(self, name):
+        """التحقق من قاعدة البيانات وجميع الملفات التي يشير إليها بيان اللقطة
+        
+        يعيد قائمة الإخفاقات (المسار، السبب)؛ القائمة الفارغة تعني أن اللقطة سليمة
+        """
+        manifest = self.read_manifest(name)
+        failures = []
+        
+        fd, database_copy = tempfile.mkstemp(suffix='.db', dir=self.snapshot_dir)
+        os.close(fd)
+        try:
+            self.extract_database(name, database_copy)
+            if self.hash_file(database_copy) != manifest['database_sha256']:
+                failures.append((DATABASE_MEMBER, "البصمة غير مطابقة"))
+            elif not BackupManager.check_integrity(database_copy):
+                failures.append((DATABASE_MEMBER, "فشل فحص السلامة"))
+        except Exception as e:
+            failures.append((DATABASE_MEMBER, str(e)))
+        finally:
+            os.remove(database_copy)
+        
+        return failures + self.process_files(manifest['files'], restore=False)
+    
+    def extract_database(self, name, target_path):
+        with zipfile.ZipFile(self.snapshot_path(name)) as archive:
+            with archive.open(DATABASE_MEMBER) as source, open(target_path, 'wb') as target:
+                shutil.copyfileobj(source, target, self.COPY_CHUNK_SIZE)
+    
+    def restore_snapshot(self, name):
+        """استعادة قاعدة البيانات وجميع ملفات المرفقات من لقطة
+        
+        الملفات تُستخرج وتُتحقق بصماتها بالتوازي، ولا تُستبدل قاعدة البيانات إلا إن
+        كانت نسختها سليمة. يعيد قائمة الإخفاقات (المسار، السبب)
+        """
+        with self._lock:
+            manifest = self.read_manifest(name)
+            
+            fd, database_copy = tempfile.mkstemp(suffix='.db', dir=self.snapshot_dir)
+            os.close(fd)
+            try:
+                self.extract_database(name, database_copy)
+                if (self.hash_file(database_copy) != manifest['database_sha256']
+                        or not BackupManager.check_integrity(database_copy)):
+                    return [(DATABASE_MEMBER, "نسخة قاعدة البيانات في اللقطة تالفة")]
+                
+                failures = self.process_files(manifest['files'], restore=True)
+                if not self.db_manager.restore_database(database_copy):
+                    failures.append((DATABASE_MEMBER, "فشل في استعادة قاعدة البيانات"))
+                return failures
+            finally:
+                os.remove(database_copy)
+    
+    def restore_record_attachments(self, record_type, record_id, name=None):
+        """استعادة ملفات مرفقات سجل واحد فقط من لقطة (الأحدث افتراضياً)
+        
+        تُقرأ ملفات السجل وحدها من أرشيفاتها دون فك ضغط اللقطة كاملة.
+        يعيد (عدد الملفات المستعادة، قائمة الإخفاقات)
+        """
+        name = name or (self.list_snapshots() or [None])[0]
+        if name is None:
+            return 0, [("", "لا توجد لقطات")]
+        
+        manifest = self.read_manifest(name)
+        paths = manifest['records'].get(f"{record_type}:{record_id}", [])
+        entries = {path: manifest['files'][path] for path in paths if path in manifest['files']}
+        failures = self.process_files(entries, restore=True)
+        return len(entries) - len(failures), failures
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+
+# ============================================================
+# إحصائيات لوحة التحكم: جميع الأرقام تُحسب باستعلام واحد على اتصال واحد،
+# وعدد سجلات الشهر بمدى تواريخ (>= أول الشهر و< أول الشهر التالي) يستخدم
+# فهرس registration_date بدل strftime الذي يمر على الجدول كاملاً.
+# النتيجة تُحفظ في الذاكرة مدة محددة، ويُعرف تغير قاعدة البيانات من حجم
+# ملفاتها ووقت تعديلها دون الاتصال بها، فلا يُعاد الحساب إلا بعد تغيرها.
+# آخر إحصائيات تُكتب في الإعدادات للعرض الفوري عند التشغيل التالي، لكن عند
+# الإغلاق أو مرة كل persist_interval على الأكثر، لا مع كل حساب (مسار قراءة)
+# ============================================================
+
+STATISTICS_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM incoming_records),
+        (SELECT COUNT(*) FROM incoming_records
+         WHERE registration_date >= :month_start AND registration_date < :next_month),
+        (SELECT COUNT(*) FROM outgoing_records),
+        (SELECT COUNT(*) FROM outgoing_records
+         WHERE registration_date >= :month_start AND registration_date < :next_month),
+        (SELECT COUNT(*) FROM employees WHERE is_active = 1),
+        (SELECT COUNT(*) FROM attachments),
+        (SELECT COALESCE(SUM(file_size), 0) FROM attachment_blobs WHERE ref_count > 0),
+        (SELECT COALESCE(SUM(b.file_size), 0)
+         FROM attachments a JOIN attachment_blobs b ON b.hash = a.blob_hash)
+"""
+
+STATISTICS_KEYS = ['incoming_total', 'incoming_month', 'outgoing_total', 'outgoing_month',
+                   'employees_total', 'attachments_total', 'stored_bytes', 'logical_bytes']
+
+def month_range(day=None):
+    """أول يوم في الشهر وأول يوم في الشهر التالي بصيغة YYYY-MM-DD"""
+    day = day or date.today()
+    start = day.replace(day=1)
+    if start.month == 12:
+        next_start = start.replace(year=start.year + 1, month=1)
+    else:
+        next_start = start.replace(month=start.month + 1)
+    return start.isoformat(), next_start.isoformat()
+
+class StatisticsService:
+    """حساب إحصائيات لوحة التحكم وحفظها في الذاكرة
+    
+    ttl: أقصى عمر للإحصائيات المحفوظة بالثواني قبل إعادة حسابها حتى لو
+    لم يظهر تغير في ملفات قاعدة البيانات
+    persist_interval: أقل مدة بالثواني بين كتابتين للإحصائيات في الإعدادات
+    """
+    
+    # الإعداد الذي تُحفظ فيه آخر إحصائيات للعرض الفوري عند التشغيل التالي
+    CACHE_SETTING = 'dashboard_cache'
+    
+    def __init__(self, db_manager, ttl=300, persist_interval=900):
+        self.db_manager = db_manager
+        self.ttl = ttl
+        self.persist_interval = persist_interval
+        self.version = 0  # يزيد مع كل تغيير في الإحصائيات المحفوظة
+        self._lock = threading.Lock()
+        self._stats = None
+        self._computed_at = 0
+        self._month = None
+        self._token = None
+        self._persisted_at = time.monotonic()
+        self._persisted_version = 0
+    
+    def change_token(self):
+        """بصمة ملف قاعدة البيانات وسجل WAL (الحجم ووقت التعديل)، تتغير مع كل كتابة"""
+        token = []
+        for suffix in ('', '-wal'):
+            try:
+                stat = os.stat(self.db_manager.db_path + suffix)
+                token.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                token.append(None)
+        return tuple(token)
+    
+    def is_fresh(self):
+        """هل الإحصائيات المحفوظة صالحة: لم تنته مدتها ولم يتغير الشهر ولا قاعدة البيانات"""
+        with self._lock:
+            return (self._stats is not None
+                    and time.monotonic() - self._computed_at < self.ttl
+                    and self._month == month_range()
+                    and self._token == self.change_token())
+    
+    def get(self, force=False):
+        """الإحصائيات من الذاكرة إن كانت صالحة، وإلا تُحسب (يُنفذ في خيط عامل)"""
+        if not force and self.is_fresh():
+            with self._lock:
+                return dict(self._stats)
+        return self.refresh()
+    
+    def refresh(self):
+        """حساب الإحصائيات من قاعدة البيانات وحفظها في الذاكرة (وفي الإعدادات إن حان موعدها)"""
+        month = month_range()
+        # البصمة تؤخذ قبل الاستعلام: الكتابة أثناءه أو بعده تظهر تغييراً فتُعاد الإحصائيات
+        token = self.change_token()
+        result = self.db_manager.execute_query(
+            STATISTICS_QUERY, {'month_start': month[0], 'next_month': month[1]}
+        )
+        if not result:
+            raise RuntimeError("تعذر حساب الإحصائيات")
+        stats = dict(zip(STATISTICS_KEYS, result[0]))
+        stats['updated'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+        
+        with self._lock:
+            self._stats = stats
+            self._computed_at = time.monotonic()
+            self._month = month
+            self._token = token
+            self.version += 1
+        
+        if time.monotonic() - self._persisted_at >= self.persist_interval:
+            self.persist()
+        return dict(stats)
+    
+    def persist(self):
+        """كتابة الإحصائيات الحالية في الإعدادات إن تغيرت منذ آخر كتابة (تُستدعى أيضاً عند الإغلاق)"""
+        with self._lock:
+            if self._stats is None or self._persisted_version == self.version:
+                return False
+            stats = dict(self._stats)
+            version = self.version
+        before = self.change_token()
+        self.db_manager.set_setting(self.CACHE_SETTING, json.dumps(stats, ensure_ascii=False),
+                                    'آخر إحصائيات محسوبة للوحة التحكم')
+        after = self.change_token()
+        with self._lock:
+            # كتابة الإعداد ليست تغييراً في البيانات، ما لم يتغير شيء آخر قبلها
+            if self._token == before:
+                self._token = after
+            self._persisted_at = time.monotonic()
+            self._persisted_version = version
+        return True
+    
+    def saved(self):
+        """آخر إحصائيات محفوظة في الإعدادات من تشغيل سابق، أو None"""
+        cached = self.db_manager.get_setting(self.CACHE_SETTING)
+        if not cached:
+            return None
+        try:
+            stats = json.loads(cached)
+        except ValueError as e:
+            print(f"تجاهل إحصائيات لوحة التحكم المحفوظة: {e}")
+            return None
+        if not all(key in stats for key in STATISTICS_KEYS):
+            return None
+        return stats
+    
+    def cached(self):
+        """الإحصائيات الحالية في الذاكرة دون الاتصال بقاعدة البيانات، أو None"""
+        with self._lock:
+            return dict(self._stats) if self._stats is not None else None
+    
+    def record_added(self, record_type, registration_date, token_before):
+        """تحديث الأعداد المحفوظة بعد تسجيل سجل جديد دون إعادة الحساب
+        
+        token_before: بصمة قاعدة البيانات (change_token) قبل الإدخال. إن اختلفت عن
+        البصمة المحفوظة فقد تغيرت البيانات من مكان آخر، فتُهمل الإحصائيات بدلاً من تحديثها
+        """
+        with self._lock:
+            if self._stats is None:
+                return
+            if self._token != token_before:
+                self._computed_at = 0
+                self.version += 1
+                return
+            self._stats[f'{record_type}_total'] += 1
+            if self._month and self._month[0] <= (registration_date or '') < self._month[1]:
+                self._stats[f'{record_type}_month'] += 1
+            self._stats['updated'] = datetime.now().strftime('%Y-%m-%d %H:%M')
+            # الإدخال وحده غير الملفات منذ البصمة المحفوظة وهو محسوب الآن، فلا يُعد تغييراً
+            self._token = self.change_token()
+            self.version += 1
+    
+    def invalidate(self):
+        """إهمال الإحصائيات المحفوظة بعد تعديل لا يمكن تحديثها به (حذف، تعديل...)"""
+        with self._lock:
+            self._computed_at = 0
+            self.version += 1